@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+import time
+import traceback
+
+from app.api.search import run_search
+from app.core.config import settings
+from app.database.database import get_db
+from app.models import schemas
+from app.providers.factory import get_llm_provider
+from app.services.chat import stream_answer
+from app.services.config_service import get_llm_settings
+
+router = APIRouter()
+
+@router.post("/chat")
+async def chat(request: schemas.ChatRequest, db: Session = Depends(get_db)):
+    """
+    Answer a question from the indexed documents, streamed as server-sent
+    events: "sources" (the search response used as context), "token"
+    pieces of the answer, then "done" with time to first token and
+    tokens/sec, or "error" if the LLM fails mid-answer.
+    Retrieval takes the search fields of the request and runs before the
+    stream starts, so invalid requests get an ordinary error response.
+    """
+    started = time.perf_counter()
+    if request.max_tokens is not None and request.max_tokens < 1:
+        raise HTTPException(status_code=400, detail="max_tokens must be at least 1")
+    try:
+        llm_settings = await get_llm_settings(db)
+        llm = get_llm_provider(**llm_settings)
+        search = await run_search(request, db)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    events = stream_answer(
+        llm,
+        llm_settings["model"],
+        search,
+        started,
+        time.perf_counter() - started,
+        max_tokens=request.max_tokens or settings.CHAT_MAX_TOKENS,
+        temperature=request.temperature if request.temperature is not None else settings.CHAT_TEMPERATURE
+    )
+    # No proxy buffering, so tokens reach the client as they are generated
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
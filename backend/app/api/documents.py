@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database.database import get_db
 from app.models import document
-from typing import List
+from app.services.config_service import get_configured_vector_store
+from app.services.dedup import release_canonicals
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -11,10 +13,11 @@ router = APIRouter()
 class DocumentResponse(BaseModel):
     id: int
     filename: str
+    document_key: Optional[str] = None
     upload_date: datetime
     num_chunks: int
     status: str
-    error_message: str = None
+    error_message: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -38,19 +41,21 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Document not found")
     
     try:
-        # Delete vectors from FAISS store (using default FAISS setup)
-        from app.services.vector_stores.faiss_store import FAISSVectorStore
-        
+        canonicals = [(chunk.vector_id, chunk.simhash) for chunk in doc.chunks if chunk.canonical_id is None]
+        # Delete document from database (its chunk rows go with it)
+        db.delete(doc)
+        db.flush()
+        # Near duplicates in other documents take over the role of its chunks
+        release_canonicals(db, canonicals)
+
         # Try to delete from vector store (best effort - may fail if store not initialized)
         try:
-            vector_store = FAISSVectorStore(dimension=768)  # Default dimension
+            vector_store = await get_configured_vector_store(db)
             await vector_store.delete_by_document(str(document_id))
         except Exception as vs_error:
             # Log but don't fail if vector store cleanup fails
             print(f"Warning: Could not delete vectors: {vs_error}")
-        
-        # Delete document from database
-        db.delete(doc)
+
         db.commit()
         
         return {"message": "Document deleted successfully"}
@@ -1,141 +1,305 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-import hashlib
+from typing import List, Optional
+import asyncio
+import os
 import traceback
+import uuid
 
 from app.database.database import get_db
-from app.services.pdf_parser import parse_pdf
-from app.services.chunker import TextChunker
-from app.providers.factory import get_embedding_provider, get_vector_store
-from app.models import configuration, document
+from app.services.ingestion import get_ingest_config, spool_upload
+from app.services.bulk_ingestion import extract_zip_pdfs, register_documents
+from app.services.ingest_queue import (
+    PENDING_STATUSES, BulkIngestJob, IngestJob, QueueFullError, get_ingest_queue
+)
+from app.models import document
 
 router = APIRouter()
 
-async def get_config_value(db: Session, key: str) -> str:
-    """Helper to get a config value from database"""
-    config_item = db.query(configuration.ConfigurationItem).filter(
-        configuration.ConfigurationItem.config_name == key,
-        configuration.ConfigurationItem.is_active == True
-    ).first()
-    return config_item.config_value if config_item else None
+def find_document_by_key(db: Session, document_key: str) -> Optional[document.Document]:
+    """Most recent document with document_key (or, if it predates keys, with that filename)"""
+    return db.query(document.Document).filter(or_(
+        document.Document.document_key == document_key,
+        and_(document.Document.document_key.is_(None), document.Document.filename == document_key)
+    )).order_by(document.Document.upload_date.desc()).first()
 
 @router.post("/ingest")
-async def ingest_document(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def ingest_document(
+    file: UploadFile = File(...),
+    document_key: Optional[str] = Form(None),
+    update: bool = Form(False),
+    db: Session = Depends(get_db)
+):
     """
-    Upload and process a document:
+    Upload a document and queue it for processing:
     1. Parse PDF
     2. Chunk text
     3. Generate embeddings
     4. Store in vector database
     5. Track metadata
+
+    Uploading the file of a document that failed processes it again.
+
+    document_key identifies the document across versions (default: the
+    filename). With update set, an upload whose key matches a completed
+    document is processed as a new version of it: only chunks that are
+    new or changed are embedded and chunks that vanished are deleted.
+    Without a match it is ingested as a new document.
+
+    Returns 202 with a job ID immediately; poll GET /ingest/jobs/{job_id}
+    for progress. Returns 503 when the ingest queue is full, and 409 when
+    the document to update is still being processed.
     """
+    path = None
     try:
-        # Read file content
-        content = await file.read()
-        file_hash = hashlib.sha256(content).hexdigest()
+        queue = get_ingest_queue()
+        
+        # Spool the upload to disk while hashing it, without holding it in memory
+        path, file_hash = await spool_upload(file, queue.spool_dir)
         
         # Check if document already exists
         existing_doc = db.query(document.Document).filter(
             document.Document.file_hash == file_hash
         ).first()
         
-        if existing_doc:
+        # A failed document is ingested again below, reusing its row
+        if existing_doc and existing_doc.status != "failed":
             return {
                 "message": "Document already indexed",
                 "document_id": existing_doc.id,
-                "filename": existing_doc.filename
+                "job_id": existing_doc.id,
+                "filename": existing_doc.filename,
+                "status": existing_doc.status
             }
         
+        # Fail fast on configuration problems instead of queueing a doomed job
+        try:
+            config = await get_ingest_config(db)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if queue.is_full():
+            raise HTTPException(
+                status_code=503,
+                detail="Ingest queue is full. Please retry later."
+            )
+        
+        document_key = document_key or file.filename
+        if existing_doc is not None:
+            existing_doc.filename = file.filename
+            existing_doc.document_key = document_key
+            existing_doc.status = "queued"
+            existing_doc.error_message = None
+            db.commit()
+            try:
+                queue.submit(IngestJob(document_id=existing_doc.id, path=path, config=config))
+            except QueueFullError as e:
+                existing_doc.status = "failed"
+                existing_doc.error_message = str(e)
+                db.commit()
+                raise HTTPException(status_code=503, detail=str(e))
+            
+            path = None
+            return JSONResponse(status_code=202, content={
+                "message": "Failed document queued for processing again",
+                "document_id": existing_doc.id,
+                "job_id": existing_doc.id,
+                "filename": file.filename,
+                "status": existing_doc.status
+            })
+        
+        previous_doc = find_document_by_key(db, document_key) if update else None
+        if previous_doc is not None and previous_doc.status in PENDING_STATUSES:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Document {previous_doc.id} is still being processed. Please retry later."
+            )
+        if previous_doc is not None and previous_doc.status == "completed":
+            previous_doc.status = "queued"
+            previous_doc.pending_filename = file.filename
+            previous_doc.document_key = document_key
+            db.commit()
+            new_version = {"filename": file.filename, "file_hash": file_hash}
+            try:
+                queue.submit(IngestJob(
+                    document_id=previous_doc.id, path=path, config=config, new_version=new_version
+                ))
+            except QueueFullError as e:
+                previous_doc.status = "completed"
+                previous_doc.pending_filename = None
+                db.commit()
+                raise HTTPException(status_code=503, detail=str(e))
+            
+            path = None
+            return JSONResponse(status_code=202, content={
+                "message": "Document update queued for processing",
+                "document_id": previous_doc.id,
+                "job_id": previous_doc.id,
+                "filename": file.filename,
+                "status": previous_doc.status,
+                "update": True
+            })
+        
         # Create document record
         doc_record = document.Document(
             filename=file.filename,
+            document_key=document_key,
             file_hash=file_hash,
-            status="processing"
+            status="queued"
         )
         db.add(doc_record)
         db.commit()
         db.refresh(doc_record)
         
         try:
-            # Parse PDF
-            parsed_content = parse_pdf(content)
-            
-            # Chunk text
-            chunker = TextChunker()
-            chunks = chunker.chunk_with_metadata(parsed_content, file.filename)
-            
-            # Get configuration
-            embedding_provider_name = await get_config_value(db, "embedding_provider") or "OpenAI"
-            embedding_model = await get_config_value(db, "embedding_model") or "text-embedding-3-small"
-            embedding_api_key = await get_config_value(db, "embedding_api_key")
-            vector_store_type = await get_config_value(db, "vector_store") or "faiss"
-            pgvector_url = await get_config_value(db, "pgvector_url")
-            
-            if not embedding_api_key and embedding_provider_name == "OpenAI":
-                raise HTTPException(
-                    status_code=400,
-                    detail="OpenAI API key not configured. Please configure in Settings."
-                )
-            
-            # Initialize provider and vector store
-            embedding_provider = get_embedding_provider(
-                provider_name=embedding_provider_name,
-                api_key=embedding_api_key,
-                model=embedding_model
-            )
-            
-            dimension = embedding_provider.get_dimension()
-            vector_store = get_vector_store(
-                store_type=vector_store_type,
-                dimension=dimension,
-                connection_string=pgvector_url
-            )
-            
-            # Generate embeddings
-            chunk_texts = [chunk["text"] for chunk in chunks]
-            embeddings = await embedding_provider.embed_batch(chunk_texts)
-            
-            # Prepare metadata
-            metadata_list = [
-                {
-                    "document_id": str(doc_record.id),
-                    "document_name": file.filename,
-                    "chunk_index": chunk["chunk_index"],
-                    "text": chunk["text"]
-                }
-                for chunk in chunks
-            ]
-            
-            # Generate IDs
-            ids = [f"{doc_record.id}_{i}" for i in range(len(chunks))]
-            
-            # Store in vector database
-            await vector_store.add_vectors(embeddings, metadata_list, ids)
-            
-            # Update document record
-            doc_record.num_chunks = len(chunks)
-            doc_record.status = "completed"
+            queue.submit(IngestJob(document_id=doc_record.id, path=path, config=config))
+        except QueueFullError as e:
+            db.delete(doc_record)
             db.commit()
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        # The spooled file now belongs to the job
+        path = None
+        return JSONResponse(status_code=202, content={
+            "message": "Document queued for processing",
+            "document_id": doc_record.id,
+            "job_id": doc_record.id,
+            "filename": file.filename,
+            "status": doc_record.status
+        })
             
-            return {
-                "message": "Document processed successfully",
-                "document_id": doc_record.id,
-                "filename": file.filename,
-                "num_chunks": len(chunks),
-                "embedding_provider": embedding_provider_name,
-                "embedding_model": embedding_model,
-                "vector_store": vector_store_type
-            }
-            
-        except Exception as e:
-            # Update document status to failed
-            doc_record.status = "failed"
-            doc_record.error_message = str(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+
+@router.post("/ingest/bulk")
+async def ingest_bulk(files: List[UploadFile] = File(...), db: Session = Depends(get_db)):
+    """
+    Upload many PDFs (and/or zip archives of PDFs) and ingest them as one job.
+
+    Files already indexed, or repeated in the upload, are skipped up front;
+    files of documents that failed are processed again.
+    Returns 202 with the bulk job ID and the new document IDs; poll
+    GET /ingest/bulk/{job_id} for progress.
+    """
+    try:
+        config = await get_ingest_config(db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    queue = get_ingest_queue()
+    if queue.is_full():
+        raise HTTPException(status_code=503, detail="Ingest queue is full. Please retry later.")
+
+    # (path, filename) of every PDF to ingest; all paths are removed on failure
+    files_to_ingest = []
+    try:
+        for file in files:
+            path, _ = await spool_upload(file, queue.spool_dir)
+            if (file.filename or "").lower().endswith(".zip"):
+                try:
+                    files_to_ingest.extend(
+                        await asyncio.to_thread(extract_zip_pdfs, path, queue.spool_dir)
+                    )
+                finally:
+                    os.unlink(path)
+            else:
+                files_to_ingest.append((path, file.filename))
+        
+        documents, duplicates = await register_documents(db, files_to_ingest)
+        new_paths = {doc.path for doc in documents}
+        for path, _ in files_to_ingest:
+            if path not in new_paths:
+                os.unlink(path)
+        files_to_ingest = [(doc.path, doc.filename) for doc in documents]
+        
+        response = {
+            "documents": [
+                {"document_id": doc.document_id, "filename": doc.filename}
+                for doc in documents
+            ],
+            "duplicates": duplicates
+        }
+        if not documents:
+            return {"message": "All documents already indexed", "job_id": None, **response}
+        
+        job = BulkIngestJob(job_id=uuid.uuid4().hex, documents=documents, config=config)
+        try:
+            queue.submit(job)
+        except QueueFullError as e:
+            db.query(document.Document).filter(
+                document.Document.id.in_([doc.document_id for doc in documents if not doc.retry])
+            ).delete(synchronize_session=False)
+            db.query(document.Document).filter(
+                document.Document.id.in_([doc.document_id for doc in documents if doc.retry])
+            ).update({"status": "failed", "error_message": str(e)}, synchronize_session=False)
             db.commit()
-            raise
-            
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        # The spooled files now belong to the job
+        files_to_ingest = []
+        return JSONResponse(status_code=202, content={
+            "message": f"{len(documents)} documents queued for processing",
+            "job_id": job.job_id,
+            **response
+        })
+        
     except HTTPException:
         raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for path, _ in files_to_ingest:
+            if os.path.exists(path):
+                os.unlink(path)
+
+@router.get("/ingest/bulk/{job_id}")
+async def get_bulk_ingest_job(job_id: str):
+    """
+    Report the progress of a bulk ingest job: documents parsed, completed
+    and failed, and chunks indexed. Per-document status is available from
+    GET /ingest/jobs/{document_id}.
+    """
+    progress = get_ingest_queue().get_progress(job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if "error" in progress:
+        status = "failed"
+    elif "finished_at" in progress:
+        status = "completed"
+    elif "started_at" in progress:
+        status = "processing"
+    else:
+        status = "queued"
+    return {"job_id": job_id, "status": status, "progress": progress}
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: int, db: Session = Depends(get_db)):
+    """
+    Report the progress of an ingest job.
+
+    status is the document's current stage (queued, parsing, chunking,
+    embedding, indexing, completed or failed); progress holds chunk counts
+    and timings while the server that ran the job is still up.
+    """
+    doc = db.query(document.Document).filter(document.Document.id == job_id).first()
+    if not doc:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": doc.id,
+        "document_id": doc.id,
+        "filename": doc.filename,
+        "status": doc.status,
+        "num_chunks": doc.num_chunks,
+        "error_message": doc.error_message,
+        "progress": get_ingest_queue().get_progress(doc.id)
+    }
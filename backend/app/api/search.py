@@ -0,0 +1,180 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+import asyncio
+import json
+import numpy as np
+import traceback
+
+from app.core.config import settings
+from app.database.database import get_db
+from app.models import schemas
+from app.providers.factory import get_embedding_provider
+from app.services.config_service import (
+    get_configured_embedding_provider,
+    get_configured_vector_store,
+    get_embedding_settings,
+    get_rerank_settings,
+)
+from app.services.dedup import get_references
+from app.services.hybrid_search import SEARCH_MODES, reciprocal_rank_fusion
+from app.services.query_cache import query_cache
+from app.services.reranker import get_reranker
+from app.services.vector_stores.filters import normalize_filters
+
+router = APIRouter()
+
+def with_references(db: Session, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Add to each result the near-duplicate chunks of other documents
+    indexed with a copy of its vector ("references"). Read on every
+    request, since a reference can be added for a result that is cached.
+    """
+    references = get_references(db, [result["id"] for result in results if "id" in result])
+    return [{**result, "references": references.get(result.get("id"), [])} for result in results]
+
+async def run_search(request: schemas.SearchRequest, db: Session) -> Dict[str, Any]:
+    """
+    Run one search (see the search endpoint) and return the SearchResponse
+    dict. Also used by the chat endpoint to retrieve context.
+    Invalid requests raise HTTPException or ValueError.
+    """
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="query must not be empty")
+    if request.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+    if request.mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {SEARCH_MODES}")
+
+    embedding_settings = await get_embedding_settings(db)
+    namespace = f"{embedding_settings['provider_name']}/{embedding_settings['model']}"
+    vector = query_cache.get_embedding(namespace, request.query)
+    embedding_provider = None
+    if vector is not None:
+        # The cached vector gives the dimension without building the provider
+        dimension = len(vector)
+    else:
+        embedding_provider = get_embedding_provider(**embedding_settings)
+        # Local providers load their model to report it
+        dimension = await asyncio.to_thread(embedding_provider.get_dimension)
+
+    filters = dict(request.filters or {})
+    if request.document_ids is not None:
+        filters["document_id"] = request.document_ids
+    filters = normalize_filters(filters)
+
+    vector_store = await get_configured_vector_store(db, dimension)
+    mode = request.mode
+    if mode != "vector" and not vector_store.supports_lexical_search:
+        if mode == "lexical":
+            raise HTTPException(status_code=400, detail="The configured vector store has no lexical index")
+        mode = "vector"
+
+    # Lexical search needs no embedding (nor a reachable embedding provider)
+    if vector is None and mode != "lexical":
+        vector = query_cache.put_embedding(
+            namespace, request.query, await embedding_provider.embed_text(request.query)
+        )
+
+    rerank_settings = await get_rerank_settings(db)
+    rerank_model = rerank_settings["model"] if request.rerank is not False else None
+    if request.rerank and rerank_model is None:
+        raise HTTPException(status_code=400, detail="Re-ranking needs a rerank_model in configuration")
+    # Candidates retrieved: re-ranking picks top_k out of more
+    top_n = max(request.top_k, rerank_settings["candidates"]) if rerank_model else request.top_k
+
+    key = (
+        namespace, request.query, request.top_k, mode, rerank_model and (rerank_model, top_n),
+        json.dumps(filters, sort_keys=True, default=str) if filters is not None else None
+    )
+    results = query_cache.get_results(vector_store, key)
+    if results is not None:
+        return {
+            "query": request.query, "results": with_references(db, results), "cached": True,
+            "mode": mode, "reranked": rerank_model is not None
+        }
+
+    version = vector_store.version
+    if mode == "vector":
+        results = await vector_store.search(vector, top_n, filters=filters)
+    elif mode == "lexical":
+        results = await vector_store.search_text(request.query, top_n, filters=filters)
+    else:
+        candidates = max(top_n, settings.HYBRID_SEARCH_CANDIDATES)
+        results = reciprocal_rank_fusion(
+            [
+                ("vector", await vector_store.search(vector, candidates, filters=filters)),
+                ("lexical", await vector_store.search_text(request.query, candidates, filters=filters)),
+            ],
+            top_n,
+            k=settings.HYBRID_RRF_K
+        )
+    reranked = False
+    if rerank_model is not None:
+        results, reranked = await get_reranker(rerank_model).rerank(
+            request.query, results, request.top_k, rerank_settings["budget_seconds"]
+        )
+    if reranked or rerank_model is None:
+        query_cache.put_results(vector_store, version, key, results)
+    return {
+        "query": request.query, "results": with_references(db, results), "cached": False,
+        "mode": mode, "reranked": reranked
+    }
+
+@router.post("/search", response_model=schemas.SearchResponse)
+async def search(request: schemas.SearchRequest, db: Session = Depends(get_db)):
+    """
+    Embed a query and return the most similar chunks (lexical mode doesn't
+    embed it).
+    In hybrid mode the vector and BM25 top candidates are fused by
+    reciprocal rank, so exact terms (part numbers, clause ids) are found
+    even when the embedding misses them.
+    Query embeddings and results are cached in memory; cached results are
+    dropped as soon as the vector store changes.
+    Each result lists the near-duplicate chunks that share its vector.
+    With re-ranking, the top rerank_candidates are re-ordered by a local
+    cross-encoder; over rerank_budget_ms they are returned in search
+    order instead (reranked is false, and the result isn't cached).
+    """
+    try:
+        return await run_search(request, db)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/search/batch", response_model=schemas.BatchSearchResponse)
+async def search_batch(request: schemas.BatchSearchRequest, db: Session = Depends(get_db)):
+    """
+    Search many queries in one call (evaluation and re-ranking jobs).
+    Query texts are embedded in one batch and searched with a single index call.
+    """
+    if (request.queries is None) == (request.vectors is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of 'queries' or 'vectors'")
+    if request.top_k < 1:
+        raise HTTPException(status_code=400, detail="top_k must be at least 1")
+
+    try:
+        embedding_provider = await get_configured_embedding_provider(db)
+        if request.queries is not None:
+            if not request.queries:
+                return {"results": []}
+            vectors = await embedding_provider.embed_batch(request.queries)
+        else:
+            if not request.vectors:
+                return {"results": []}
+            vectors = request.vectors
+
+        vector_store = await get_configured_vector_store(db, embedding_provider.get_dimension())
+        results = await vector_store.search_batch(
+            np.array(vectors, dtype="float32"), request.top_k, filters=request.filters
+        )
+        return {"results": results}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
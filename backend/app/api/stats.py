@@ -0,0 +1,52 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List
+
+from app.database.database import get_db
+from app.services.chat import chat_metrics
+from app.services.dedup import get_dedup_stats
+from app.services.embedding_cache import get_embedding_cache
+from app.services.ingest_queue import get_ingest_queue
+from app.services.query_cache import query_cache
+from app.services.reranker import get_reranker_stats
+from app.services.vector_stores.registry import vector_store_registry
+
+router = APIRouter()
+
+@router.get("/stats/vector-stores", response_model=List[Dict[str, Any]])
+def get_vector_store_stats():
+    """Load time, size and memory use of every loaded vector store"""
+    return vector_store_registry.get_stats()
+
+@router.get("/stats/embedding-cache", response_model=Dict[str, Any])
+def get_embedding_cache_stats():
+    """Size and hit rate of the embedding cache"""
+    cache = get_embedding_cache()
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.get_stats()}
+
+@router.get("/stats/ingest-queue", response_model=Dict[str, Any])
+def get_ingest_queue_stats():
+    """Worker count and backlog of the ingest job queue"""
+    return get_ingest_queue().get_stats()
+
+@router.get("/stats/query-cache", response_model=Dict[str, Any])
+def get_query_cache_stats():
+    """Size and hit rates of the search endpoint's embedding and result caches"""
+    return query_cache.get_stats()
+
+@router.get("/stats/reranker", response_model=List[Dict[str, Any]])
+def get_reranker_stats_endpoint():
+    """Score cache hit rate, latency and budget fallbacks of each cross-encoder reranker"""
+    return get_reranker_stats()
+
+@router.get("/stats/chat", response_model=Dict[str, Any])
+def get_chat_stats():
+    """Time to first token, tokens/sec and retrieval time of recent chat requests"""
+    return chat_metrics.get_stats()
+
+@router.get("/stats/dedup", response_model=Dict[str, Any])
+def get_chunk_dedup_stats(db: Session = Depends(get_db)):
+    """Near-duplicate chunks indexed with a copy of another chunk's vector instead of being embedded"""
+    return get_dedup_stats(db)
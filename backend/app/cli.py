@@ -0,0 +1,113 @@
+"""
+Command line tools.
+
+Usage (from the backend directory):
+    python -m app.cli ingest <directory> [--recursive]
+
+Bulk ingest writes to the configured vector store directly; stop the API
+server first when using the FAISS store, since both would own its files.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from app.database.database import engine, Base, SessionLocal, add_missing_columns
+from app.models import configuration, document
+
+
+def find_pdfs(directory: str, recursive: bool) -> list:
+    if recursive:
+        walk = os.walk(directory)
+    else:
+        walk = [(directory, [], os.listdir(directory))]
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in walk
+        for name in names
+        if name.lower().endswith(".pdf")
+    )
+
+
+async def report_progress(progress: dict, interval: float = 2.0) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        print(
+            f"  parsed {progress.get('documents_parsed', 0)}/{progress.get('documents_total', 0)}, "
+            f"completed {progress.get('documents_completed', 0)}, "
+            f"failed {progress.get('documents_failed', 0)}, "
+            f"chunks indexed {progress.get('chunks_indexed', 0)}"
+        )
+
+
+async def ingest(directory: str, recursive: bool) -> int:
+    from app.providers.clients import close_clients
+    from app.services.bulk_ingestion import bulk_ingest, register_documents
+    from app.services.ingestion import get_ingest_config
+    from app.services.pdf_parser import pdf_parser
+    from app.services.vector_stores.registry import vector_store_registry
+
+    paths = find_pdfs(directory, recursive)
+    if not paths:
+        print(f"No PDF files found in {directory}")
+        return 1
+
+    Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    db = SessionLocal()
+    reporter = None
+    try:
+        try:
+            config = await get_ingest_config(db)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return 1
+
+        documents, duplicates = await register_documents(
+            db, [(path, os.path.basename(path)) for path in paths]
+        )
+        print(f"Found {len(paths)} PDFs: {len(documents)} new, {len(duplicates)} already indexed")
+        if not documents:
+            return 0
+
+        started = time.perf_counter()
+        progress = {}
+        reporter = asyncio.create_task(report_progress(progress))
+        result = await bulk_ingest(db, documents, config, progress)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Done in {elapsed:.1f}s: {result['documents_completed']} documents completed, "
+            f"{result['documents_failed']} failed, {result['chunks_indexed']} chunks indexed"
+        )
+        return 0 if result["documents_failed"] == 0 else 2
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        db.close()
+        vector_store_registry.clear()
+        await close_clients()
+        pdf_parser.shutdown()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="RAG Framework tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = commands.add_parser("ingest", help="Bulk ingest a directory of PDFs")
+    ingest_parser.add_argument("directory", help="Directory containing PDF files")
+    ingest_parser.add_argument(
+        "-r", "--recursive", action="store_true", help="Include PDFs in subdirectories"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "ingest":
+        if not os.path.isdir(args.directory):
+            print(f"Not a directory: {args.directory}")
+            return 1
+        return asyncio.run(ingest(args.directory, args.recursive))
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,96 @@ class Settings(BaseSettings):
     PROJECT_VERSION: str = "0.1.0"
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:5173"]  # Vite default port
 
+    # Pooled HTTP clients for OpenAI-compatible APIs
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 60.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+
+    # Embedding requests: per-request limits, and concurrency per API endpoint (all callers together)
+    EMBEDDING_MAX_BATCH_ITEMS: int = 128
+    EMBEDDING_MAX_BATCH_TOKENS: int = 100000
+    EMBEDDING_MAX_IN_FLIGHT: int = 4
+    EMBEDDING_MAX_RETRIES: int = 6
+
+    # Content-addressed embedding cache (SQLite)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1000000
+
+    # In-memory caches of the search endpoint: query embeddings (LRU) and results (LRU + TTL)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024
+    QUERY_RESULT_CACHE_SIZE: int = 1024
+    QUERY_RESULT_CACHE_TTL_SECONDS: float = 300.0
+
+    # Local (HuggingFace) embeddings: backend is torch or onnx; quantize uses int8 ONNX weights
+    HF_EMBEDDING_BACKEND: str = "torch"
+    HF_EMBEDDING_QUANTIZE: bool = False
+    HF_EMBEDDING_DEVICE: str = "cpu"
+    HF_EMBEDDING_WORKERS: int = 2
+    HF_EMBEDDING_MAX_BATCH_TOKENS: int = 8192
+
+    # FAISS persistence: WAL size that triggers a background snapshot
+    FAISS_WAL_COMPACT_BYTES: int = 64 * 1024 * 1024
+    FAISS_WAL_FSYNC: bool = True
+    # Fraction of deleted-but-unremoved vectors that triggers an index rebuild
+    FAISS_TOMBSTONE_REBUILD_RATIO: float = 0.2
+    # Vectors needed before IVF/IVFPQ indexes are trained (flat until then)
+    FAISS_TRAIN_MIN_VECTORS: int = 10000
+    # BM25 index over chunk text kept next to the FAISS index (hybrid search)
+    FAISS_LEXICAL_INDEX: bool = True
+
+    # Hybrid search: candidates taken from each retriever, and the reciprocal rank fusion constant
+    HYBRID_SEARCH_CANDIDATES: int = 50
+    HYBRID_RRF_K: int = 60
+
+    # Cross-encoder re-ranking of search results (enabled by the rerank_model configuration item)
+    RERANK_BACKEND: str = "torch"
+    RERANK_DEVICE: str = "cpu"
+    RERANK_MAX_BATCH_TOKENS: int = 16384
+    RERANK_MAX_LENGTH: int = 512
+    RERANK_CACHE_SIZE: int = 100000
+
+    # Chat answers: defaults of the chat endpoint, estimated tokens of retrieved
+    # chunks put in the prompt, requests kept for latency percentiles, and
+    # retries of rate-limited or failed LLM calls (streams: before the first token)
+    CHAT_MAX_TOKENS: int = 500
+    CHAT_TEMPERATURE: float = 0.7
+    CHAT_CONTEXT_MAX_TOKENS: int = 3000
+    CHAT_METRICS_WINDOW: int = 1000
+    CHAT_MAX_RETRIES: int = 3
+
+    # pgvector connection pool
+    PGVECTOR_POOL_MIN_SIZE: int = 1
+    PGVECTOR_POOL_MAX_SIZE: int = 10
+
+    # Background ingestion: concurrent jobs and how many may wait in the queue
+    INGEST_WORKERS: int = 2
+    INGEST_QUEUE_SIZE: int = 16
+    # Uploads are spooled here while queued; chunks are embedded and indexed in batches
+    INGEST_SPOOL_DIR: str = "ingest_spool"
+    INGEST_EMBED_BATCH_SIZE: int = 256
+    INGEST_STAGE_QUEUE_SIZE: int = 2
+    # Chunks per embedding batch in bulk ingest, pooled across documents
+    INGEST_BULK_BATCH_SIZE: int = 2048
+
+    # Chunking: sizes in tokens of CHUNK_TOKENIZER (a tiktoken encoding, a
+    # HuggingFace tokenizer name or directory, or "approx")
+    CHUNK_SIZE_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 50
+    CHUNK_TOKENIZER: str = "cl100k_base"
+    # Near-duplicate chunks (SimHash fingerprints at most CHUNK_DEDUP_MAX_DISTANCE
+    # of 64 bits apart) are indexed with a copy of the first one's vector instead
+    # of being embedded; 0 only matches chunks with the same words
+    CHUNK_DEDUP_ENABLED: bool = False
+    CHUNK_DEDUP_MAX_DISTANCE: int = 0
+
+    # PDF parsing: worker processes, and how large PDFs are split into page ranges
+    PDF_PARSE_WORKERS: int = 4
+    PDF_PAGES_PER_TASK: int = 25
+    PDF_SPLIT_MIN_PAGES: int = 50
+
     class Config:
         case_sensitive = True
 
@@ -1,13 +1,40 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.database.database import engine, Base
+from app.database.database import engine, Base, SessionLocal, add_missing_columns
 from app.models import configuration, document
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns()
 
-app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the configured vector store once so the first request doesn't pay for it
+    from app.services.config_service import get_configured_vector_store
+    from app.services.vector_stores.registry import vector_store_registry
+    from app.providers.clients import close_clients
+    from app.services.ingest_queue import get_ingest_queue
+    from app.services.pdf_parser import pdf_parser
+    db = SessionLocal()
+    try:
+        vector_store = await get_configured_vector_store(db)
+        stats = vector_store.get_stats()
+        print(f"Loaded vector store: {stats}")
+    except Exception as e:
+        print(f"Warning: Could not preload vector store: {e}")
+    finally:
+        db.close()
+    ingest_queue = get_ingest_queue()
+    await ingest_queue.start()
+    yield
+    await ingest_queue.stop()
+    pdf_parser.shutdown()
+    vector_store_registry.clear()
+    await close_clients()
+
+app = FastAPI(title=settings.PROJECT_NAME, version=settings.PROJECT_VERSION, lifespan=lifespan)
 
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
@@ -19,10 +46,13 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
-from app.api import ingest, config, documents
+from app.api import ingest, config, documents, search, chat, stats
 app.include_router(ingest.router, prefix="/api/v1", tags=["ingest"])
 app.include_router(config.router, prefix="/api/v1", tags=["config"])
 app.include_router(documents.router, prefix="/api/v1", tags=["documents"])
+app.include_router(search.router, prefix="/api/v1", tags=["search"])
+app.include_router(chat.router, prefix="/api/v1", tags=["chat"])
+app.include_router(stats.router, prefix="/api/v1", tags=["stats"])
 
 @app.get("/")
 def root():
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import BigInteger, Column, ForeignKey, Integer, String, DateTime, Text
+from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database.database import Base
 
@@ -7,8 +8,33 @@ class Document(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
+    # Identifies the versions of a document across uploads (defaults to the filename)
+    document_key = Column(String, nullable=True, index=True)
     file_hash = Column(String, unique=True, index=True)
     upload_date = Column(DateTime, default=datetime.utcnow)
     num_chunks = Column(Integer, default=0)
-    status = Column(String, default="processing")  # processing, completed, failed
+    status = Column(String, default="processing")  # queued, parsing, chunking, embedding, indexing, completed, failed
     error_message = Column(Text, nullable=True)
+    # Filename of a new version queued or being indexed; the indexed version stays until it completes
+    pending_filename = Column(String, nullable=True)
+
+    chunks = relationship(
+        "DocumentChunk", cascade="all, delete-orphan", order_by="DocumentChunk.chunk_index"
+    )
+
+class DocumentChunk(Base):
+    """
+    Content hash and vector id of each chunk of a document's indexed version.
+    A near duplicate of a chunk indexed before was not embedded:
+    canonical_id is the vector it was indexed with a copy of.
+    """
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    chunk_hash = Column(String, nullable=False)
+    vector_id = Column(String, nullable=False)
+    canonical_id = Column(String, nullable=True, index=True)
+    # SimHash fingerprint of the text, stored as a signed 64-bit integer
+    simhash = Column(BigInteger, nullable=True)
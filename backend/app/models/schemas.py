@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Any
 
 class ConfigItemCreate(BaseModel):
     config_name: str
@@ -19,3 +19,52 @@ class ConfigurationCreate(BaseModel):
 class ConfigurationResponse(BaseModel):
     """Response with all active configs"""
     configs: Dict[str, Optional[str]]
+
+class SearchRequest(BaseModel):
+    """
+    A single query, optionally filtered on metadata fields, e.g.
+    {"document_name": ["a.pdf", "b.pdf"], "section": "intro"}.
+    document_ids is shorthand for a document_id filter.
+    mode is vector (embeddings), lexical (BM25 over chunk text) or hybrid
+    (both, fused by reciprocal rank); hybrid falls back to vector on
+    stores without a lexical index.
+    rerank re-orders the top candidates with the configured cross-encoder
+    (default: whenever rerank_model is configured).
+    """
+    query: str
+    top_k: int = 5
+    document_ids: Optional[List[str]] = None
+    filters: Optional[Dict[str, Any]] = None
+    mode: str = "hybrid"
+    rerank: Optional[bool] = None
+
+class SearchResponse(BaseModel):
+    """
+    Matching chunks, best first; cached is true when served from the
+    result cache, reranked when ordered by the cross-encoder
+    """
+    query: str
+    results: List[Dict[str, Any]]
+    cached: bool = False
+    mode: str = "vector"
+    reranked: bool = False
+
+class ChatRequest(SearchRequest):
+    """
+    A question answered by the configured LLM from retrieved chunks; the
+    search fields select the context. max_tokens and temperature default
+    to CHAT_MAX_TOKENS and CHAT_TEMPERATURE.
+    """
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+class BatchSearchRequest(BaseModel):
+    """Many queries at once, given either as texts or as precomputed vectors"""
+    queries: Optional[List[str]] = None
+    vectors: Optional[List[List[float]]] = None
+    top_k: int = 5
+    filters: Optional[Dict[str, Any]] = None
+
+class BatchSearchResponse(BaseModel):
+    """One result list per query, in request order"""
+    results: List[List[Dict[str, Any]]]
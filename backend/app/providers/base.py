@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import numpy as np
 
 class EmbeddingProvider(ABC):
     """Abstract base class for embedding providers"""
@@ -43,6 +45,10 @@ class EmbeddingProvider(ABC):
 
 class VectorStore(ABC):
     """Abstract base class for vector stores"""
+
+    # Incremented by every write that can change search results, so cached
+    # results can be checked against the version they were computed at
+    version: int = 0
     
     @abstractmethod
     async def add_vectors(
@@ -65,7 +71,8 @@ class VectorStore(ABC):
     async def search(
         self,
         query_vector: List[float],
-        top_k: int = 5
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for similar vectors
@@ -73,6 +80,8 @@ class VectorStore(ABC):
         Args:
             query_vector: Query embedding vector
             top_k: Number of results to return
+            filters: Optional metadata filters, {field: value or [values]};
+                values of a field are alternatives, fields must all match
             
         Returns:
             List of results with metadata and scores
@@ -80,15 +89,110 @@ class VectorStore(ABC):
         pass
     
     @abstractmethod
-    async def delete_by_document(self, document_id: str) -> None:
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for similar vectors for many queries at once
+        
+        Args:
+            query_vectors: 2-D float32 array, one query per row
+            top_k: Number of results to return per query
+            filters: Optional metadata filters, {field: value or [values]};
+                values of a field are alternatives, fields must all match
+            
+        Returns:
+            One list of results (with metadata and scores) per query
+        """
+        pass
+
+    # Whether search_text is available (the store keeps a lexical index)
+    supports_lexical_search: bool = False
+
+    async def search_text(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Lexical (BM25) search over chunk text, for exact terms such as part
+        numbers that embeddings retrieve poorly
+
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            filters: Optional metadata filters, as for search
+
+        Returns:
+            List of results with metadata and BM25 scores (higher is better)
+        """
+        raise NotImplementedError(f"{type(self).__name__} has no lexical index")
+
+    @abstractmethod
+    async def delete_by_document(self, document_id: str, keep_ids: Optional[List[str]] = None) -> None:
         """
         Delete all vectors associated with a document
         
         Args:
             document_id: Document identifier
+            keep_ids: Optional IDs of vectors to keep, e.g. the indexed
+                version's chunks when an update of it was interrupted
         """
         pass
 
+    @abstractmethod
+    async def delete_vectors(self, document_id: str, ids: List[str]) -> None:
+        """
+        Delete some of a document's vectors, e.g. the chunks that vanished
+        from a new version of it. Unknown ids are ignored.
+        
+        Args:
+            document_id: Document identifier
+            ids: IDs of the vectors to delete
+        """
+        pass
+
+    @abstractmethod
+    async def get_vectors(self, document_id: str, ids: List[str]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """
+        Read back stored vectors of a document, e.g. to copy them to
+        another id. Unknown ids are skipped.
+        
+        Args:
+            document_id: Document identifier
+            ids: IDs of the vectors to read
+            
+        Returns:
+            Tuple of (float32 array, one row per found id; metadata
+            dicts with "id", in the same order)
+        """
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report size and resource usage of the store
+        
+        Returns:
+            Dictionary of store statistics
+        """
+        return {"store_type": type(self).__name__}
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        """
+        Defer per-write durability work (syncs, snapshots) until the block
+        exits, then flush once. Used when loading many documents at a time.
+        """
+        yield
+
+    def close(self) -> None:
+        """Flush pending work and release resources held by the store"""
+        pass
+
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
@@ -114,3 +218,28 @@ class LLMProvider(ABC):
             Generated text
         """
         pass
+
+    @abstractmethod
+    def stream(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        max_tokens: int = 500,
+        temperature: float = 0.7,
+        usage: Optional[Dict[str, int]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate text completion, yielding text as it is produced
+        
+        Args:
+            prompt: User prompt
+            system_prompt: Optional system prompt
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            usage: Optional dict filled with prompt_tokens and
+                completion_tokens when the API reports them
+            
+        Returns:
+            Async iterator of text pieces (closing it cancels generation)
+        """
+        pass
@@ -0,0 +1,62 @@
+from typing import Dict, Optional, Tuple
+import threading
+import httpx
+import openai
+
+from app.core.config import settings
+
+_clients: Dict[Tuple[Optional[str], Optional[str]], openai.AsyncOpenAI] = {}
+_lock = threading.Lock()
+
+
+def get_async_openai_client(api_key: str, base_url: str = None) -> openai.AsyncOpenAI:
+    """
+    Shared async client for an OpenAI-compatible API.
+
+    Providers are built per request, but clients are cached per
+    (api_key, base_url) so every request reuses the same connection pool
+    and its keep-alive connections.
+
+    Args:
+        api_key: API key
+        base_url: API base URL (None for api.openai.com)
+
+    Returns:
+        openai.AsyncOpenAI client (retries are left to the caller)
+    """
+    key = (api_key, base_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+                )
+            )
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_client,
+                timeout=openai.Timeout(
+                    settings.HTTP_TIMEOUT_SECONDS,
+                    connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+                ),
+                max_retries=0
+            )
+            _clients[key] = client
+        return client
+
+
+async def close_clients() -> None:
+    """Close all pooled clients (application shutdown)"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        await client.close()
@@ -0,0 +1,240 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import asyncio
+import random
+import threading
+import time
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After header of an HTTP error response, in seconds"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, overloaded servers and dropped connections are worth retrying"""
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    name = type(error).__name__
+    return name in ("APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout")
+
+
+def retry_delay(error: Exception, attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """
+    Seconds to wait before retrying after error: the server's Retry-After,
+    else exponential backoff (attempt counts from 0) with jitter so
+    parallel requests spread out; at most max_delay
+    """
+    delay = _retry_after_seconds(error)
+    if delay is None:
+        delay = min(max_delay, base_delay * 2 ** attempt)
+        delay *= random.uniform(0.5, 1.0)
+    return min(delay, max_delay)
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+class RequestLimiter:
+    """
+    Concurrency limit and rate-limit cool-down shared by every caller of
+    one provider endpoint, so concurrent ingest jobs together stay within
+    max_in_flight requests and a 429 pauses all of them, not just the
+    request that got it.
+    """
+
+    def __init__(self, max_in_flight: int = 4):
+        """
+        Initialize request limiter
+
+        Args:
+            max_in_flight: Maximum concurrent requests
+        """
+        self.max_in_flight = max_in_flight
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        # time.monotonic() before which no request is sent
+        self._resume_at = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the max_in_flight slots, once any cool-down is over"""
+        async with self._semaphore:
+            while True:
+                delay = self._resume_at - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            yield
+
+    def cool_down(self, seconds: float) -> None:
+        """Hold back every request for at least seconds"""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+_limiters: Dict[Hashable, RequestLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_request_limiter(key: Hashable, max_in_flight: int) -> RequestLimiter:
+    """
+    Process-wide limiter of an endpoint, e.g. keyed by (api_key, base_url)
+    like the pooled clients (created with max_in_flight on first use)
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RequestLimiter(max_in_flight)
+            _limiters[key] = limiter
+        return limiter
+
+
+class EmbeddingBatcher:
+    """
+    Splits texts into sub-batches that respect the provider's per-request
+    item and token limits, sends them concurrently (bounded by max_in_flight),
+    retries rate-limited or failed sub-batches with backoff, and returns the
+    embeddings in input order.
+
+    The in-flight limit and rate-limit cool-down belong to a RequestLimiter,
+    which providers share per API client (see get_request_limiter); without
+    one the batcher's own limiter applies to all of its calls.
+    """
+
+    def __init__(
+        self,
+        max_batch_items: int = 128,
+        max_batch_tokens: int = 100_000,
+        max_in_flight: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        count_tokens: Callable[[str], int] = estimate_tokens
+    ):
+        """
+        Initialize embedding batcher
+
+        Args:
+            max_batch_items: Maximum texts per request
+            max_batch_tokens: Maximum (estimated) tokens per request
+            max_in_flight: Maximum concurrent requests
+            max_retries: Attempts per sub-batch after the first one
+            base_delay: First backoff delay in seconds
+            max_delay: Upper bound for a single backoff delay
+            count_tokens: Function estimating the token count of a text
+        """
+        self.max_batch_items = max_batch_items
+        self.max_batch_tokens = max_batch_tokens
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.count_tokens = count_tokens
+        self.limiter = RequestLimiter(max_in_flight)
+
+    def split(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """
+        Split texts into [start, end) ranges within the item and token budgets
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            List of (start, end) index ranges
+        """
+        ranges = []
+        start = 0
+        tokens = 0
+        for i, text in enumerate(texts):
+            text_tokens = self.count_tokens(text)
+            if i > start and (
+                i - start >= self.max_batch_items
+                or tokens + text_tokens > self.max_batch_tokens
+            ):
+                ranges.append((start, i))
+                start = i
+                tokens = 0
+            tokens += text_tokens
+        if start < len(texts):
+            ranges.append((start, len(texts)))
+        return ranges
+
+    async def run(
+        self,
+        texts: List[str],
+        send: Callable[[List[str]], Awaitable[List[List[float]]]],
+        limiter: Optional[RequestLimiter] = None
+    ) -> List[List[float]]:
+        """
+        Embed texts through send(), one call per sub-batch
+
+        Args:
+            texts: Input texts
+            send: Coroutine function embedding one sub-batch
+            limiter: Limiter shared with other callers of the same endpoint
+                (default: the batcher's own)
+
+        Returns:
+            Embeddings in the same order as texts
+        """
+        if not texts:
+            return []
+
+        limiter = limiter or self.limiter
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        async def run_batch(start: int, end: int):
+            embeddings = await self._send_with_retry(texts[start:end], send, limiter)
+            if len(embeddings) != end - start:
+                raise ValueError(
+                    f"Provider returned {len(embeddings)} embeddings for {end - start} inputs"
+                )
+            results[start:end] = embeddings
+
+        await asyncio.gather(*(run_batch(start, end) for start, end in self.split(texts)))
+        return results
+
+    async def _send_with_retry(
+        self,
+        batch: List[str],
+        send: Callable[[List[str]], Awaitable[List[List[float]]]],
+        limiter: RequestLimiter
+    ) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                async with limiter.slot():
+                    return await send(batch)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_delay(e, attempt, self.base_delay, self.max_delay)
+                attempt += 1
+                print(f"Embedding request failed ({e.__class__.__name__}), retry {attempt} in {delay:.1f}s")
+                if _is_rate_limited(e):
+                    # The limit is the endpoint's: hold back every caller, not just this batch
+                    limiter.cool_down(delay)
+                else:
+                    await asyncio.sleep(delay)
@@ -1,22 +1,30 @@
 from app.providers.base import EmbeddingProvider
+from app.providers.clients import get_async_openai_client
+from app.providers.embedding.batching import EmbeddingBatcher, get_request_limiter
 from typing import List
-import openai
 
 class DeepInfraEmbeddingProvider(EmbeddingProvider):
     """DeepInfra embedding provider using OpenAI-compatible API"""
     
-    def __init__(self, api_key: str, model: str = "BAAI/bge-base-en-v1.5"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "BAAI/bge-base-en-v1.5",
+        batcher: EmbeddingBatcher = None
+    ):
         """
         Initialize DeepInfra embedding provider
         
         Args:
             api_key: DeepInfra API key
             model: Model name (BAAI/bge-base-en-v1.5, sentence-transformers/all-MiniLM-L6-v2, etc.)
+            batcher: Splits and parallelizes large batches (retries are handled there)
         """
-        self.client = openai.OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepinfra.com/v1/openai"
-        )
+        base_url = "https://api.deepinfra.com/v1/openai"
+        self.client = get_async_openai_client(api_key, base_url=base_url)
+        self.batcher = batcher or EmbeddingBatcher()
+        # Shared with every provider on this client, like its connection pool
+        self.limiter = get_request_limiter((api_key, base_url), self.batcher.max_in_flight)
         self.model = model
         
         # Model dimensions (approximate)
@@ -29,15 +37,16 @@ class DeepInfraEmbeddingProvider(EmbeddingProvider):
     
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=text
-        )
-        return response.data[0].embedding
+        embeddings = await self.batcher.run([text], self._embed_request, self.limiter)
+        return embeddings[0]
     
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        response = self.client.embeddings.create(
+        """Generate embeddings for multiple texts, split into concurrent sub-batches"""
+        return await self.batcher.run(texts, self._embed_request, self.limiter)
+    
+    async def _embed_request(self, texts: List[str]) -> List[List[float]]:
+        """One embeddings API call on the shared async client"""
+        response = await self.client.embeddings.create(
             model=self.model,
             input=texts
         )
@@ -1,18 +1,213 @@
 from app.providers.base import EmbeddingProvider
-from typing import List
+from app.providers.embedding.batching import estimate_tokens
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import os
+import threading
+import numpy as np
+
+# Models loaded in this process, keyed by (model, backend, quantize, device).
+# Loading a model takes seconds and hundreds of MB, so it happens once.
+_models: Dict[Tuple[str, str, bool, str], Any] = {}
+_models_lock = threading.Lock()
+
+# Pre-quantized ONNX weights published alongside many sentence-transformers models
+_QUANTIZED_ONNX_FILES = (
+    "onnx/model_qint8_avx512_vnni.onnx",
+    "onnx/model_quint8_avx2.onnx",
+    "onnx/model_qint8_arm64.onnx",
+)
+
+
+def load_model(model: str, backend: str = "torch", quantize: bool = False, device: str = "cpu"):
+    """
+    Load a sentence-transformers model once per process
+
+    Args:
+        model: Hub model name or local directory
+        backend: torch or onnx (ONNX Runtime)
+        quantize: With onnx, use int8 dynamically quantized weights
+        device: Device for the torch backend
+
+    Returns:
+        SentenceTransformer instance shared by all providers
+    """
+    key = (model, backend, quantize, device)
+    with _models_lock:
+        if key in _models:
+            return _models[key]
+
+        from sentence_transformers import SentenceTransformer
+        if backend == "onnx":
+            loaded = None
+            if quantize:
+                for file_name in _QUANTIZED_ONNX_FILES:
+                    try:
+                        loaded = SentenceTransformer(
+                            model, backend="onnx", model_kwargs={"file_name": file_name}
+                        )
+                        break
+                    except Exception:
+                        continue
+                if loaded is None:
+                    loaded = _quantize_onnx(model)
+            if loaded is None:
+                loaded = SentenceTransformer(model, backend="onnx")
+        elif backend == "torch":
+            loaded = SentenceTransformer(model, device=device)
+        else:
+            raise ValueError(f"Unknown embedding backend: {backend}. Expected torch or onnx")
+
+        _models[key] = loaded
+        return loaded
+
+
+def _quantize_onnx(model: str):
+    """Export the ONNX model with int8 dynamic quantization when no quantized file is published"""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    try:
+        onnx_model = SentenceTransformer(model, backend="onnx")
+        save_dir = os.path.join("models", model.replace("/", "__") + "-onnx-qint8")
+        # Save the full model first so the directory loads like a hub model
+        onnx_model.save(save_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, "avx2", save_dir)
+        return SentenceTransformer(
+            save_dir, backend="onnx", model_kwargs={"file_name": "onnx/model_quint8_avx2.onnx"}
+        )
+    except Exception as e:
+        print(f"Warning: Could not quantize {model} ({e}), using full precision ONNX")
+        return None
+
 
 class HuggingFaceEmbeddingProvider(EmbeddingProvider):
-    """HuggingFace local embedding provider - STUB for future implementation"""
-    
-    def __init__(self, model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    """
+    Local sentence-transformers embedding provider.
+
+    Inputs are sorted by length and packed into batches under a padded
+    token budget, so short texts aren't padded to the length of long ones.
+    Batches run concurrently on a small thread pool (the inference
+    libraries release the GIL), with the intra-op threads per batch
+    reduced so the pool doesn't oversubscribe the CPU cores.
+    """
+
+    # Thread pools are shared per worker count, like the models themselves
+    _executors: Dict[int, ThreadPoolExecutor] = {}
+
+    def __init__(
+        self,
+        model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str = "torch",
+        quantize: bool = False,
+        device: str = "cpu",
+        workers: int = 2,
+        max_batch_tokens: int = 8192,
+        max_batch_items: int = 256,
+        normalize: bool = True
+    ):
+        """
+        Initialize HuggingFace embedding provider
+
+        Args:
+            model: sentence-transformers model name or local directory
+            backend: torch or onnx (ONNX Runtime)
+            quantize: With onnx, use int8 quantized weights
+            device: Device for the torch backend (cpu, cuda)
+            workers: Batches encoded concurrently
+            max_batch_tokens: Padded tokens (items x longest item) per batch
+            max_batch_items: Maximum texts per batch
+            normalize: L2-normalize embeddings (distances then rank like cosine)
+        """
         self.model = model
-        raise NotImplementedError("HuggingFace provider not yet implemented")
-    
+        self.backend = backend
+        self.quantize = quantize
+        self.device = device
+        self.workers = max(1, workers)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.normalize = normalize
+        self._model = None
+
+    def _get_model(self):
+        if self._model is None:
+            self._model = load_model(self.model, self.backend, self.quantize, self.device)
+            if self.backend == "torch" and self.device == "cpu":
+                import torch
+                # Split the cores between concurrently running batches
+                torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.workers))
+        return self._model
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        executor = self._executors.get(self.workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="hf-embed"
+            )
+            self._executors[self.workers] = executor
+        return executor
+
+    def plan_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Group input positions into length-sorted batches within the padded token budget
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            List of batches, each a list of indices into texts
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = []
+        batch: List[int] = []
+        for i in order:
+            # Sorted ascending, so the current text is the longest in the batch
+            padded = (len(batch) + 1) * estimate_tokens(texts[i])
+            if batch and (padded > self.max_batch_tokens or len(batch) >= self.max_batch_items):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self._get_model().encode(
+            texts,
+            batch_size=len(texts),
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+
     async def embed_text(self, text: str) -> List[float]:
-        raise NotImplementedError()
-    
+        """Generate embedding for a single text"""
+        embeddings = await self.embed_batch([text])
+        return embeddings[0]
+
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        raise NotImplementedError()
-    
+        """Generate embeddings for multiple texts on local CPU cores"""
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Load in the pool so the event loop isn't blocked on first use
+        await loop.run_in_executor(executor, self._get_model)
+
+        batches = self.plan_batches(texts)
+        outputs = await asyncio.gather(*(
+            loop.run_in_executor(executor, self._encode, [texts[i] for i in batch])
+            for batch in batches
+        ))
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, output in zip(batches, outputs):
+            for i, vector in zip(batch, output.astype(np.float32).tolist()):
+                embeddings[i] = vector
+        return embeddings
+
     def get_dimension(self) -> int:
-        return 384
+        """Get embedding dimension (loads the model on first call)"""
+        model = self._get_model()
+        # Renamed in sentence-transformers 5
+        get_dimension = getattr(model, "get_embedding_dimension", None) or model.get_sentence_embedding_dimension
+        return get_dimension()
@@ -1,19 +1,29 @@
 from app.providers.base import EmbeddingProvider
+from app.providers.clients import get_async_openai_client
+from app.providers.embedding.batching import EmbeddingBatcher, get_request_limiter
 from typing import List
-import openai
 
 class OpenAIEmbeddingProvider(EmbeddingProvider):
     """OpenAI embedding provider"""
     
-    def __init__(self, api_key: str, model: str = "text-embedding-3-small"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "text-embedding-3-small",
+        batcher: EmbeddingBatcher = None
+    ):
         """
         Initialize OpenAI embedding provider
         
         Args:
             api_key: OpenAI API key
             model: Model name (text-embedding-3-small, text-embedding-3-large, etc.)
+            batcher: Splits and parallelizes large batches (retries are handled there)
         """
-        self.client = openai.OpenAI(api_key=api_key)
+        self.client = get_async_openai_client(api_key)
+        self.batcher = batcher or EmbeddingBatcher()
+        # Shared with every provider on this client, like its connection pool
+        self.limiter = get_request_limiter((api_key, None), self.batcher.max_in_flight)
         self.model = model
         
         # Model dimensions
@@ -25,15 +35,16 @@ class OpenAIEmbeddingProvider(EmbeddingProvider):
     
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding for a single text"""
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=text
-        )
-        return response.data[0].embedding
+        embeddings = await self.batcher.run([text], self._embed_request, self.limiter)
+        return embeddings[0]
     
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
-        response = self.client.embeddings.create(
+        """Generate embeddings for multiple texts, split into concurrent sub-batches"""
+        return await self.batcher.run(texts, self._embed_request, self.limiter)
+    
+    async def _embed_request(self, texts: List[str]) -> List[List[float]]:
+        """One embeddings API call on the shared async client"""
+        response = await self.client.embeddings.create(
             model=self.model,
             input=texts
         )
@@ -1,11 +1,17 @@
-from app.providers.base import EmbeddingProvider, VectorStore
+from app.core.config import settings
+from app.providers.base import EmbeddingProvider, LLMProvider, VectorStore
+from typing import Any, Dict
+from app.providers.embedding.batching import EmbeddingBatcher
 from app.providers.embedding.openai_provider import OpenAIEmbeddingProvider
 from app.providers.embedding.cohere_provider import CohereEmbeddingProvider
 from app.providers.embedding.huggingface_provider import HuggingFaceEmbeddingProvider
 from app.providers.embedding.deepinfra_provider import DeepInfraEmbeddingProvider
 from app.providers.embedding.voyage_provider import VoyageEmbeddingProvider
+from app.providers.llm.openai_provider import OpenAILLMProvider
 from app.services.vector_stores.faiss_store import FAISSVectorStore
+from app.services.vector_stores.sharded_faiss_store import ShardedFAISSVectorStore
 from app.services.vector_stores.pgvector_store import PGVectorStore
+from app.services.vector_stores.registry import vector_store_registry
 
 def get_embedding_provider(provider_name: str, api_key: str, model: str) -> EmbeddingProvider:
     """
@@ -19,36 +25,134 @@ def get_embedding_provider(provider_name: str, api_key: str, model: str) -> Embe
     Returns:
         EmbeddingProvider instance
     """
+    batcher = EmbeddingBatcher(
+        max_batch_items=settings.EMBEDDING_MAX_BATCH_ITEMS,
+        max_batch_tokens=settings.EMBEDDING_MAX_BATCH_TOKENS,
+        max_in_flight=settings.EMBEDDING_MAX_IN_FLIGHT,
+        max_retries=settings.EMBEDDING_MAX_RETRIES
+    )
     if provider_name == "OpenAI":
-        return OpenAIEmbeddingProvider(api_key=api_key, model=model)
+        return OpenAIEmbeddingProvider(api_key=api_key, model=model, batcher=batcher)
     elif provider_name == "Cohere":
         return CohereEmbeddingProvider(api_key=api_key, model=model)
     elif provider_name == "HuggingFace":
-        return HuggingFaceEmbeddingProvider(model=model)
+        return HuggingFaceEmbeddingProvider(
+            model=model,
+            backend=settings.HF_EMBEDDING_BACKEND,
+            quantize=settings.HF_EMBEDDING_QUANTIZE,
+            device=settings.HF_EMBEDDING_DEVICE,
+            workers=settings.HF_EMBEDDING_WORKERS,
+            max_batch_tokens=settings.HF_EMBEDDING_MAX_BATCH_TOKENS
+        )
     elif provider_name == "DeepInfra":
-        return DeepInfraEmbeddingProvider(api_key=api_key, model=model)
+        return DeepInfraEmbeddingProvider(api_key=api_key, model=model, batcher=batcher)
     elif provider_name == "Voyage AI":
         return VoyageEmbeddingProvider(api_key=api_key, model=model)
     else:
         raise ValueError(f"Unknown embedding provider: {provider_name}")
 
-def get_vector_store(store_type: str, dimension: int, connection_string: str = None) -> VectorStore:
+# Base URLs of the OpenAI-compatible chat completions APIs of LLM providers
+LLM_BASE_URLS = {
+    "OpenAI": None,
+    "Anthropic": "https://api.anthropic.com/v1/",
+    "DeepInfra": "https://api.deepinfra.com/v1/openai",
+    "Groq": "https://api.groq.com/openai/v1",
+}
+
+def get_llm_provider(provider_name: str, api_key: str, model: str, base_url: str = None) -> LLMProvider:
+    """
+    Factory function to get LLM provider based on configuration
+    
+    Args:
+        provider_name: Name of provider (OpenAI, Anthropic, DeepInfra, Groq,
+            or OpenAI-compatible for a self-hosted server at base_url)
+        api_key: API key (optional for OpenAI-compatible servers)
+        model: Model name
+        base_url: Overrides the provider's API base URL (local or mock servers)
+        
+    Returns:
+        LLMProvider instance
+    """
+    if provider_name == "OpenAI-compatible":
+        if not base_url:
+            raise ValueError("llm_base_url required for an OpenAI-compatible LLM provider")
+        # Self-hosted servers usually ignore the key, but the client needs one
+        api_key = api_key or "EMPTY"
+    elif provider_name not in LLM_BASE_URLS:
+        raise ValueError(f"Unknown LLM provider: {provider_name}")
+    elif not api_key:
+        raise ValueError(f"LLM API key required for {provider_name}")
+    return OpenAILLMProvider(
+        api_key=api_key,
+        model=model,
+        base_url=base_url or LLM_BASE_URLS.get(provider_name),
+        max_retries=settings.CHAT_MAX_RETRIES,
+        # Token usage in streams is an OpenAI extension other servers may reject
+        stream_usage=provider_name == "OpenAI"
+    )
+
+def get_vector_store(
+    store_type: str,
+    dimension: int,
+    connection_string: str = None,
+    index_path: str = "faiss_index",
+    index_options: Dict[str, Any] = None
+) -> VectorStore:
     """
-    Factory function to get vector store based on configuration
+    Factory function to get vector store based on configuration.
+    Stores are loaded once and shared through the process-wide registry.
     
     Args:
         store_type: Type of store (faiss, pgvector)
         dimension: Embedding dimension
         connection_string: Connection string for database stores
+        index_path: Path prefix for FAISS index files
+        index_options: Index settings of the store type (see config_service)
         
     Returns:
         VectorStore instance
     """
     if store_type == "faiss":
-        return FAISSVectorStore(dimension=dimension)
+        index_options = dict(index_options or {})
+        shards = index_options.pop("shards", 1)
+        store_options = dict(
+            dimension=dimension,
+            index_path=index_path,
+            compact_threshold_bytes=settings.FAISS_WAL_COMPACT_BYTES,
+            wal_fsync=settings.FAISS_WAL_FSYNC,
+            tombstone_rebuild_ratio=settings.FAISS_TOMBSTONE_REBUILD_RATIO,
+            train_min_vectors=settings.FAISS_TRAIN_MIN_VECTORS,
+            lexical_index=settings.FAISS_LEXICAL_INDEX,
+            **index_options
+        )
+        if shards > 1:
+            store = vector_store_registry.get_or_create(
+                ("faiss", dimension, index_path, shards),
+                lambda: ShardedFAISSVectorStore(num_shards=shards, **store_options)
+            )
+        else:
+            store = vector_store_registry.get_or_create(
+                ("faiss", dimension, index_path),
+                lambda: FAISSVectorStore(**store_options)
+            )
+        # Settings may have changed since the store was loaded
+        store.configure(**index_options)
+        return store
     elif store_type == "pgvector":
         if not connection_string:
             raise ValueError("Connection string required for pgvector")
-        return PGVectorStore(connection_string=connection_string)
+        index_options = index_options or {}
+        store = vector_store_registry.get_or_create(
+            ("pgvector", dimension, connection_string),
+            lambda: PGVectorStore(
+                connection_string=connection_string,
+                dimension=dimension,
+                pool_min_size=settings.PGVECTOR_POOL_MIN_SIZE,
+                pool_max_size=settings.PGVECTOR_POOL_MAX_SIZE,
+                **index_options
+            )
+        )
+        store.configure(**index_options)
+        return store
     else:
         raise ValueError(f"Unknown vector store type: {store_type}")
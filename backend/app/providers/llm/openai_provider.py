@@ -0,0 +1,123 @@
+from app.providers.base import LLMProvider
+from app.providers.clients import get_async_openai_client
+from app.providers.embedding.batching import is_retryable, retry_delay
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+
+class OpenAILLMProvider(LLMProvider):
+    """
+    LLM provider for OpenAI and OpenAI-compatible chat completions APIs
+    (DeepInfra, Groq, Anthropic's compatibility endpoint, vLLM, Ollama)
+
+    The pooled clients don't retry, so calls are retried here on rate
+    limits, server errors and dropped connections; a streamed answer only
+    until its first token, since the client has already received what
+    came before a failure after that.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        base_url: str = None,
+        max_retries: int = 3,
+        stream_usage: bool = False
+    ):
+        """
+        Initialize OpenAI-compatible LLM provider
+
+        Args:
+            api_key: API key
+            model: Model name (gpt-4o-mini, meta-llama/Meta-Llama-3.1-70B-Instruct, etc.)
+            base_url: API base URL (None for api.openai.com)
+            max_retries: Attempts per call after the first one
+            stream_usage: Ask for token usage at the end of streams
+                (stream_options, which some compatible servers reject)
+        """
+        self.client = get_async_openai_client(api_key, base_url=base_url)
+        self.model = model
+        self.max_retries = max_retries
+        self.stream_usage = stream_usage
+
+    def _messages(self, prompt: str, system_prompt: str = None) -> List[Dict[str, str]]:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    async def _backoff(self, error: Exception, attempt: int) -> None:
+        """Wait before retry attempt (counting from 0), or re-raise error if it is not worth retrying"""
+        if attempt >= self.max_retries or not is_retryable(error):
+            raise error
+        delay = retry_delay(error, attempt)
+        print(f"Chat request failed ({error.__class__.__name__}), retry {attempt + 1} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def generate(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        max_tokens: int = 500,
+        temperature: float = 0.7
+    ) -> str:
+        """One chat completion on the shared async client"""
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=self._messages(prompt, system_prompt),
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+                return response.choices[0].message.content or ""
+            except Exception as e:
+                await self._backoff(e, attempt)
+                attempt += 1
+
+    async def stream(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        max_tokens: int = 500,
+        temperature: float = 0.7,
+        usage: Optional[Dict[str, int]] = None
+    ) -> AsyncIterator[str]:
+        """Streamed chat completion; the connection returns to the pool when the iterator is closed"""
+        request: Dict[str, Any] = dict(
+            model=self.model,
+            messages=self._messages(prompt, system_prompt),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        if self.stream_usage:
+            request["stream_options"] = {"include_usage": True}
+        attempt = 0
+        while True:
+            response = None
+            started = False
+            try:
+                response = await self.client.chat.completions.create(**request)
+                async for chunk in response:
+                    if chunk.usage is not None and usage is not None:
+                        usage["prompt_tokens"] = chunk.usage.prompt_tokens
+                        usage["completion_tokens"] = chunk.usage.completion_tokens
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        started = True
+                        yield chunk.choices[0].delta.content
+                return
+            except Exception as e:
+                if started:
+                    raise
+                if "stream_options" in request and getattr(e, "status_code", None) in (400, 422):
+                    # The server doesn't take stream_options; answer without token usage
+                    del request["stream_options"]
+                    self.stream_usage = False
+                    continue
+                await self._backoff(e, attempt)
+                attempt += 1
+            finally:
+                if response is not None:
+                    await response.close()
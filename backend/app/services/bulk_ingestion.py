@@ -0,0 +1,387 @@
+from dataclasses import dataclass
+from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import shutil
+import uuid
+import zipfile
+
+from app.core.config import settings
+from app.models import document
+from app.services.chunker import TextChunker
+from app.services.dedup import add_reference_vectors, document_of, new_deduplicator, simhash, to_signed
+from app.services.ingestion import assign_chunk_ids, get_ingest_backends, prefetch
+from app.services.pdf_parser import pdf_parser
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+@dataclass
+class BulkDocument:
+    """A registered document waiting to be bulk ingested"""
+    document_id: int
+    filename: str
+    path: str
+    # Set when the document failed before and is ingested again
+    retry: bool = False
+
+
+def hash_file(path: str, block_size: int = 1024 * 1024) -> str:
+    """sha256 hex digest of a file, read block by block"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def extract_zip_pdfs(zip_path: str, directory: str) -> List[Tuple[str, str]]:
+    """
+    Extract the PDFs of a zip archive into directory under generated names
+
+    Args:
+        zip_path: Zip archive
+        directory: Target directory
+
+    Returns:
+        List of (extracted path, original file name)
+    """
+    os.makedirs(directory, exist_ok=True)
+    extracted = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                continue
+            # Member names are never used as paths, so "../" entries can't escape
+            path = os.path.join(directory, f"{uuid.uuid4().hex}.pdf")
+            with archive.open(member) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            extracted.append((path, os.path.basename(member.filename)))
+    return extracted
+
+
+async def register_documents(
+    db: Session,
+    files: List[Tuple[str, str]]
+) -> Tuple[List[BulkDocument], List[Dict[str, Any]]]:
+    """
+    Hash files, drop the ones already indexed (or repeated in the batch) and
+    create the Document rows of the rest in one transaction. Files of
+    documents that failed are not duplicates: their rows are queued again.
+
+    Args:
+        db: Database session
+        files: List of (path, file name)
+
+    Returns:
+        Tuple of (new documents, duplicates as {filename, document_id} dicts)
+    """
+    hashes = await asyncio.gather(*(asyncio.to_thread(hash_file, path) for path, _ in files))
+
+    existing = {}
+    failed = {}
+    unique_hashes = list(set(hashes))
+    for start in range(0, len(unique_hashes), _QUERY_CHUNK):
+        rows = db.query(document.Document).filter(
+            document.Document.file_hash.in_(unique_hashes[start:start + _QUERY_CHUNK])
+        ).all()
+        for doc_record in rows:
+            if doc_record.status == "failed":
+                failed[doc_record.file_hash] = doc_record
+            else:
+                existing[doc_record.file_hash] = doc_record.id
+
+    duplicates = []
+    pending = {}
+    for (path, filename), file_hash in zip(files, hashes):
+        if file_hash in existing or file_hash in pending:
+            duplicates.append({"filename": filename, "file_hash": file_hash})
+            continue
+        doc_record = failed.get(file_hash)
+        if doc_record is not None:
+            doc_record.filename = filename
+            doc_record.document_key = filename
+            doc_record.status = "queued"
+            doc_record.error_message = None
+        else:
+            doc_record = document.Document(
+                filename=filename, document_key=filename, file_hash=file_hash, status="queued"
+            )
+            db.add(doc_record)
+        pending[file_hash] = (doc_record, path)
+
+    # Flushing assigns the ids; read them before commit expires the objects
+    db.flush()
+    documents = []
+    for file_hash, (doc_record, path) in pending.items():
+        existing[file_hash] = doc_record.id
+        documents.append(BulkDocument(
+            document_id=doc_record.id,
+            filename=doc_record.filename,
+            path=path,
+            retry=file_hash in failed
+        ))
+    db.commit()
+
+    for duplicate in duplicates:
+        duplicate["document_id"] = existing[duplicate.pop("file_hash")]
+    return documents, duplicates
+
+
+async def iter_parsed(
+    documents: List[BulkDocument],
+    concurrency: int
+) -> AsyncIterator[Tuple[BulkDocument, Optional[str], Optional[Exception]]]:
+    """
+    Parse documents in the PDF worker pool, keeping up to concurrency parses
+    in flight, and yield (document, markdown, error) as parses finish
+    """
+    remaining = iter(documents)
+    running = {}
+
+    def start_next() -> None:
+        doc = next(remaining, None)
+        if doc is not None:
+            running[asyncio.ensure_future(pdf_parser.parse(doc.path))] = doc
+
+    for _ in range(concurrency):
+        start_next()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                doc = running.pop(task)
+                start_next()
+                if task.exception() is not None:
+                    yield doc, None, task.exception()
+                else:
+                    yield doc, task.result(), None
+    finally:
+        for task in running:
+            task.cancel()
+
+
+async def bulk_ingest(
+    db: Session,
+    documents: List[BulkDocument],
+    config: Dict[str, Any],
+    progress: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Ingest many registered documents at once.
+
+    Documents are parsed in parallel and their chunks pooled across
+    documents into full embedding batches (INGEST_BULK_BATCH_SIZE). Each
+    embedded batch is appended to the vector store inside one bulk load,
+    so the index is flushed once at the end. Document rows are updated
+    with one transaction per batch. A document that fails to parse is
+    marked failed and skipped. If embedding or indexing fails, every
+    document not completed yet is marked failed and its vectors removed.
+
+    Near-duplicate chunks (see dedup.ChunkDeduplicator) are found across
+    the whole run and are not embedded. A document completes only after
+    the documents of the run whose vectors it copies, so a failure never
+    leaves references to removed vectors.
+
+    Args:
+        db: Database session
+        documents: Documents from register_documents
+        config: Settings from get_ingest_config
+        progress: Optional dict updated with document and chunk counts
+
+    Returns:
+        Counts of completed and failed documents and indexed chunks
+    """
+    progress = progress if progress is not None else {}
+    progress.update({
+        "documents_total": len(documents),
+        "documents_parsed": 0,
+        "documents_completed": 0,
+        "documents_failed": 0,
+        "chunks_indexed": 0,
+        "chunks_deduplicated": 0,
+    })
+    batch_size = settings.INGEST_BULK_BATCH_SIZE
+    chunker = TextChunker()
+    dedup = new_deduplicator(db)
+    # Chunks of each document not indexed yet (None until it is chunked)
+    remaining: Dict[int, Optional[int]] = {doc.document_id: None for doc in documents}
+    num_chunks: Dict[int, int] = {}
+    # document_chunks rows of each chunked document, written when it completes
+    chunk_rows: Dict[int, List[Dict[str, Any]]] = {}
+    # Near-duplicate chunks of each chunked document, indexed when it completes
+    references: Dict[int, List[dict]] = {}
+    updates: List[Dict[str, Any]] = []
+    new_chunk_rows: List[Dict[str, Any]] = []
+
+    def finish(document_id: int, status: str, error: Optional[str] = None) -> None:
+        remaining.pop(document_id, None)
+        references.pop(document_id, None)
+        rows = chunk_rows.pop(document_id, [])
+        if status == "completed":
+            new_chunk_rows.extend(rows)
+            if dedup is not None:
+                dedup.publish(document_id)
+        elif dedup is not None:
+            dedup.discard(document_id)
+        updates.append({
+            "id": document_id,
+            "status": status,
+            "num_chunks": num_chunks.get(document_id, 0) if status == "completed" else 0,
+            "error_message": error,
+        })
+        progress["documents_completed" if status == "completed" else "documents_failed"] += 1
+
+    def commit_updates() -> None:
+        if updates:
+            db.bulk_update_mappings(document.Document, updates)
+            db.bulk_insert_mappings(document.DocumentChunk, new_chunk_rows)
+            db.commit()
+            updates.clear()
+            new_chunk_rows.clear()
+
+    async def chunk_batches() -> AsyncIterator[List[Dict[str, Any]]]:
+        batch: List[Dict[str, Any]] = []
+        parsed = iter_parsed(documents, pdf_parser.max_workers * 2)
+        async for doc, text, error in parsed:
+            progress["documents_parsed"] += 1
+            if error is not None:
+                finish(doc.document_id, "failed", str(error) or error.__class__.__name__)
+                continue
+            chunks = await asyncio.to_thread(chunker.chunk_with_metadata, text, doc.filename)
+            assign_chunk_ids(doc.document_id, chunks, {})
+            if dedup is not None:
+                fingerprints = await asyncio.to_thread(simhash, [chunk["text"] for chunk in chunks])
+                dedup.assign(doc.document_id, chunks, fingerprints)
+            to_embed = [chunk for chunk in chunks if chunk.get("canonical_id") is None]
+            progress["chunks_deduplicated"] += len(chunks) - len(to_embed)
+            num_chunks[doc.document_id] = len(chunks)
+            remaining[doc.document_id] = len(to_embed)
+            references[doc.document_id] = [chunk for chunk in chunks if chunk.get("canonical_id") is not None]
+            chunk_rows[doc.document_id] = [
+                {
+                    "document_id": doc.document_id,
+                    "chunk_index": chunk["chunk_index"],
+                    "chunk_hash": chunk["chunk_hash"],
+                    "vector_id": chunk["id"],
+                    "canonical_id": chunk.get("canonical_id"),
+                    "simhash": to_signed(chunk.get("simhash"))
+                }
+                for chunk in chunks
+            ]
+            if not chunks:
+                finish(doc.document_id, "completed")
+            batch.extend(
+                {
+                    "id": chunk["id"],
+                    "document_id": str(doc.document_id),
+                    "document_name": doc.filename,
+                    "chunk_index": chunk["chunk_index"],
+                    "text": chunk["text"]
+                }
+                for chunk in to_embed
+            )
+            while len(batch) >= batch_size:
+                yield batch[:batch_size]
+                batch = batch[batch_size:]
+        if batch:
+            yield batch
+
+    vector_store = None
+    try:
+        embedding_provider, vector_store = await get_ingest_backends(db, config)
+        # A failed run interrupted by a restart may have left chunks indexed
+        for doc in documents:
+            if doc.retry:
+                await vector_store.delete_by_document(str(doc.document_id))
+        for start in range(0, len(documents), _QUERY_CHUNK):
+            db.query(document.Document).filter(
+                document.Document.id.in_(
+                    [doc.document_id for doc in documents[start:start + _QUERY_CHUNK]]
+                )
+            ).update({"status": "processing"}, synchronize_session=False)
+        db.commit()
+
+        async def embedded_batches():
+            async for batch in prefetch(chunk_batches(), settings.INGEST_STAGE_QUEUE_SIZE):
+                embeddings = await embedding_provider.embed_batch([m["text"] for m in batch])
+                yield batch, embeddings
+
+        def chunk_metadata(chunk: dict) -> Dict[str, Any]:
+            return {
+                "document_id": document_of(chunk["id"]),
+                "document_name": chunk["document_name"],
+                "chunk_index": chunk["chunk_index"],
+                "text": chunk["text"]
+            }
+
+        async def complete_ready() -> None:
+            """Complete the fully indexed documents whose dependencies completed"""
+            completed = True
+            while completed:
+                completed = False
+                for document_id, count in list(remaining.items()):
+                    if count != 0 or (dedup is not None and dedup.depends_on(document_id) & remaining.keys()):
+                        continue
+                    # Near duplicates of chunks whose document was deleted or updated since
+                    orphans = dedup.take_orphaned(document_id) if dedup is not None else []
+                    # The others get a copy of their canonical chunk's vector, or are embedded if it is gone
+                    copies = [chunk for chunk in references.get(document_id, []) if chunk["canonical_id"] is not None]
+                    if copies:
+                        missing = await add_reference_vectors(
+                            vector_store, copies, [chunk_metadata(chunk) for chunk in copies], dedup.exact
+                        )
+                        dedup.promote(document_id, missing)
+                        orphans.extend(missing)
+                    if orphans:
+                        embeddings = await embedding_provider.embed_batch([chunk["text"] for chunk in orphans])
+                        await vector_store.add_vectors(
+                            embeddings,
+                            [chunk_metadata(chunk) for chunk in orphans],
+                            [chunk["id"] for chunk in orphans]
+                        )
+                        progress["chunks_indexed"] += len(orphans)
+                        orphan_ids = {chunk["id"] for chunk in orphans}
+                        for row in chunk_rows[document_id]:
+                            if row["vector_id"] in orphan_ids:
+                                row["canonical_id"] = None
+                    finish(document_id, "completed")
+                    completed = True
+
+        async with vector_store.bulk_load():
+            async for batch, embeddings in prefetch(embedded_batches(), settings.INGEST_STAGE_QUEUE_SIZE):
+                ids = [meta.pop("id") for meta in batch]
+                await vector_store.add_vectors(embeddings, batch, ids)
+                progress["chunks_indexed"] += len(batch)
+
+                for meta in batch:
+                    remaining[int(meta["document_id"])] -= 1
+                await complete_ready()
+                commit_updates()
+            await complete_ready()
+        commit_updates()
+
+    except BaseException as e:
+        db.rollback()
+        error = str(e) or e.__class__.__name__
+        unfinished = list(remaining)
+        if vector_store is not None:
+            for document_id in unfinished:
+                if num_chunks.get(document_id):
+                    try:
+                        await vector_store.delete_by_document(str(document_id))
+                    except Exception as cleanup_error:
+                        print(f"Warning: Could not remove partially indexed chunks: {cleanup_error}")
+        for document_id in unfinished:
+            finish(document_id, "failed", error)
+        commit_updates()
+        raise
+
+    return {
+        "documents_completed": progress["documents_completed"],
+        "documents_failed": progress["documents_failed"],
+        "chunks_indexed": progress["chunks_indexed"],
+    }
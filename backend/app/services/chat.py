@@ -0,0 +1,182 @@
+from app.core.config import settings
+from app.providers.base import LLMProvider
+from app.providers.embedding.batching import estimate_tokens
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+import json
+import threading
+import time
+import uuid
+import numpy as np
+
+
+SYSTEM_PROMPT = (
+    "You answer questions about the user's documents. Use only the numbered "
+    "context passages below the question, cite them like [1], and say so when "
+    "they don't contain the answer."
+)
+
+
+def build_prompt(query: str, results: List[Dict[str, Any]], max_context_tokens: int) -> Tuple[str, int]:
+    """
+    Question followed by the retrieved chunks as numbered passages
+
+    Args:
+        query: User question
+        results: Search results, best first
+        max_context_tokens: Estimated tokens of passages to include; the
+            best result is always included
+
+    Returns:
+        Tuple of (prompt, number of results included)
+    """
+    passages = []
+    used_tokens = 0
+    for result in results:
+        text = result.get("text") or ""
+        tokens = estimate_tokens(text)
+        if passages and used_tokens + tokens > max_context_tokens:
+            break
+        source = result.get("document_name") or result.get("document_id")
+        passages.append(f"[{len(passages) + 1}] ({source}, chunk {result.get('chunk_index')})\n{text}")
+        used_tokens += tokens
+    prompt = f"Question: {query}\n\nContext:\n\n" + "\n\n".join(passages)
+    return prompt, len(passages)
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class ChatMetrics:
+    """
+    Latency of recent chat requests, kept in a bounded window.
+
+    Each request records its retrieval time, time to first token (from
+    the request arriving, so it includes retrieval) and generation rate
+    in tokens per second after the first token. Token counts come from
+    the API's usage report, or are the number of streamed pieces when
+    the API doesn't report usage.
+    """
+
+    def __init__(self, window: int = 1000):
+        """
+        Initialize chat metrics
+
+        Args:
+            window: Requests kept for percentiles
+        """
+        self.window = window
+        self._requests: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.total_requests = 0
+        self.failed_requests = 0
+        self.cancelled_requests = 0
+
+    def record(self, metrics: Dict[str, Any]) -> None:
+        """Record the metrics of a finished request"""
+        with self._lock:
+            self._requests.append(metrics)
+            self.total_requests += 1
+            if metrics["status"] == "failed":
+                self.failed_requests += 1
+            elif metrics["status"] == "cancelled":
+                self.cancelled_requests += 1
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+        if not values:
+            return None
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"p50": round(float(p50), 4), "p95": round(float(p95), 4), "p99": round(float(p99), 4)}
+
+    def get_stats(self, recent: int = 20) -> Dict[str, Any]:
+        """Request counts, percentiles over the window and the most recent requests"""
+        with self._lock:
+            requests = list(self._requests)
+        def values(key: str) -> List[float]:
+            return [r[key] for r in requests if r.get(key) is not None]
+        return {
+            "total_requests": self.total_requests,
+            "failed_requests": self.failed_requests,
+            "cancelled_requests": self.cancelled_requests,
+            "window": len(requests),
+            "retrieval_seconds": self._percentiles(values("retrieval_seconds")),
+            "ttft_seconds": self._percentiles(values("ttft_seconds")),
+            "total_seconds": self._percentiles(values("total_seconds")),
+            "tokens_per_second": self._percentiles(values("tokens_per_second")),
+            "recent": requests[-recent:][::-1],
+        }
+
+
+async def stream_answer(
+    llm: LLMProvider,
+    model: str,
+    search: Dict[str, Any],
+    started: float,
+    retrieval_seconds: float,
+    max_tokens: int,
+    temperature: float
+) -> AsyncIterator[str]:
+    """
+    Server-sent events of one chat answer: "sources" (the search response),
+    "token" pieces of the answer, then "done" with the request's metrics,
+    or "error" if generation fails. Metrics are recorded however the
+    stream ends, including the client disconnecting.
+
+    Args:
+        llm: LLM provider
+        model: Model name, for the metrics
+        search: Search response used as context
+        started: perf_counter() when the request arrived
+        retrieval_seconds: Time spent retrieving context
+        max_tokens: Maximum tokens to generate
+        temperature: Sampling temperature
+    """
+    prompt, context_chunks = build_prompt(search["query"], search["results"], settings.CHAT_CONTEXT_MAX_TOKENS)
+    record = {
+        "request_id": uuid.uuid4().hex,
+        "model": model,
+        "status": "cancelled",
+        "context_chunks": context_chunks,
+        "retrieval_seconds": round(retrieval_seconds, 4),
+        "ttft_seconds": None,
+        "total_seconds": None,
+        "completion_tokens": None,
+        "tokens_per_second": None,
+    }
+    usage: Dict[str, int] = {}
+    pieces = 0
+    first_token = last_token = None
+    tokens = llm.stream(prompt, SYSTEM_PROMPT, max_tokens=max_tokens, temperature=temperature, usage=usage)
+    try:
+        yield sse_event("sources", {"request_id": record["request_id"], **search})
+        try:
+            async for text in tokens:
+                last_token = time.perf_counter()
+                if first_token is None:
+                    first_token = last_token
+                    record["ttft_seconds"] = round(first_token - started, 4)
+                pieces += 1
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            record["status"] = "failed"
+            print(f"Warning: Chat generation with {model} failed: {e}")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        completion_tokens = usage.get("completion_tokens") or pieces
+        record["completion_tokens"] = completion_tokens
+        if first_token is not None and last_token > first_token and completion_tokens > 1:
+            record["tokens_per_second"] = round((completion_tokens - 1) / (last_token - first_token), 2)
+        record["status"] = "completed"
+        record["total_seconds"] = round(time.perf_counter() - started, 4)
+        yield sse_event("done", {**record, "usage": usage or None})
+    finally:
+        await tokens.aclose()
+        if record["total_seconds"] is None:
+            record["total_seconds"] = round(time.perf_counter() - started, 4)
+        chat_metrics.record(record)
+
+
+chat_metrics = ChatMetrics(window=settings.CHAT_METRICS_WINDOW)
@@ -1,54 +1,463 @@
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
+from app.core.config import settings
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+import os
+import re
+import zlib
+import numpy as np
+
+# Rough characters per token, for buffering and for splitting text without separators
+CHARS_PER_TOKEN = 4
+
+# Content-defined chunk boundaries (see TextChunker): a chunk filled to
+# ANCHOR_MIN_FILL of its size ends after the next unit that is an anchor
+ANCHOR_MIN_FILL = 0.6
+ANCHOR_RATE = 4
+
+# Stand-in for a BPE tokenizer: words and single punctuation marks
+_APPROX_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=8)
+def get_token_counter(tokenizer: str) -> Callable[[List[str]], List[int]]:
+    """
+    Build (once per process) a function returning the token count of each text.
+
+    Args:
+        tokenizer: A tiktoken encoding (e.g. cl100k_base), a HuggingFace
+            tokenizer (model name or a directory with tokenizer.json), or
+            "approx" to count words and punctuation marks
+
+    Returns:
+        Callable taking a list of texts and returning their token counts
+    """
+    if tokenizer == "approx":
+        return _approx_token_counts
+    try:
+        import tiktoken
+    except ImportError:
+        tiktoken = None
+    if tiktoken is not None and tokenizer in tiktoken.list_encoding_names():
+        try:
+            encoding = tiktoken.get_encoding(tokenizer)
+            return lambda texts: [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+        except Exception as e:
+            print(f"Warning: tiktoken encoding {tokenizer} unavailable ({e}), counting tokens approximately")
+    else:
+        try:
+            from tokenizers import Tokenizer
+            if os.path.isdir(tokenizer):
+                hf_tokenizer = Tokenizer.from_file(os.path.join(tokenizer, "tokenizer.json"))
+            else:
+                hf_tokenizer = Tokenizer.from_pretrained(tokenizer)
+            hf_tokenizer.no_truncation()
+            return lambda texts: [
+                len(encoding.ids)
+                for encoding in hf_tokenizer.encode_batch(texts, add_special_tokens=False)
+            ]
+        except Exception as e:
+            print(f"Warning: tokenizer {tokenizer} unavailable ({e}), counting tokens approximately")
+    return get_token_counter("approx")
+
+
+def _approx_token_counts(texts: List[str]) -> List[int]:
+    return [len(_APPROX_TOKEN_RE.findall(text)) for text in texts]
+
+
+def _approx_token_starts(codes: np.ndarray) -> np.ndarray:
+    """Vectorized _APPROX_TOKEN_RE over code points: 1 where a word or punctuation token starts"""
+    ascii_word = np.zeros(128, dtype=bool)
+    for char in "0123456789_abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ":
+        ascii_word[ord(char)] = True
+    ascii_space = np.zeros(128, dtype=bool)
+    for char in " \t\n\r\x0b\x0c":
+        ascii_space[ord(char)] = True
+    is_ascii = codes < 128
+    low = np.where(is_ascii, codes, 0)
+    # Non-ASCII characters are counted as word characters
+    word = np.where(is_ascii, ascii_word[low], True)
+    punctuation = is_ascii & ~ascii_word[low] & ~ascii_space[low]
+    previous_word = np.insert(word[:-1], 0, False)
+    return (word & ~previous_word) | punctuation
+
+
+def _separator_ends(codes: np.ndarray) -> List[np.ndarray]:
+    """
+    Positions just after each separator, from the coarsest to the finest:
+    paragraph breaks, line breaks, sentence ends (". ", "? ", "! "), spaces.
+    Runs of newlines or spaces count once, at the end of the run.
+    """
+    following = np.append(codes[1:], 0)
+    previous = np.insert(codes[:-1], 0, 0)
+    newline = codes == 10
+    space = codes == 32
+    paragraph = newline & (previous == 10) & (following != 10)
+    line = newline & (following != 10)
+    sentence = ((codes == 46) | (codes == 63) | (codes == 33)) & (following == 32)
+    word = space & (following != 32)
+    return [
+        np.flatnonzero(paragraph) + 1,
+        np.flatnonzero(line) + 1,
+        np.flatnonzero(sentence) + 2,
+        np.flatnonzero(word) + 1,
+    ]
+
+
+def _is_anchor(text: str, unit: Tuple[int, int, int], offset: int = 0) -> bool:
+    """Whether a chunk may end after unit: true for about 1 in ANCHOR_RATE units, by content"""
+    piece = text[unit[0] - offset:unit[1] - offset]
+    return zlib.crc32(piece.encode("utf-8", "surrogatepass")) % ANCHOR_RATE == 0
+
+
+class _ChunkPacker:
+    """
+    Greedy packing state of TextChunker (see TextChunker.split), kept
+    between calls when text is chunked as it arrives. Units are
+    (start, end, tokens) in offsets of the whole text, of which the text
+    passed in holds the part from offset on.
+    """
+
+    def __init__(self, chunker: "TextChunker"):
+        self.chunk_size = chunker.chunk_size
+        self.chunk_overlap = chunker.chunk_overlap
+        self.min_fill = chunker.chunk_size * ANCHOR_MIN_FILL
+        # Units of the chunk being filled and their tokens
+        self.current: List[Tuple[int, int, int]] = []
+        self.tokens = 0
+
+    def add(self, text: str, units: List[Tuple[int, int, int]], offset: int = 0) -> List[Tuple[int, int]]:
+        """Pack units and return the chunks they complete"""
+        spans = []
+        current, tokens = self.current, self.tokens
+        for unit in units:
+            if current and (
+                tokens + unit[2] > self.chunk_size
+                or tokens >= self.min_fill and _is_anchor(text, current[-1], offset)
+            ):
+                spans.append(self._span(text, current, offset))
+                # Carry whole trailing units of up to chunk_overlap tokens into the next chunk
+                carried = 0
+                keep = len(current)
+                while keep > 1 and carried + current[keep - 1][2] <= self.chunk_overlap \
+                        and carried + current[keep - 1][2] + unit[2] <= self.chunk_size:
+                    keep -= 1
+                    carried += current[keep][2]
+                current = current[keep:]
+                tokens = carried
+            current.append(unit)
+            tokens += unit[2]
+        self.current, self.tokens = current, tokens
+        return [span for span in spans if span[0] < span[1]]
+
+    def finish(self, text: str, offset: int = 0) -> List[Tuple[int, int]]:
+        """Return the last chunk and reset"""
+        spans = [self._span(text, self.current, offset)] if self.current else []
+        self.current, self.tokens = [], 0
+        return [span for span in spans if span[0] < span[1]]
+
+    @staticmethod
+    def _span(text: str, units: List[Tuple[int, int, int]], offset: int) -> Tuple[int, int]:
+        start, end = TextChunker._trim(text, units[0][0] - offset, units[-1][1] - offset)
+        return start + offset, end + offset
+
+
+class StreamingChunker:
+    """
+    Chunks text that arrives in pieces (e.g. page by page).
+
+    Text is buffered until it spans several chunks, then cut into the
+    units that no later text can change (complete paragraphs, or complete
+    lines, sentences or words of a paragraph already too large for one
+    chunk) and those are packed. Unit cutting and packing resume where
+    they stopped, so the chunks are the same as splitting the whole text
+    at once, wherever the pieces happen to end, while only the open chunk
+    and the uncut text are held in memory.
+    """
+
+    def __init__(self, chunker: "TextChunker", buffer_chunks: int = 4):
+        """
+        Initialize streaming chunker
+
+        Args:
+            chunker: Chunker whose splitter and chunk size are used
+            buffer_chunks: Chunks worth of uncut text buffered before cutting
+        """
+        self.chunker = chunker
+        self.min_buffer = chunker.chunk_size * CHARS_PER_TOKEN * buffer_chunks
+        self._buffer = ""
+        # Offset of the buffer in the whole text fed so far
+        self._buffer_offset = 0
+        # Text from _pos on is not cut into units yet; _depth is the separator level it is cut at
+        self._pos = 0
+        self._depth = 0
+        self._packer = _ChunkPacker(chunker)
+        self._next_index = 0
+
+    def feed(self, text: str) -> List[dict]:
+        """
+        Add text and return the chunks that are complete
+
+        Args:
+            text: Next piece of the document
+
+        Returns:
+            List of dictionaries with chunk text, chunk_index and start/end offsets
+        """
+        self._buffer += text
+        if self._buffer_offset + len(self._buffer) - self._pos < self.min_buffer:
+            return []
+        return self._advance(final=False)
+
+    def flush(self) -> List[dict]:
+        """Return the chunks of whatever text is left"""
+        return self._advance(final=True)
+
+    def _advance(self, final: bool) -> List[dict]:
+        buffer, offset = self._buffer, self._buffer_offset
+        units, pos, self._depth = self.chunker._final_units(buffer, self._pos - offset, self._depth, final)
+        self._pos = pos + offset
+        units = [(start + offset, end + offset, tokens) for start, end, tokens in units]
+        spans = self._packer.add(buffer, units, offset)
+        if final:
+            spans += self._packer.finish(buffer, offset)
+        chunks = self._emit(spans)
+        # Keep the text of the chunk being filled and of what is not cut yet
+        keep = min(self._pos, self._packer.current[0][0]) if self._packer.current else self._pos
+        self._buffer = buffer[keep - offset:]
+        self._buffer_offset = keep
+        return chunks
+
+    def _emit(self, spans: List[Tuple[int, int]]) -> List[dict]:
+        start = self._next_index
+        self._next_index += len(spans)
+        return [
+            {
+                "text": self._buffer[begin - self._buffer_offset:end - self._buffer_offset],
+                "chunk_index": start + i,
+                "start": begin,
+                "end": end
+            }
+            for i, (begin, end) in enumerate(spans)
+        ]
+
 
 class TextChunker:
-    """Service for chunking text documents into semantic pieces"""
-    
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Service for chunking text documents into pieces of at most chunk_size tokens.
+
+    Separator positions (paragraphs, lines, sentences, words) are found in
+    one vectorized scan of the text. Paragraphs are the units; a unit over
+    chunk_size tokens is cut at its own line breaks, then sentence ends,
+    then spaces, then evenly by characters. Units are token-counted in
+    batches with a tokenizer loaded once per process, then packed greedily
+    into chunks, with up to chunk_overlap tokens of whole units repeated
+    at the start of the next chunk. Chunks are (start, end) offsets into
+    the text; strings are only sliced out when asked for.
+
+    A chunk filled to ANCHOR_MIN_FILL of chunk_size also ends after any
+    anchor unit (picked by a hash of its text), so boundaries depend on
+    nearby content rather than on everything before: after an edit the
+    chunks fall back in step with those of the previous version at the
+    next anchor, instead of staying shifted to the end of the text, and
+    an incremental re-ingest only re-embeds chunks near the edit.
+    """
+
+    def __init__(
+        self,
+        chunk_size: Optional[int] = None,
+        chunk_overlap: Optional[int] = None,
+        tokenizer: Optional[str] = None
+    ):
         """
         Initialize text chunker
-        
+
+        Args:
+            chunk_size: Maximum tokens per chunk (default CHUNK_SIZE_TOKENS)
+            chunk_overlap: Tokens repeated between consecutive chunks (default CHUNK_OVERLAP_TOKENS)
+            tokenizer: Tokenizer used for counting, see get_token_counter (default CHUNK_TOKENIZER)
+        """
+        self.chunk_size = chunk_size or settings.CHUNK_SIZE_TOKENS
+        self.chunk_overlap = settings.CHUNK_OVERLAP_TOKENS if chunk_overlap is None else chunk_overlap
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        self.count_tokens = get_token_counter(tokenizer or settings.CHUNK_TOKENIZER)
+
+    def split(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Split text into chunks
+
+        Args:
+            text: Input text to chunk
+
+        Returns:
+            (start, end) character offsets of the chunks, with surrounding
+            whitespace excluded
+        """
+        if not text or text.isspace():
+            return []
+        units, _, _ = self._final_units(text, 0, 0, final=True)
+        packer = _ChunkPacker(self)
+        return packer.add(text, units) + packer.finish(text)
+
+    def _final_units(self, text: str, pos: int, depth: int, final: bool) -> Tuple[List[Tuple[int, int, int]], int, int]:
+        """
+        Cut text[pos:] into units, stopping where more text could still
+        change them unless final
+
         Args:
-            chunk_size: Maximum characters per chunk
-            chunk_overlap: Number of overlapping characters between chunks
-        """
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-    
+            text: Text seen so far
+            pos: Start of the text not cut yet
+            depth: Separator level the text from pos is cut at: pieces of
+                coarser levels around pos were too large and end further on
+            final: Whether text is complete
+
+        Returns:
+            Tuple of (units as (start, end, tokens), new pos, new depth)
+        """
+        n = len(text)
+        if pos >= n:
+            return [], pos, depth
+        codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+        levels = _separator_ends(codes)
+        if self.count_tokens is _approx_token_counts:
+            # Count from token starts found in the same scan instead of slicing pieces out
+            prefix = np.concatenate([[0], np.cumsum(_approx_token_starts(codes))])
+            count = lambda pieces: (prefix[[end for _, end in pieces]] - prefix[[start for start, _ in pieces]]).tolist()
+        else:
+            count = lambda pieces: self.count_tokens([text[start:end] for start, end in pieces])
+        # A separator ending at the end of the text may continue in the next piece
+        limit = n if final else n - 1
+
+        units: List[Tuple[int, int, int]] = []
+        level = depth
+        while True:
+            # The pieces of coarser levels that pos is in end at the first
+            # separator of their level or a coarser one (if in the text yet)
+            piece_ends = []
+            for coarser in range(level):
+                ends = levels[coarser]
+                i = np.searchsorted(ends, pos, side="right")
+                if i < len(ends) and ends[i] <= limit:
+                    piece_ends.append(int(ends[i]))
+                elif final:
+                    piece_ends.append(n)
+                elif piece_ends:
+                    piece_ends.append(piece_ends[-1])
+                else:
+                    piece_ends.append(None)
+                if len(piece_ends) > 1 and piece_ends[-2] is not None:
+                    piece_ends[-1] = min(piece_ends[-2], piece_ends[-1])
+            end = piece_ends[-1] if piece_ends else (n if final else None)
+            if end is not None:
+                units.extend(self._units(levels, count, [(pos, end)], level))
+                if end == n:
+                    return units, n, 0
+                # Continue at the coarsest level whose piece ended here
+                pos, level = end, piece_ends.index(end)
+                continue
+            if level == len(levels):
+                return units, pos, level
+            # The piece runs past the text: cut it up to its last separator
+            ends = levels[level]
+            inner = ends[np.searchsorted(ends, pos, side="right"):np.searchsorted(ends, limit, side="right")]
+            if len(inner):
+                last = int(inner[-1])
+                units.extend(self._units(levels, count, [(pos, last)], level))
+                pos = last
+            # and cut what follows at finer separators once it is too large already
+            if count([(pos, n)])[0] <= self.chunk_size:
+                return units, pos, level
+            level += 1
+
+    def _units(
+        self,
+        levels: List[np.ndarray],
+        count: Callable[[List[Tuple[int, int]]], List[int]],
+        spans: List[Tuple[int, int]],
+        level: int
+    ) -> List[Tuple[int, int, int]]:
+        """Cut spans at the separators of level and finer until every piece fits; returns (start, end, tokens)"""
+        pieces = []
+        for start, end in spans:
+            if level < len(levels):
+                ends = levels[level]
+                inner = ends[np.searchsorted(ends, start, side="right"):np.searchsorted(ends, end, side="left")]
+                bounds = [start, *inner.tolist(), end]
+            else:
+                # No separators left: cut evenly by characters
+                parts = max(2, -(-(end - start) // (self.chunk_size * CHARS_PER_TOKEN)))
+                bounds = np.linspace(start, end, parts + 1).astype(int).tolist()
+            pieces.extend((bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1) if bounds[i] < bounds[i + 1])
+
+        counts = count(pieces) if pieces else []
+        units: List[Tuple[int, int, int]] = []
+        oversized: List[Tuple[int, int]] = []
+        for (start, end), tokens in zip(pieces, counts):
+            if tokens > self.chunk_size and end - start > 1:
+                units.append((start, end, -1))
+                oversized.append((start, end))
+            else:
+                units.append((start, end, tokens))
+        if not oversized:
+            return units
+        # Replace each oversized piece by its finer pieces, keeping text order
+        finer = iter(self._group(self._units(levels, count, oversized, level + 1), oversized))
+        result = []
+        for unit in units:
+            result.extend(next(finer) if unit[2] < 0 else [unit])
+        return result
+
+    @staticmethod
+    def _group(units: List[Tuple[int, int, int]], spans: List[Tuple[int, int]]) -> List[List[Tuple[int, int, int]]]:
+        """Group units (in order) by the span each falls in"""
+        groups = [[] for _ in spans]
+        i = 0
+        for unit in units:
+            while unit[0] >= spans[i][1]:
+                i += 1
+            groups[i].append(unit)
+        return groups
+
+    @staticmethod
+    def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
+
     def chunk_text(self, text: str) -> List[str]:
         """
         Split text into chunks
-        
+
         Args:
             text: Input text to chunk
-            
+
         Returns:
             List of text chunks
         """
-        return self.splitter.split_text(text)
-    
+        return [text[start:end] for start, end in self.split(text)]
+
     def chunk_with_metadata(self, text: str, document_name: str) -> List[dict]:
         """
         Split text into chunks with metadata
-        
+
         Args:
             text: Input text to chunk
             document_name: Name of the source document
-            
+
         Returns:
-            List of dictionaries with chunk text and metadata
+            List of dictionaries with chunk text, start/end offsets and metadata
         """
-        chunks = self.chunk_text(text)
+        spans = self.split(text)
         return [
             {
-                "text": chunk,
+                "text": text[start:end],
+                "start": start,
+                "end": end,
                 "document_name": document_name,
                 "chunk_index": i,
-                "total_chunks": len(chunks)
+                "total_chunks": len(spans)
             }
-            for i, chunk in enumerate(chunks)
+            for i, (start, end) in enumerate(spans)
         ]
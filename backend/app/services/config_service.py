@@ -0,0 +1,112 @@
+from sqlalchemy.orm import Session
+from typing import Any, Dict
+
+from app.models import configuration
+from app.providers.base import EmbeddingProvider, LLMProvider, VectorStore
+from app.providers.factory import get_embedding_provider, get_llm_provider, get_vector_store
+
+
+async def get_config_value(db: Session, key: str) -> str:
+    """Helper to get a config value from database"""
+    config_item = db.query(configuration.ConfigurationItem).filter(
+        configuration.ConfigurationItem.config_name == key,
+        configuration.ConfigurationItem.is_active == True
+    ).first()
+    return config_item.config_value if config_item else None
+
+
+async def get_embedding_settings(db: Session) -> Dict[str, Any]:
+    """Embedding provider name, API key and model from configuration"""
+    return {
+        "provider_name": await get_config_value(db, "embedding_provider") or "OpenAI",
+        "api_key": await get_config_value(db, "embedding_api_key"),
+        "model": await get_config_value(db, "embedding_model") or "text-embedding-3-small"
+    }
+
+
+async def get_configured_embedding_provider(db: Session) -> EmbeddingProvider:
+    """Build the embedding provider selected in configuration"""
+    return get_embedding_provider(**await get_embedding_settings(db))
+
+
+async def get_llm_settings(db: Session) -> Dict[str, Any]:
+    """LLM provider name, API key, model and optional base URL from configuration"""
+    return {
+        "provider_name": await get_config_value(db, "llm_provider") or "OpenAI",
+        "api_key": await get_config_value(db, "llm_api_key"),
+        "model": await get_config_value(db, "llm_model") or "gpt-4o-mini",
+        "base_url": await get_config_value(db, "llm_base_url") or None
+    }
+
+
+async def get_configured_llm_provider(db: Session) -> LLMProvider:
+    """Build the LLM provider selected in configuration"""
+    return get_llm_provider(**await get_llm_settings(db))
+
+
+async def get_faiss_index_options(db: Session) -> Dict[str, Any]:
+    """FAISS index settings from configuration (faiss_index_type, faiss_metric, faiss_storage, faiss_nprobe, faiss_ef_search, faiss_shards)"""
+    options = {
+        "index_type": await get_config_value(db, "faiss_index_type") or "Flat",
+        "metric": await get_config_value(db, "faiss_metric") or "l2",
+        "storage": await get_config_value(db, "faiss_storage") or "float32",
+    }
+    nprobe = await get_config_value(db, "faiss_nprobe")
+    if nprobe:
+        options["nprobe"] = int(nprobe)
+    ef_search = await get_config_value(db, "faiss_ef_search")
+    if ef_search:
+        options["ef_search"] = int(ef_search)
+    shards = await get_config_value(db, "faiss_shards")
+    if shards:
+        options["shards"] = int(shards)
+    return options
+
+
+async def get_pgvector_index_options(db: Session) -> Dict[str, Any]:
+    """pgvector index settings from configuration (pgvector_index_type, pgvector_ef_search, pgvector_lists, pgvector_probes)"""
+    options = {"index_type": await get_config_value(db, "pgvector_index_type") or "hnsw"}
+    for key in ("ef_search", "lists", "probes"):
+        value = await get_config_value(db, f"pgvector_{key}")
+        if value:
+            options[key] = int(value)
+    return options
+
+
+async def get_rerank_settings(db: Session) -> Dict[str, Any]:
+    """Re-ranking settings from configuration (rerank_model, rerank_candidates, rerank_budget_ms); model is None when disabled"""
+    candidates = await get_config_value(db, "rerank_candidates")
+    budget_ms = await get_config_value(db, "rerank_budget_ms")
+    return {
+        "model": await get_config_value(db, "rerank_model") or None,
+        "candidates": int(candidates) if candidates else 20,
+        "budget_seconds": (float(budget_ms) if budget_ms else 300.0) / 1000,
+    }
+
+
+async def get_configured_vector_store(db: Session, dimension: int = None) -> VectorStore:
+    """
+    Resolve the vector store selected in configuration.
+    
+    Args:
+        db: Database session
+        dimension: Embedding dimension; if omitted the configured embedding
+            provider is built just to learn it
+        
+    Returns:
+        Shared VectorStore instance from the registry
+    """
+    if dimension is None:
+        embedding_provider = await get_configured_embedding_provider(db)
+        dimension = embedding_provider.get_dimension()
+    store_type = await get_config_value(db, "vector_store") or "faiss"
+    if store_type == "pgvector":
+        index_options = await get_pgvector_index_options(db)
+    else:
+        index_options = await get_faiss_index_options(db)
+    return get_vector_store(
+        store_type=store_type,
+        dimension=dimension,
+        connection_string=await get_config_value(db, "pgvector_url"),
+        index_options=index_options
+    )
@@ -0,0 +1,550 @@
+from app.core.config import settings
+from app.models import document
+from app.providers.base import VectorStore
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import hashlib
+import re
+import threading
+import numpy as np
+
+# Chunks are fingerprinted over overlapping runs of this many words
+SHINGLE_SIZE = 3
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+_WORD = re.compile(r"\w+")
+_MIX_PRIME = np.uint64(0x100000001B3)
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, so similar inputs get unrelated hashes"""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def simhash(texts: List[str]) -> List[Optional[int]]:
+    """
+    64-bit SimHash fingerprints of texts.
+
+    Each text is lowercased and split into words, and every run of
+    SHINGLE_SIZE consecutive words is hashed; bit i of the fingerprint is
+    set when most shingle hashes have bit i set. Texts sharing most of
+    their shingles get fingerprints a few bits apart, whatever their
+    length. Texts shorter than a shingle are hashed as one shingle.
+
+    Args:
+        texts: Texts to fingerprint
+
+    Returns:
+        One unsigned fingerprint per text, None for texts without words
+    """
+    words_per_text = [_WORD.findall(text.lower()) for text in texts]
+    lengths = np.array([len(words) for words in words_per_text], dtype=np.int64)
+    fingerprints: List[Optional[int]] = [None] * len(texts)
+    if not lengths.any():
+        return fingerprints
+
+    vocabulary: Dict[str, int] = {}
+    codes = np.fromiter(
+        (vocabulary.setdefault(word, len(vocabulary)) for words in words_per_text for word in words),
+        dtype=np.int64, count=int(lengths.sum())
+    )
+    word_hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(word.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+            for word in vocabulary
+        ),
+        dtype=np.uint64, count=len(vocabulary)
+    )[codes]
+
+    # Shingle start positions, never crossing into the next text
+    word_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    word_ends = word_starts + lengths
+    counts = np.where(lengths > 0, np.maximum(lengths - (SHINGLE_SIZE - 1), 1), 0)
+    text_of = np.repeat(np.arange(len(texts)), counts)
+    shingle_offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    starts = word_starts[text_of] + np.arange(len(text_of)) - shingle_offsets[text_of]
+
+    hashes = np.zeros(len(starts), dtype=np.uint64)
+    for k in range(SHINGLE_SIZE):
+        positions = starts + k
+        inside = positions < word_ends[text_of]
+        word_hash = np.where(inside, word_hashes[np.minimum(positions, len(word_hashes) - 1)], np.uint64(0))
+        hashes = (hashes ^ word_hash) * _MIX_PRIME
+    hashes = _mix64(hashes)
+
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    with_words = np.flatnonzero(counts)
+    ones = np.add.reduceat(bits, shingle_offsets[with_words], axis=0, dtype=np.int32)
+    majority = (2 * ones > counts[with_words, None]).astype(np.uint8)
+    packed = np.packbits(majority, axis=1, bitorder="little").view(np.uint64).ravel()
+    for text_index, fingerprint in zip(with_words.tolist(), packed.tolist()):
+        fingerprints[text_index] = fingerprint
+    return fingerprints
+
+
+def normalize_text(text: str) -> str:
+    """Text as simhash() sees it: lowercased words separated by single spaces"""
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Set bits of each uint64 (np.bitwise_count needs numpy 2)"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def to_signed(fingerprint: Optional[int]) -> Optional[int]:
+    """Fingerprint as a signed 64-bit integer, as stored in document_chunks.simhash"""
+    if fingerprint is None or fingerprint < 1 << 63:
+        return fingerprint
+    return fingerprint - (1 << 64)
+
+
+def to_unsigned(value: Optional[int]) -> Optional[int]:
+    """Inverse of to_signed"""
+    if value is None or value >= 0:
+        return value
+    return value + (1 << 64)
+
+
+def document_of(vector_id: str) -> str:
+    """Id of the document owning a vector ("{document_id}_...")"""
+    return vector_id.split("_", 1)[0]
+
+
+class NearDuplicateIndex:
+    """
+    Canonical chunks by SimHash fingerprint, searched by Hamming distance.
+
+    Fingerprints within max_distance bits of each other agree exactly on
+    at least one of max_distance + 1 blocks of bits (pigeonhole), so a
+    lookup only verifies the entries sharing one of its block values,
+    found by binary search in one sorted array per block. Recent
+    additions are scanned directly until there are enough of them to be
+    merged into the sorted arrays. Removed entries are masked until the
+    next merge. Not thread-safe; ingest runs it on the event loop.
+    """
+
+    MIN_MERGE_SIZE = 4096
+    # The direct-scan tail may grow to this fraction of the sorted entries
+    MERGE_FRACTION = 1 / 32
+
+    def __init__(self, max_distance: int = 3):
+        """
+        Initialize near-duplicate index
+
+        Args:
+            max_distance: Largest Hamming distance (in bits of 64) of a near duplicate
+        """
+        if not 0 <= max_distance < 32:
+            raise ValueError("max_distance must be between 0 and 31")
+        self.max_distance = max_distance
+        edges = np.linspace(0, 64, max_distance + 2).astype(int)
+        # (shift, mask) of each block of bits
+        self._blocks = [
+            (np.uint64(low), np.uint64((1 << int(high - low)) - 1))
+            for low, high in zip(edges[:-1], edges[1:])
+        ]
+        self._ids: List[Optional[str]] = []
+        self._fingerprints = np.zeros(1024, dtype=np.uint64)
+        self._alive = np.zeros(1024, dtype=bool)
+        # Entries [0, _merged) are in the sorted arrays: (block values, entry numbers) per block
+        self._merged = 0
+        self._sorted = [(np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)) for _ in self._blocks]
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._ids) - self._removed
+
+    def add(self, vector_id: str, fingerprint: int) -> None:
+        """Add a canonical chunk"""
+        self.add_many([vector_id], [fingerprint])
+
+    def add_many(self, vector_ids: List[str], fingerprints: List[int]) -> None:
+        """Add canonical chunks (merged once, however many)"""
+        size = len(self._ids)
+        needed = size + len(vector_ids)
+        if needed > len(self._fingerprints):
+            capacity = max(needed, 2 * len(self._fingerprints))
+            self._fingerprints = np.resize(self._fingerprints, capacity)
+            self._alive = np.resize(self._alive, capacity)
+        self._fingerprints[size:needed] = np.array(fingerprints, dtype=np.uint64)
+        self._alive[size:needed] = True
+        self._ids.extend(vector_ids)
+        if needed - self._merged >= max(self.MIN_MERGE_SIZE, self._merged * self.MERGE_FRACTION):
+            self._merge()
+
+    def _merge(self) -> None:
+        """Drop removed entries and rebuild the sorted block arrays over every entry"""
+        size = len(self._ids)
+        if self._removed:
+            keep = np.flatnonzero(self._alive[:size])
+            self._ids = [self._ids[entry] for entry in keep.tolist()]
+            size = len(keep)
+            self._fingerprints[:size] = self._fingerprints[keep]
+            self._alive[:size] = True
+            self._alive[size:] = False
+            self._removed = 0
+        fingerprints = self._fingerprints[:size]
+        self._sorted = []
+        for shift, mask in self._blocks:
+            values = (fingerprints >> shift) & mask
+            order = np.argsort(values, kind="stable")
+            self._sorted.append((values[order], order))
+        self._merged = size
+
+    def _candidates(self, fingerprint: int) -> np.ndarray:
+        """Live entries within max_distance of fingerprint, nearest first"""
+        fingerprint = np.uint64(fingerprint)
+        found = [np.arange(self._merged, len(self._ids))]
+        for (shift, mask), (values, entries) in zip(self._blocks, self._sorted):
+            value = (fingerprint >> shift) & mask
+            found.append(entries[np.searchsorted(values, value, "left"):np.searchsorted(values, value, "right")])
+        entries = np.unique(np.concatenate(found))
+        entries = entries[self._alive[entries]]
+        distances = _popcount(self._fingerprints[entries] ^ fingerprint)
+        close = distances <= self.max_distance
+        entries, distances = entries[close], distances[close]
+        return entries[np.argsort(distances, kind="stable")]
+
+    def find(
+        self,
+        fingerprint: int,
+        exclude: Optional[Callable[[str], bool]] = None
+    ) -> Optional[Tuple[str, int]]:
+        """
+        Nearest canonical chunk within max_distance bits
+
+        Args:
+            fingerprint: SimHash of the chunk
+            exclude: Optional predicate on vector ids of chunks that may not be returned
+
+        Returns:
+            (vector id, fingerprint) of the canonical chunk, or None
+        """
+        for entry in self._candidates(fingerprint).tolist():
+            vector_id = self._ids[entry]
+            if exclude is None or not exclude(vector_id):
+                return vector_id, int(self._fingerprints[entry])
+        return None
+
+    def _entry(self, vector_id: str, fingerprint: int) -> Optional[int]:
+        for entry in self._candidates(fingerprint).tolist():
+            if self._ids[entry] == vector_id and self._fingerprints[entry] == np.uint64(fingerprint):
+                return entry
+        return None
+
+    def contains(self, vector_id: str, fingerprint: int) -> bool:
+        """Whether vector_id is indexed with fingerprint"""
+        return self._entry(vector_id, fingerprint) is not None
+
+    def remove(self, vector_id: str, fingerprint: int) -> None:
+        """Remove a canonical chunk (unknown ones are ignored)"""
+        entry = self._entry(vector_id, fingerprint)
+        if entry is not None:
+            self._alive[entry] = False
+            self._ids[entry] = None
+            self._removed += 1
+
+
+class ChunkDeduplicator:
+    """
+    Near-duplicate detection for the chunks of one ingest run.
+
+    New chunks are looked up in a run-local index (chunks of this run and
+    canonical chunks of the documents being updated) and in the shared
+    index of canonical chunks of completed documents. A chunk with a near
+    duplicate gets its canonical_id and is not embedded: it is indexed
+    under its own id, text and metadata with a copy of the canonical
+    chunk's vector (see add_reference_vectors). Otherwise it becomes a
+    canonical chunk of the run. Canonical chunks are published to the
+    shared index only once their document completes, so a failed document
+    never leaves references behind.
+    """
+
+    def __init__(self, shared: Optional[NearDuplicateIndex], max_distance: int):
+        """
+        Initialize chunk deduplicator
+
+        Args:
+            shared: Index of completed documents' canonical chunks, or None to only dedup within the run
+            max_distance: Largest Hamming distance of a near duplicate
+        """
+        self.shared = shared
+        self.local = NearDuplicateIndex(max_distance)
+        # Only identical texts share a vector; checked again when it is copied
+        self.exact = max_distance == 0
+        self._canonicals: Dict[int, List[Tuple[str, int]]] = {}
+        # Chunks referencing shared canonical chunks, checked again before completion
+        self._borrowed: Dict[int, List[dict]] = {}
+        # Other documents of the run whose canonical chunks a document references
+        self._depends_on: Dict[int, Set[int]] = {}
+
+    def add_canonicals(self, rows: List[document.DocumentChunk]) -> None:
+        """Make the indexed canonical chunks of a document being updated available to its new chunks"""
+        canonicals = [row for row in rows if row.canonical_id is None and row.simhash is not None]
+        self.local.add_many(
+            [row.vector_id for row in canonicals], [to_unsigned(row.simhash) for row in canonicals]
+        )
+
+    def assign(
+        self,
+        document_id: int,
+        chunks: List[dict],
+        fingerprints: Optional[List[Optional[int]]] = None
+    ) -> None:
+        """
+        Fingerprint new chunks of a document and set each chunk's "simhash"
+        (unsigned) and "canonical_id" (None for chunks to embed)
+
+        Args:
+            document_id: Document the chunks belong to
+            chunks: Chunks with "id" and "text", in document order
+            fingerprints: simhash() of the chunk texts, if already computed
+        """
+        owner = str(document_id)
+        if fingerprints is None:
+            fingerprints = simhash([chunk["text"] for chunk in chunks])
+        for chunk, fingerprint in zip(chunks, fingerprints):
+            chunk["simhash"] = fingerprint
+            chunk["canonical_id"] = None
+            if fingerprint is None:
+                continue
+            match = self.local.find(fingerprint)
+            if match is not None:
+                if document_of(match[0]) != owner:
+                    self._depends_on.setdefault(document_id, set()).add(int(document_of(match[0])))
+            elif self.shared is not None:
+                # The document's own indexed chunks may vanish in this run; the local index has them
+                match = self.shared.find(fingerprint, lambda vector_id: document_of(vector_id) == owner)
+                if match is not None:
+                    chunk["canonical_fingerprint"] = match[1]
+                    self._borrowed.setdefault(document_id, []).append(chunk)
+            if match is None:
+                self.local.add(chunk["id"], fingerprint)
+                self._canonicals.setdefault(document_id, []).append((chunk["id"], fingerprint))
+            else:
+                chunk["canonical_id"] = match[0]
+
+    def depends_on(self, document_id: int) -> Set[int]:
+        """Ids of other documents of the run whose canonical chunks the document references"""
+        return self._depends_on.get(document_id, set())
+
+    def take_orphaned(self, document_id: int) -> List[dict]:
+        """
+        Chunks of the document referencing shared canonical chunks that were
+        released since (their document was deleted or updated meanwhile).
+        They become canonical chunks of the run and have to be embedded.
+        """
+        if self.shared is None:
+            return []
+        orphans, borrowed = [], []
+        for chunk in self._borrowed.get(document_id, []):
+            if self.shared.contains(chunk["canonical_id"], chunk["canonical_fingerprint"]):
+                borrowed.append(chunk)
+            else:
+                orphans.append(chunk)
+        self._borrowed[document_id] = borrowed
+        self.promote(document_id, orphans)
+        return orphans
+
+    def promote(self, document_id: int, chunks: List[dict]) -> None:
+        """Make references of a document canonical chunks of the run, to be embedded"""
+        for chunk in chunks:
+            chunk["canonical_id"] = None
+            self.local.add(chunk["id"], chunk["simhash"])
+            self._canonicals.setdefault(document_id, []).append((chunk["id"], chunk["simhash"]))
+
+    def publish(self, document_id: int) -> None:
+        """Add the canonical chunks of a completed document to the shared index"""
+        canonicals = self._canonicals.pop(document_id, [])
+        self._borrowed.pop(document_id, None)
+        if self.shared is not None and canonicals:
+            self.shared.add_many([vector_id for vector_id, _ in canonicals], [fp for _, fp in canonicals])
+
+    def discard(self, document_id: int) -> None:
+        """Forget a failed document's canonical chunks"""
+        for vector_id, fingerprint in self._canonicals.pop(document_id, []):
+            self.local.remove(vector_id, fingerprint)
+        self._borrowed.pop(document_id, None)
+
+
+_shared_index: Optional[NearDuplicateIndex] = None
+_shared_index_lock = threading.Lock()
+
+
+def get_dedup_index(db: Session) -> Optional[NearDuplicateIndex]:
+    """
+    Process-wide index of canonical chunks, loaded from document_chunks on
+    first use, or None when deduplication is disabled in settings
+    """
+    global _shared_index
+    if not settings.CHUNK_DEDUP_ENABLED:
+        return None
+    with _shared_index_lock:
+        if _shared_index is None:
+            index = NearDuplicateIndex(settings.CHUNK_DEDUP_MAX_DISTANCE)
+            rows = db.query(document.DocumentChunk.vector_id, document.DocumentChunk.simhash).filter(
+                document.DocumentChunk.canonical_id.is_(None),
+                document.DocumentChunk.simhash.isnot(None)
+            ).yield_per(10000)
+            vector_ids, fingerprints = [], []
+            for vector_id, value in rows:
+                vector_ids.append(vector_id)
+                fingerprints.append(to_unsigned(value))
+            index.add_many(vector_ids, fingerprints)
+            _shared_index = index
+        return _shared_index
+
+
+def new_deduplicator(db: Session) -> Optional[ChunkDeduplicator]:
+    """Deduplicator for an ingest run, or None when deduplication is disabled"""
+    if not settings.CHUNK_DEDUP_ENABLED:
+        return None
+    return ChunkDeduplicator(get_dedup_index(db), settings.CHUNK_DEDUP_MAX_DISTANCE)
+
+
+async def add_reference_vectors(
+    vector_store: VectorStore,
+    chunks: List[dict],
+    metadata: List[Dict[str, Any]],
+    exact: bool
+) -> List[dict]:
+    """
+    Index near-duplicate chunks with a copy of their canonical chunk's
+    vector, under their own ids and metadata, so their own text, terms and
+    document are searched like any chunk's without embedding them.
+
+    Call once the canonical chunks are indexed (their documents completed,
+    or earlier in the same document).
+
+    Args:
+        vector_store: Store holding the canonical vectors
+        chunks: Chunks with "id", "text" and "canonical_id"
+        metadata: Metadata to store for each chunk
+        exact: Copy a vector only if the canonical chunk's stored text
+            normalizes (see normalize_text) to the same text
+
+    Returns:
+        The chunks that got no vector (canonical vector gone, or text
+        different), to be embedded
+    """
+    by_document: Dict[str, List[int]] = {}
+    for position, chunk in enumerate(chunks):
+        by_document.setdefault(document_of(chunk["canonical_id"]), []).append(position)
+    copied, vectors = [], []
+    for document_id, positions in by_document.items():
+        canonical_ids = list(dict.fromkeys(chunks[position]["canonical_id"] for position in positions))
+        found_vectors, found_metadata = await vector_store.get_vectors(document_id, canonical_ids)
+        found = {meta["id"]: (vector, meta.get("text", "")) for vector, meta in zip(found_vectors, found_metadata)}
+        for position in positions:
+            hit = found.get(chunks[position]["canonical_id"])
+            if hit is None or (exact and normalize_text(hit[1]) != normalize_text(chunks[position]["text"])):
+                continue
+            copied.append(position)
+            vectors.append(hit[0])
+    if copied:
+        await vector_store.add_vectors(
+            np.stack(vectors),
+            [metadata[position] for position in copied],
+            [chunks[position]["id"] for position in copied]
+        )
+    copied_positions = set(copied)
+    return [chunk for position, chunk in enumerate(chunks) if position not in copied_positions]
+
+
+def release_canonicals(db: Session, canonicals: List[Tuple[str, Optional[int]]]) -> int:
+    """
+    Pass the role of canonical chunks that are about to be deleted on to
+    chunks referencing them.
+
+    Call after the rows of the deleted or replaced chunks are gone from
+    the session (flushed, not committed). For each canonical chunk still
+    referenced, the first reference, which has its own copy of the vector,
+    becomes canonical and the other references are pointed at it. The
+    shared index is updated to match; the caller commits.
+
+    Args:
+        db: Database session
+        canonicals: (vector id, signed simhash) of the canonical chunks
+
+    Returns:
+        Number of references that became canonical
+    """
+    vector_ids = [vector_id for vector_id, _ in canonicals]
+    references: Dict[str, List[document.DocumentChunk]] = {}
+    for start in range(0, len(vector_ids), _QUERY_CHUNK):
+        rows = db.query(document.DocumentChunk).filter(
+            document.DocumentChunk.canonical_id.in_(vector_ids[start:start + _QUERY_CHUNK])
+        ).order_by(document.DocumentChunk.document_id, document.DocumentChunk.chunk_index).all()
+        for row in rows:
+            references.setdefault(row.canonical_id, []).append(row)
+
+    shared = _shared_index
+    if shared is not None:
+        for vector_id, value in canonicals:
+            if value is not None:
+                shared.remove(vector_id, to_unsigned(value))
+    for rows in references.values():
+        heir = rows[0]
+        for row in rows[1:]:
+            row.canonical_id = heir.vector_id
+        heir.canonical_id = None
+        if shared is not None and heir.simhash is not None:
+            shared.add(heir.vector_id, to_unsigned(heir.simhash))
+    db.flush()
+    return len(references)
+
+
+def get_references(db: Session, vector_ids: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Near-duplicate chunks of other documents indexed with a copy of each
+    canonical chunk's vector
+
+    Returns:
+        {vector id: [{"document_id", "document_name", "chunk_index"}]} for
+        the ids that have references
+    """
+    references: Dict[str, List[Dict[str, Any]]] = {}
+    for start in range(0, len(vector_ids), _QUERY_CHUNK):
+        rows = db.query(
+            document.DocumentChunk.canonical_id,
+            document.DocumentChunk.document_id,
+            document.Document.filename,
+            document.DocumentChunk.chunk_index
+        ).join(document.Document, document.Document.id == document.DocumentChunk.document_id).filter(
+            document.DocumentChunk.canonical_id.in_(vector_ids[start:start + _QUERY_CHUNK])
+        ).order_by(document.DocumentChunk.document_id, document.DocumentChunk.chunk_index).all()
+        for canonical_id, document_id, filename, chunk_index in rows:
+            references.setdefault(canonical_id, []).append({
+                "document_id": str(document_id),
+                "document_name": filename,
+                "chunk_index": chunk_index,
+            })
+    return references
+
+
+def get_dedup_stats(db: Session) -> Dict[str, Any]:
+    """Counts of canonical and deduplicated chunks over all indexed documents"""
+    chunks = document.DocumentChunk
+    total = db.query(func.count(chunks.id)).scalar()
+    deduplicated = db.query(func.count(chunks.id)).filter(chunks.canonical_id.isnot(None)).scalar()
+    shared = db.query(func.count(func.distinct(chunks.canonical_id))).scalar()
+    return {
+        "enabled": settings.CHUNK_DEDUP_ENABLED,
+        "max_distance": settings.CHUNK_DEDUP_MAX_DISTANCE,
+        "chunks_total": total,
+        "chunks_canonical": total - deduplicated,
+        "chunks_deduplicated": deduplicated,
+        "canonical_chunks_shared": shared,
+        "dedup_ratio": round(deduplicated / total, 4) if total else 0.0,
+        "index_entries": len(_shared_index) if _shared_index is not None else None,
+    }
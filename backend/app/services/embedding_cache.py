@@ -0,0 +1,219 @@
+from app.core.config import settings
+from app.providers.base import EmbeddingProvider
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by sha256(provider/model namespace + chunk text).
+
+    Vectors are stored as float32 blobs in SQLite. Each hit refreshes the
+    row's last-used time, and once the cache holds more than max_entries
+    rows the least recently used ones are evicted.
+    """
+
+    # SQLite limits the number of bound parameters per statement
+    _QUERY_CHUNK = 500
+
+    def __init__(self, path: str = "embedding_cache.db", max_entries: int = 1_000_000):
+        """
+        Initialize embedding cache
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum cached embeddings before LRU eviction
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key BLOB PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(namespace: str, text: str) -> bytes:
+        """Content address of a text embedded by a given provider/model"""
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8", "surrogatepass")).digest()
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """
+        Look up cached embeddings
+
+        Args:
+            keys: Keys from make_key
+
+        Returns:
+            Mapping of found keys to embeddings
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), self._QUERY_CHUNK):
+                chunk = keys[start:start + self._QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [now, *chunk]
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]) -> None:
+        """
+        Store embeddings, evicting least recently used rows past max_entries
+
+        Args:
+            items: Mapping of keys to embeddings
+        """
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items.items()
+                ]
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                # Evict down to 90% so eviction doesn't run on every insert
+                excess = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and size counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": self._count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingProvider(EmbeddingProvider):
+    """Embedding provider wrapper that only sends cache misses to the wrapped provider"""
+
+    def __init__(self, provider: EmbeddingProvider, cache: EmbeddingCache, namespace: str):
+        """
+        Initialize cached embedding provider
+
+        Args:
+            provider: Provider used for cache misses
+            cache: Shared embedding cache
+            namespace: Provider/model name that keys are scoped to
+        """
+        self.provider = provider
+        self.cache = cache
+        self.namespace = namespace
+
+    async def embed_text(self, text: str) -> List[float]:
+        """Generate embedding for a single text"""
+        embeddings = await self.embed_batch([text])
+        return embeddings[0]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts, reusing cached ones"""
+        keys = [EmbeddingCache.make_key(self.namespace, text) for text in texts]
+        cached = await asyncio.to_thread(self.cache.get_many, keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            embeddings = await self.provider.embed_batch(list(missing.values()))
+            fresh = dict(zip(missing.keys(), embeddings))
+            await asyncio.to_thread(self.cache.put_many, fresh)
+            cached.update(fresh)
+
+        return [cached[key] for key in keys]
+
+    def get_dimension(self) -> int:
+        """Get embedding dimension"""
+        return self.provider.get_dimension()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide embedding cache, or None when disabled in settings"""
+    global _embedding_cache
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                path=settings.EMBEDDING_CACHE_PATH,
+                max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+            )
+        return _embedding_cache
+
+
+def with_embedding_cache(
+    provider: EmbeddingProvider,
+    provider_name: str,
+    model: str
+) -> EmbeddingProvider:
+    """
+    Wrap a provider with the shared embedding cache (if enabled)
+
+    Args:
+        provider: Embedding provider
+        provider_name: Provider name, part of the cache key
+        model: Model name, part of the cache key
+
+    Returns:
+        Cached provider, or the provider itself when caching is disabled
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return provider
+    return CachedEmbeddingProvider(provider, cache, f"{provider_name}/{model}")
@@ -0,0 +1,37 @@
+from typing import Any, Dict, List, Tuple
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[Tuple[str, List[Dict[str, Any]]]],
+    top_k: int,
+    k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists by reciprocal rank fusion.
+
+    A chunk scores sum(1 / (k + rank)) over the lists it appears in (rank
+    starting at 1), so it needs no calibration between vector distances
+    and BM25 scores. Each result keeps its per-list score and rank as
+    "<name>_score" / "<name>_rank"; "score" becomes the fused score.
+
+    Args:
+        ranked_lists: (name, results best first) per retriever, e.g. ("vector", [...])
+        top_k: Number of fused results to return
+        k: Damping constant; larger values flatten the weight of top ranks
+
+    Returns:
+        Fused results, best first
+    """
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for name, results in ranked_lists:
+        for rank, result in enumerate(results, start=1):
+            key = result.get("id")
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {**result, "score": 0.0}
+            entry["score"] += 1.0 / (k + rank)
+            entry[f"{name}_score"] = result.get("score")
+            entry[f"{name}_rank"] = rank
+    return sorted(fused.values(), key=lambda result: result["score"], reverse=True)[:top_k]
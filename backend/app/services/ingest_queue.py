@@ -0,0 +1,234 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
+import asyncio
+import os
+import shutil
+import time
+import traceback
+
+from app.core.config import settings
+from app.database.database import SessionLocal
+from app.models import document
+from app.services.bulk_ingestion import BulkDocument, bulk_ingest
+from app.services.config_service import get_configured_vector_store
+from app.services.ingestion import process_document
+
+# Document.status values of documents that have not finished processing
+PENDING_STATUSES = ("queued", "processing", "parsing", "chunking", "embedding", "indexing")
+
+
+class QueueFullError(Exception):
+    """Raised when the ingest queue cannot take more jobs"""
+    pass
+
+
+@dataclass
+class IngestJob:
+    """A document waiting to be parsed, chunked, embedded and indexed"""
+    document_id: int
+    path: str
+    config: Dict[str, Any]
+    # {"filename", "file_hash"} when the upload is a new version of the document
+    new_version: Optional[Dict[str, str]] = None
+    submitted_at: float = field(default_factory=time.time)
+
+    @property
+    def job_id(self) -> int:
+        return self.document_id
+
+    async def run(self, db, progress: Dict[str, Any]) -> None:
+        doc_record = db.query(document.Document).filter(
+            document.Document.id == self.document_id
+        ).first()
+        if doc_record is None:
+            # Deleted while waiting in the queue
+            return
+        await process_document(db, doc_record, self.path, self.config, progress, self.new_version)
+
+    def cleanup(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+@dataclass
+class BulkIngestJob:
+    """Many documents ingested together (see bulk_ingestion.bulk_ingest)"""
+    job_id: str
+    documents: List[BulkDocument]
+    config: Dict[str, Any]
+    submitted_at: float = field(default_factory=time.time)
+
+    async def run(self, db, progress: Dict[str, Any]) -> None:
+        await bulk_ingest(db, self.documents, self.config, progress)
+
+    def cleanup(self) -> None:
+        for doc in self.documents:
+            if os.path.exists(doc.path):
+                os.unlink(doc.path)
+
+
+class IngestJobQueue:
+    """
+    Bounded queue of ingest jobs processed by a fixed pool of asyncio workers.
+
+    Uploads wait as spooled files; the queue size caps how many, and submit() fails
+    fast when it is full so the API can tell clients to retry later.
+    Per-job progress (chunk counts, timings) is kept in memory, while the
+    current stage is persisted in Document.status.
+    """
+
+    def __init__(self, num_workers: int = 2, max_queued: int = 16, spool_dir: str = "ingest_spool"):
+        """
+        Initialize ingest job queue
+
+        Args:
+            num_workers: Number of jobs processed concurrently
+            max_queued: Maximum jobs waiting for a worker
+            spool_dir: Directory holding the uploads of queued jobs
+        """
+        self.num_workers = num_workers
+        self.max_queued = max_queued
+        self.spool_dir = spool_dir
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self.progress: Dict[Union[int, str], Dict[str, Any]] = {}
+
+    async def start(self) -> None:
+        """Start the worker tasks and fail documents orphaned by a previous shutdown"""
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        interrupted_updates = self._fail_interrupted_documents()
+        await self._drop_interrupted_updates(interrupted_updates)
+        # Spooled uploads of interrupted jobs are no longer referenced
+        shutil.rmtree(self.spool_dir, ignore_errors=True)
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.num_workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers; unfinished jobs are failed on next start"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def is_full(self) -> bool:
+        return self._queue is None or self._queue.full()
+
+    def submit(self, job: Union[IngestJob, BulkIngestJob]) -> None:
+        """
+        Enqueue a job without waiting
+
+        Raises:
+            QueueFullError: If the queue is at capacity (or not started)
+        """
+        if self._queue is None:
+            raise QueueFullError("Ingest workers are not running")
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Ingest queue is full ({self.max_queued} jobs waiting)")
+        self.progress[job.job_id] = {
+            "queued_at": job.submitted_at,
+            "queue_position": self._queue.qsize(),
+        }
+
+    def get_progress(self, job_id: Union[int, str]) -> Dict[str, Any]:
+        """In-memory progress details of a job (empty once the server restarted)"""
+        return dict(self.progress.get(job_id, {}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.num_workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+        }
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Union[IngestJob, BulkIngestJob]) -> None:
+        progress = self.progress.setdefault(job.job_id, {})
+        progress.pop("queue_position", None)
+        progress["started_at"] = time.time()
+        db = SessionLocal()
+        try:
+            await job.run(db, progress)
+        except Exception as e:
+            progress["error"] = str(e) or e.__class__.__name__
+            raise
+        finally:
+            progress["finished_at"] = time.time()
+            db.close()
+            job.cleanup()
+
+    def _fail_interrupted_documents(self) -> Dict[int, List[str]]:
+        """
+        Fail the documents whose processing was interrupted. An interrupted
+        update leaves the indexed version in place, so its document stays
+        completed.
+
+        Returns:
+            {document id: vector ids of the indexed version} of the interrupted updates
+        """
+        db = SessionLocal()
+        try:
+            interrupted = db.query(document.Document).filter(
+                document.Document.status.in_(PENDING_STATUSES)
+            ).all()
+            updates = {}
+            for doc in interrupted:
+                if doc.pending_filename is None:
+                    doc.status = "failed"
+                    doc.error_message = "Processing was interrupted by a server restart. Please upload again."
+                    continue
+                doc.status = "completed"
+                doc.error_message = (
+                    f"Update to {doc.pending_filename} was interrupted by a server restart. Please upload it again."
+                )
+                doc.pending_filename = None
+                keep_ids = [chunk.vector_id for chunk in doc.chunks]
+                if not keep_ids:
+                    # Indexed before chunk hashes were recorded, with ids by position
+                    keep_ids = [f"{doc.id}_{i}" for i in range(doc.num_chunks or 0)]
+                updates[doc.id] = keep_ids
+            db.commit()
+            return updates
+        finally:
+            db.close()
+
+    async def _drop_interrupted_updates(self, updates: Dict[int, List[str]]) -> None:
+        """Remove the chunks interrupted updates had indexed, keeping the indexed versions"""
+        if not updates:
+            return
+        db = SessionLocal()
+        try:
+            vector_store = await get_configured_vector_store(db)
+            for document_id, keep_ids in updates.items():
+                await vector_store.delete_by_document(str(document_id), keep_ids=keep_ids)
+        except Exception as e:
+            print(f"Warning: Could not remove chunks of interrupted updates: {e}")
+        finally:
+            db.close()
+
+
+ingest_queue: Optional[IngestJobQueue] = None
+
+
+def get_ingest_queue() -> IngestJobQueue:
+    """Process-wide ingest queue (created with settings on first use)"""
+    global ingest_queue
+    if ingest_queue is None:
+        ingest_queue = IngestJobQueue(
+            num_workers=settings.INGEST_WORKERS,
+            max_queued=settings.INGEST_QUEUE_SIZE,
+            spool_dir=settings.INGEST_SPOOL_DIR
+        )
+    return ingest_queue
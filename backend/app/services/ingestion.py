@@ -0,0 +1,468 @@
+from fastapi import UploadFile
+from sqlalchemy.orm import Session
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, TypeVar
+from datetime import datetime
+import asyncio
+import hashlib
+import os
+import uuid
+
+from app.core.config import settings
+from app.models import document
+from app.providers.base import EmbeddingProvider, VectorStore
+from app.providers.factory import get_embedding_provider
+from app.services.chunker import StreamingChunker, TextChunker
+from app.services.config_service import get_config_value, get_configured_vector_store
+from app.services.dedup import (
+    ChunkDeduplicator, add_reference_vectors, new_deduplicator, release_canonicals, to_signed
+)
+from app.services.embedding_cache import with_embedding_cache
+from app.services.pdf_parser import pdf_parser
+
+T = TypeVar("T")
+
+
+async def get_ingest_config(db: Session) -> Dict[str, Any]:
+    """
+    Read the embedding and vector store settings needed for ingestion
+
+    Raises:
+        ValueError: If the configuration cannot be used for ingestion
+    """
+    config = {
+        "embedding_provider": await get_config_value(db, "embedding_provider") or "OpenAI",
+        "embedding_model": await get_config_value(db, "embedding_model") or "text-embedding-3-small",
+        "embedding_api_key": await get_config_value(db, "embedding_api_key"),
+        "vector_store": await get_config_value(db, "vector_store") or "faiss",
+    }
+    if not config["embedding_api_key"] and config["embedding_provider"] == "OpenAI":
+        raise ValueError("OpenAI API key not configured. Please configure in Settings.")
+    return config
+
+
+async def get_ingest_backends(db: Session, config: Dict[str, Any]):
+    """
+    Build the (cached) embedding provider and vector store for ingestion
+
+    Returns:
+        Tuple of (EmbeddingProvider, VectorStore)
+    """
+    embedding_provider = get_embedding_provider(
+        provider_name=config["embedding_provider"],
+        api_key=config["embedding_api_key"],
+        model=config["embedding_model"]
+    )
+    # Only chunks not embedded before by this provider/model go to the API
+    embedding_provider = with_embedding_cache(
+        embedding_provider, config["embedding_provider"], config["embedding_model"]
+    )
+    vector_store = await get_configured_vector_store(db, embedding_provider.get_dimension())
+    return embedding_provider, vector_store
+
+
+async def spool_upload(file: UploadFile, directory: str, block_size: int = 1024 * 1024) -> Tuple[str, str]:
+    """
+    Copy an upload to a file block by block while hashing it
+
+    Args:
+        file: Uploaded file
+        directory: Spool directory
+        block_size: Bytes read per step
+
+    Returns:
+        Tuple of (spooled file path, sha256 hex digest)
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.pdf")
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, "wb") as f:
+            while True:
+                block = await file.read(block_size)
+                if not block:
+                    break
+                sha256.update(block)
+                f.write(block)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, sha256.hexdigest()
+
+
+def set_status(db: Session, doc_record: document.Document, status: str) -> None:
+    """Record the current pipeline stage on the document"""
+    doc_record.status = status
+    db.commit()
+
+
+async def prefetch(source: AsyncIterator[T], maxsize: int) -> AsyncIterator[T]:
+    """
+    Run an async iterator in its own task, buffering up to maxsize items.
+
+    Lets a pipeline stage work on the next item while the consumer is
+    still busy, with the queue bounding how far it can get ahead.
+    Exceptions of the source are re-raised to the consumer.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+    done = object()
+
+    async def produce():
+        try:
+            async for item in source:
+                await queue.put((item, None))
+            await queue.put((done, None))
+        except Exception as e:
+            await queue.put((done, e))
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def iter_chunk_batches(
+    pages: AsyncIterator[Tuple[str, int, int]],
+    batch_size: int,
+    progress: Dict[str, Any]
+) -> AsyncIterator[List[dict]]:
+    """
+    Chunk parsed page ranges as they arrive and group the chunks into
+    batches of batch_size (the last one may be smaller)
+    """
+    chunker = StreamingChunker(TextChunker())
+    batch: List[dict] = []
+    async for text, pages_done, num_pages in pages:
+        progress["pages_total"] = num_pages
+        progress["pages_parsed"] = pages_done
+        batch.extend(chunker.feed(text))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    batch.extend(chunker.flush())
+    for start in range(0, len(batch), batch_size):
+        yield batch[start:start + batch_size]
+
+
+def assign_chunk_ids(document_id: int, chunks: List[dict], seen: Dict[str, int]) -> None:
+    """
+    Set the content hash (sha256 of the text) and vector id of each chunk.
+
+    Vector ids are derived from the content, "{document_id}_{hash prefix}",
+    with "_{n}" appended to the n-th repeat of the same text in the
+    document, so a chunk keeps its id in every version of the document
+    that contains it.
+
+    Args:
+        document_id: Document the chunks belong to
+        chunks: Chunks in document order; "chunk_hash" and "id" are added
+        seen: Occurrences of each hash so far, shared by the document's batches
+    """
+    for chunk in chunks:
+        digest = hashlib.sha256(chunk["text"].encode("utf-8", "surrogatepass")).hexdigest()
+        repeat = seen.get(digest, 0)
+        seen[digest] = repeat + 1
+        chunk["chunk_hash"] = digest
+        chunk["id"] = f"{document_id}_{digest[:16]}" + (f"_{repeat}" if repeat else "")
+
+
+async def iter_changed_batches(
+    chunk_batches: AsyncIterator[List[dict]],
+    document_id: int,
+    indexed: Dict[str, Tuple[Optional[str], Optional[int]]],
+    chunk_rows: List[Dict[str, Any]],
+    progress: Dict[str, Any],
+    dedup: Optional[ChunkDeduplicator] = None,
+    references: Optional[List[dict]] = None
+) -> AsyncIterator[List[dict]]:
+    """
+    Assign ids to each chunk batch, record every chunk in chunk_rows and
+    yield only the chunks to embed: those whose id is not in indexed and,
+    with dedup, that are not near duplicates of a chunk indexed before
+    (batches with nothing to embed are dropped)
+
+    Args:
+        indexed: {vector id: (canonical_id, simhash)} of the indexed version's chunks
+        references: List the new near-duplicate chunks are appended to
+    """
+    seen: Dict[str, int] = {}
+    async for chunks in chunk_batches:
+        assign_chunk_ids(document_id, chunks, seen)
+        changed = [chunk for chunk in chunks if chunk["id"] not in indexed]
+        if dedup is not None:
+            dedup.assign(document_id, changed)
+        for chunk in chunks:
+            canonical_id, fingerprint = indexed.get(
+                chunk["id"], (chunk.get("canonical_id"), to_signed(chunk.get("simhash")))
+            )
+            chunk_rows.append({
+                "document_id": document_id,
+                "chunk_index": chunk["chunk_index"],
+                "chunk_hash": chunk["chunk_hash"],
+                "vector_id": chunk["id"],
+                "canonical_id": canonical_id,
+                "simhash": fingerprint
+            })
+        to_embed = [chunk for chunk in changed if chunk.get("canonical_id") is None]
+        if references is not None:
+            references.extend(chunk for chunk in changed if chunk.get("canonical_id") is not None)
+        progress["chunks_unchanged"] = progress.get("chunks_unchanged", 0) + len(chunks) - len(changed)
+        progress["chunks_deduplicated"] = progress.get("chunks_deduplicated", 0) + len(changed) - len(to_embed)
+        if to_embed:
+            yield to_embed
+
+
+async def iter_embedded_batches(
+    chunk_batches: AsyncIterator[List[dict]],
+    embedding_provider: EmbeddingProvider,
+    progress: Dict[str, Any]
+) -> AsyncIterator[Tuple[List[dict], List[List[float]]]]:
+    """Embed each chunk batch, yielding (chunks, embeddings) pairs"""
+    async for chunks in chunk_batches:
+        embeddings = await embedding_provider.embed_batch([chunk["text"] for chunk in chunks])
+        progress["chunks_embedded"] = progress.get("chunks_embedded", 0) + len(chunks)
+        yield chunks, embeddings
+
+
+async def rename_chunks(vector_store: VectorStore, document_id: str, ids: List[str], document_name: str) -> None:
+    """
+    Set document_name in the metadata of indexed chunks, re-adding them
+    with their stored vectors (no embedding)
+    """
+    batch_size = settings.INGEST_EMBED_BATCH_SIZE
+    for start in range(0, len(ids), batch_size):
+        vectors, metadata = await vector_store.get_vectors(document_id, ids[start:start + batch_size])
+        if metadata:
+            renamed = [
+                {**{k: v for k, v in meta.items() if k != "id"}, "document_name": document_name}
+                for meta in metadata
+            ]
+            await vector_store.add_vectors(vectors, renamed, [meta["id"] for meta in metadata])
+
+
+async def process_document(
+    db: Session,
+    doc_record: document.Document,
+    path: str,
+    config: Dict[str, Any],
+    progress: Optional[Dict[str, Any]] = None,
+    new_version: Optional[Dict[str, str]] = None
+) -> Dict[str, Any]:
+    """
+    Run the ingestion pipeline for one uploaded document as a stream of stages:
+    1. Parse PDF page ranges
+    2. Chunk text
+    3. Generate embeddings
+    4. Store in vector database
+    5. Track metadata
+
+    Stages are connected by small bounded queues, so memory stays flat
+    regardless of document size and the first chunks are searchable while
+    later pages are still being parsed. Document.status shows the most
+    advanced stage reached and num_chunks the chunks indexed so far. On
+    error the chunks already indexed are removed, the document is marked
+    failed and the exception re-raised.
+
+    With new_version, doc_record is already indexed and the file is a new
+    version of it. Chunks are diffed against the ones recorded for the
+    indexed version by content-derived id (see assign_chunk_ids): only new
+    or changed chunks are embedded and added, and chunks that vanished are
+    deleted once the new version is fully indexed, so an edit costs about
+    as many embeddings as chunks it touched. Unchanged chunks keep their
+    vectors and metadata, including the chunk_index they were first
+    indexed at (document_chunks holds the current order); only a new
+    filename is written to their metadata (see rename_chunks). If the update
+    fails, the chunks it added are removed and the previous version stays
+    searchable (the document stays completed, with error_message set).
+
+    With CHUNK_DEDUP_ENABLED, a new chunk that is a near duplicate of one
+    indexed before (see dedup.ChunkDeduplicator) is not embedded: it is
+    indexed with a copy of that chunk's vector, recorded as canonical_id
+    in its document_chunks row. Chunks referencing vanished chunks take
+    over their role (see dedup.release_canonicals).
+
+    Args:
+        db: Database session owning doc_record
+        doc_record: Document row created for the upload
+        path: PDF file path
+        config: Settings from get_ingest_config
+        progress: Optional dict updated with page and chunk counts as work proceeds
+        new_version: {"filename", "file_hash"} of the file when it updates doc_record
+
+    Returns:
+        Summary of the processed document
+    """
+    progress = progress if progress is not None else {}
+    vector_store = None
+    indexed = {chunk.vector_id: (chunk.canonical_id, chunk.simhash) for chunk in doc_record.chunks}
+    if new_version is not None and doc_record.num_chunks and not indexed:
+        # Indexed before chunk hashes were recorded, with ids by position
+        stale_ids = [f"{doc_record.id}_{i}" for i in range(doc_record.num_chunks)]
+    else:
+        stale_ids = []
+    dedup = new_deduplicator(db)
+    if dedup is not None:
+        dedup.add_canonicals(doc_record.chunks)
+    added_ids: List[str] = []
+    renamed_ids: List[str] = []
+    chunk_rows: List[Dict[str, Any]] = []
+    references: List[dict] = []
+    try:
+        set_status(db, doc_record, "parsing")
+        embedding_provider, vector_store = await get_ingest_backends(db, config)
+        if new_version is None and doc_record.num_chunks:
+            # Chunks left indexed by a run interrupted by a restart (retried after failing)
+            await vector_store.delete_by_document(str(doc_record.id))
+            doc_record.num_chunks = 0
+            db.commit()
+
+        queue_size = settings.INGEST_STAGE_QUEUE_SIZE
+        pages = prefetch(pdf_parser.iter_pages(path), queue_size)
+        chunk_batches = prefetch(
+            iter_changed_batches(
+                iter_chunk_batches(pages, settings.INGEST_EMBED_BATCH_SIZE, progress),
+                doc_record.id, indexed, chunk_rows, progress, dedup, references
+            ),
+            queue_size
+        )
+        embedded = prefetch(
+            iter_embedded_batches(chunk_batches, embedding_provider, progress), queue_size
+        )
+
+        filename = new_version["filename"] if new_version is not None else doc_record.filename
+
+        def chunk_metadata(chunk: dict) -> Dict[str, Any]:
+            return {
+                "document_id": str(doc_record.id),
+                "document_name": filename,
+                "chunk_index": chunk["chunk_index"],
+                "text": chunk["text"]
+            }
+
+        num_chunks = 0
+        async for chunks, embeddings in embedded:
+            if doc_record.status != "indexing":
+                set_status(db, doc_record, "indexing")
+            ids = [chunk["id"] for chunk in chunks]
+            await vector_store.add_vectors(embeddings, [chunk_metadata(chunk) for chunk in chunks], ids)
+            added_ids.extend(ids)
+
+            num_chunks += len(chunks)
+            progress["chunks_indexed"] = num_chunks
+            if new_version is None:
+                doc_record.num_chunks = num_chunks
+                db.commit()
+
+        # Near duplicates of chunks whose document was deleted or updated since
+        orphans = dedup.take_orphaned(doc_record.id) if dedup is not None else []
+        # The others get a copy of their canonical chunk's vector, or are embedded if it is gone
+        references = [chunk for chunk in references if chunk["canonical_id"] is not None]
+        if references:
+            missing = await add_reference_vectors(
+                vector_store, references, [chunk_metadata(chunk) for chunk in references], dedup.exact
+            )
+            missing_ids = {chunk["id"] for chunk in missing}
+            added_ids.extend(chunk["id"] for chunk in references if chunk["id"] not in missing_ids)
+            dedup.promote(doc_record.id, missing)
+            orphans.extend(missing)
+        if orphans:
+            embeddings = await embedding_provider.embed_batch([chunk["text"] for chunk in orphans])
+            ids = [chunk["id"] for chunk in orphans]
+            await vector_store.add_vectors(embeddings, [chunk_metadata(chunk) for chunk in orphans], ids)
+            added_ids.extend(ids)
+            num_chunks += len(orphans)
+            orphan_ids = set(ids)
+            for row in chunk_rows:
+                if row["vector_id"] in orphan_ids:
+                    row["canonical_id"] = None
+
+        if new_version is not None and filename != doc_record.filename:
+            renamed_ids = [row["vector_id"] for row in chunk_rows if row["vector_id"] in indexed]
+            await rename_chunks(vector_store, str(doc_record.id), renamed_ids, filename)
+
+        # Kept chunks may have become canonical (see release_canonicals) since they were read
+        current = dict(db.query(document.DocumentChunk.vector_id, document.DocumentChunk.canonical_id).filter(
+            document.DocumentChunk.document_id == doc_record.id
+        ).all())
+        for row in chunk_rows:
+            if row["vector_id"] in current:
+                row["canonical_id"] = current[row["vector_id"]]
+        vanished = sorted(set(indexed) - {row["vector_id"] for row in chunk_rows})
+        vanished_canonicals = [
+            (vector_id, indexed[vector_id][1]) for vector_id in vanished if current.get(vector_id) is None
+        ]
+
+        doc_record.chunks = [document.DocumentChunk(**row) for row in chunk_rows]
+        doc_record.num_chunks = len(chunk_rows)
+        doc_record.error_message = None
+        if new_version is not None:
+            doc_record.pending_filename = None
+            doc_record.filename = new_version["filename"]
+            doc_record.file_hash = new_version["file_hash"]
+            doc_record.upload_date = datetime.utcnow()
+        db.flush()
+        # Near duplicates of vanished chunks take over their role
+        if vanished_canonicals:
+            release_canonicals(db, vanished_canonicals)
+        removed = stale_ids + vanished
+        if removed:
+            await vector_store.delete_vectors(str(doc_record.id), removed)
+        progress["chunks_removed"] = len(stale_ids) + len(vanished)
+        progress["chunks_total"] = len(chunk_rows)
+        set_status(db, doc_record, "completed")
+        if dedup is not None:
+            dedup.publish(doc_record.id)
+
+        return {
+            "document_id": doc_record.id,
+            "filename": doc_record.filename,
+            "num_chunks": doc_record.num_chunks,
+            "chunks_embedded": num_chunks,
+            "chunks_deduplicated": progress.get("chunks_deduplicated", 0),
+            "chunks_removed": progress["chunks_removed"],
+            "embedding_provider": config["embedding_provider"],
+            "embedding_model": config["embedding_model"],
+            "vector_store": config["vector_store"]
+        }
+
+    except BaseException as e:
+        error = str(e) or e.__class__.__name__
+        db.rollback()
+        if dedup is not None:
+            dedup.discard(doc_record.id)
+        if new_version is not None:
+            # Drop what the update added; the previous version stays indexed
+            if vector_store is not None and added_ids:
+                try:
+                    await vector_store.delete_vectors(str(doc_record.id), added_ids)
+                except Exception as cleanup_error:
+                    print(f"Warning: Could not remove chunks of the failed update: {cleanup_error}")
+            if vector_store is not None and renamed_ids:
+                try:
+                    await rename_chunks(vector_store, str(doc_record.id), renamed_ids, doc_record.filename)
+                except Exception as cleanup_error:
+                    print(f"Warning: Could not restore the name of the kept chunks: {cleanup_error}")
+            doc_record.status = "completed"
+            doc_record.pending_filename = None
+            doc_record.error_message = f"Update to {new_version['filename']} failed: {error}"
+            db.commit()
+            raise
+        # Don't leave a partially indexed document searchable
+        if vector_store is not None and added_ids:
+            try:
+                await vector_store.delete_by_document(str(doc_record.id))
+            except Exception as cleanup_error:
+                print(f"Warning: Could not remove partially indexed chunks: {cleanup_error}")
+        # Update document status to failed
+        doc_record.status = "failed"
+        doc_record.num_chunks = 0
+        doc_record.error_message = error
+        db.commit()
+        raise
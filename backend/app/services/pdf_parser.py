@@ -1,10 +1,222 @@
-from markitdown import MarkItDown
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple, Union
+import asyncio
+import io
+import multiprocessing
 import os
-import tempfile
+import threading
+
+from app.core.config import settings
+
+# MarkItDown instance of the current process, created once and reused.
+# In pool workers it is built by the initializer so the first job doesn't
+# pay for importing and setting up the converters.
+_markitdown = None
+
+_PDF_STREAM_INFO = None
+
+
+def _get_markitdown():
+    global _markitdown, _PDF_STREAM_INFO
+    if _markitdown is None:
+        from markitdown import MarkItDown, StreamInfo
+        _markitdown = MarkItDown()
+        _PDF_STREAM_INFO = StreamInfo(extension=".pdf", mimetype="application/pdf")
+    return _markitdown
+
+
+def _init_worker() -> None:
+    _get_markitdown()
+
+
+# A PDF is passed to workers either as bytes or as the path of a file they read themselves
+PDFSource = Union[bytes, str]
+
+
+def _open(source: PDFSource) -> BinaryIO:
+    if isinstance(source, str):
+        return open(source, "rb")
+    return io.BytesIO(source)
+
+
+def _convert(source: PDFSource) -> str:
+    """Convert a whole PDF to Markdown from memory or its file (no temporary copy)"""
+    md = _get_markitdown()
+    with _open(source) as stream:
+        result = md.convert_stream(stream, stream_info=_PDF_STREAM_INFO)
+    return result.text_content
+
+
+def _count_pages(source: PDFSource) -> int:
+    from pdfminer.pdfpage import PDFPage
+    with _open(source) as stream:
+        return sum(1 for _ in PDFPage.get_pages(stream))
+
+
+def _parse_or_count(source: PDFSource, split_min_pages: int) -> Tuple[Optional[str], int]:
+    """
+    Convert small PDFs right away; for large ones only report the page count
+
+    Returns:
+        Tuple of (markdown or None when the PDF should be split, page count)
+    """
+    num_pages = _count_pages(source)
+    if num_pages < split_min_pages:
+        return _convert(source), num_pages
+    return None, num_pages
+
+
+def _extract_pages(source: PDFSource, start: int, end: int) -> str:
+    """
+    Extract the pdfminer text of pages [start, end)
+
+    pdfminer ends every page with a form feed, so joining the ranges in
+    order gives the text of the whole file.
+    """
+    from pdfminer.high_level import extract_text
+    with _open(source) as stream:
+        return extract_text(stream, page_numbers=range(start, end))
+
+
+def _plumber_pages(source: PDFSource, start: int, end: int) -> Tuple[Optional[int], str]:
+    """
+    Run MarkItDown's PdfConverter page pass over pages [start, end)
+
+    Pages with tables or forms are converted to Markdown tables and the
+    others to pdfplumber text, as PdfConverter does.
+
+    Returns:
+        Tuple of (pages with tables or forms, or None when pdfplumber failed;
+        the range's pdfplumber Markdown)
+    """
+    import pdfplumber
+    # Private to markitdown, hence the version range in requirements.txt
+    from markitdown.converters._pdf_converter import _extract_form_content_from_words
+
+    form_pages: Optional[int] = 0
+    markdown_chunks = []
+    try:
+        with _open(source) as stream, pdfplumber.open(stream, pages=list(range(start + 1, end + 1))) as pdf:
+            for page in pdf.pages:
+                page_content = _extract_form_content_from_words(page)
+                if page_content is not None:
+                    form_pages += 1
+                    if page_content.strip():
+                        markdown_chunks.append(page_content)
+                else:
+                    text = page.extract_text()
+                    if text and text.strip():
+                        markdown_chunks.append(text.strip())
+                page.close()
+    except Exception:
+        form_pages = None
+    return form_pages, "\n\n".join(markdown_chunks)
+
+
+def _convert_pages(source: PDFSource, start: int, end: int) -> Tuple[Optional[int], str, Optional[str]]:
+    """
+    _plumber_pages, plus the pdfminer text of the range when no page had
+    tables or forms. Which of the two is used depends on the whole file,
+    so the parent decides (see PDFParser._iter_ranges).
+
+    Returns:
+        Tuple of (pages with tables or forms, or None when pdfplumber failed;
+        the range's pdfplumber Markdown; its pdfminer text or None)
+    """
+    form_pages, markdown = _plumber_pages(source, start, end)
+    text = _extract_pages(source, start, end) if not form_pages else None
+    return form_pages, markdown, text
+
+
+def _numbering_cut(text: str) -> int:
+    """
+    Length of the longest prefix of text ending with a line that MarkItDown's
+    partial-numbering merge can process on its own: a non-blank line that is
+    not a lone ".1"-style number waiting for the next line
+    """
+    from markitdown.converters._pdf_converter import PARTIAL_NUMBERING_PATTERN
+
+    end = text.rfind("\n") + 1
+    while end > 0:
+        line_start = text.rfind("\n", 0, end - 1) + 1
+        line = text[line_start:end - 1].strip()
+        if line and not PARTIAL_NUMBERING_PATTERN.match(line):
+            # Line breaks and blank lines after it may still be stripped
+            return end - 1
+        end = line_start
+    return 0
+
+
+class _NumberingMerger:
+    """
+    Applies MarkItDown's partial-numbering merge to text arriving in
+    pieces, holding back the tail that the next piece may still merge with
+    """
 
-class PDFParser:
     def __init__(self):
-        self.md = MarkItDown()
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        from markitdown.converters._pdf_converter import _merge_partial_numbering_lines
+
+        self._pending += text
+        cut = _numbering_cut(self._pending)
+        if cut == 0:
+            return ""
+        ready, self._pending = self._pending[:cut], self._pending[cut:]
+        return _merge_partial_numbering_lines(ready)
+
+    def finish(self, strip: bool = False) -> str:
+        from markitdown.converters._pdf_converter import _merge_partial_numbering_lines
+
+        text, self._pending = self._pending, ""
+        return _merge_partial_numbering_lines(text.rstrip() if strip else text)
+
+
+class PDFParser:
+    """
+    Converts PDFs to Markdown in a pool of worker processes.
+
+    Each worker keeps a warm MarkItDown instance. PDFs are passed as bytes
+    and converted from an in-memory stream. PDFs with many pages are split
+    into page ranges that are converted in parallel with MarkItDown's
+    PdfConverter logic and joined in order into the same Markdown.
+    The pool is created on first use.
+    """
+
+    # Pages without tables or forms held back while the extraction of the whole file is open
+    MAX_HELD_PAGES = 100
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        pages_per_task: int = 25,
+        split_min_pages: int = 50
+    ):
+        """
+        Initialize PDF parser
+
+        Args:
+            max_workers: Worker processes
+            pages_per_task: Pages converted per task when a PDF is split
+            split_min_pages: Page count from which a PDF is split across workers
+        """
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.split_min_pages = split_min_pages
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that runs an event loop and threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+            return self._executor
 
     async def parse(self, file_path: str) -> str:
         """
@@ -12,29 +224,185 @@ class PDFParser:
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
-        
-        result = self.md.convert(file_path)
-        return result.text_content
 
-pdf_parser = PDFParser()
+        # Workers read the file themselves
+        return await self._parse_source(file_path)
+
+    async def parse_bytes(self, content: bytes) -> str:
+        """
+        Parse PDF bytes to Markdown without blocking the event loop
+
+        Args:
+            content: Raw PDF bytes
+
+        Returns:
+            Markdown text
+        """
+        return await self._parse_source(content)
+
+    async def _parse_source(self, source: PDFSource) -> str:
+        parts = [text async for text, _, _ in self._iter_source(source)]
+        return "".join(parts)
+
+    async def iter_pages(self, path: str) -> AsyncIterator[Tuple[str, int, int]]:
+        """
+        Parse a PDF file in page ranges, yielding each range as soon as it
+        and all ranges before it are done.
+
+        Up to max_workers ranges are parsed ahead; the workers read the
+        file themselves, so the PDF is never held in this process. PDFs
+        below split_min_pages are converted whole and yielded at once.
+        The joined text is what MarkItDown converts the whole file to,
+        which means ranges are held back until the first page with a table
+        or form, or the end of the file, shows which extraction it uses;
+        after MAX_HELD_PAGES without one the extraction is chosen per
+        range instead (see _iter_ranges).
+
+        Args:
+            path: PDF file path
+
+        Yields:
+            Tuples of (markdown, pages done so far, total pages)
+        """
+        async for item in self._iter_source(path):
+            yield item
+
+    async def _iter_source(self, source: PDFSource) -> AsyncIterator[Tuple[str, int, int]]:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        text, num_pages = await loop.run_in_executor(
+            executor, _parse_or_count, source, self.split_min_pages
+        )
+        if text is not None:
+            yield text, num_pages, num_pages
+            return
+
+        async for text, end in self._iter_ranges(source, num_pages):
+            yield text, end, num_pages
+
+    async def _iter_ranges(self, source: PDFSource, num_pages: int) -> AsyncIterator[Tuple[str, int]]:
+        """
+        Convert a PDF range by range, reproducing MarkItDown's PdfConverter
+        on the whole file: if any page has tables or forms, the pdfplumber
+        Markdown of all pages joined by blank lines and stripped, otherwise
+        (or if pdfplumber fails) the pdfminer text; then partial numbering
+        merged into the following line.
+
+        Ranges are held back (only their pdfminer text) until that choice
+        is known. Once MAX_HELD_PAGES pages without tables or forms are
+        held, the choice is made per range from then on: pdfminer text for
+        ranges without tables or forms, pdfplumber Markdown for the others.
+        This differs from MarkItDown only for long PDFs whose first table
+        comes after that many pages, and keeps memory and the time to the
+        first range bounded.
+
+        Yields:
+            Tuples of (markdown, end page of the range)
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        ranges = self._page_ranges(num_pages)
+        merger = _NumberingMerger()
+        # "forms" (pdfplumber Markdown), "text" (pdfminer) or "ranges" (chosen per range) once known
+        mode = None
+        # (start, end, pdfminer text) of the ranges taken while mode is None
+        held = []
+        held_pages = 0
+        emitted = False
+
+        async def text_of(start: int, end: int, text: Optional[str]) -> str:
+            if text is None:
+                text = await loop.run_in_executor(executor, _extract_pages, source, start, end)
+            return text
+
+        async def convert(start: int, end: int, form_pages: Optional[int], markdown: str, text: Optional[str]) -> str:
+            nonlocal emitted
+            if mode == "text" or form_pages is None or (mode == "ranges" and not form_pages):
+                # After tables were found, a range pdfplumber fails on falls back to pdfminer
+                piece = await text_of(start, end, text)
+            elif not markdown:
+                return ""
+            elif mode == "ranges":
+                piece = markdown + "\n\n"
+            else:
+                piece = ("\n\n" + markdown) if emitted else markdown.lstrip()
+                emitted = True
+            return merger.feed(piece)
+
+        async def release(start: int, end: int, text: Optional[str]) -> str:
+            if mode == "forms":
+                # Only the pdfminer text was held; convert the range again
+                form_pages, markdown = await loop.run_in_executor(executor, _plumber_pages, source, start, end)
+                return await convert(start, end, form_pages, markdown, text)
+            return await convert(start, end, 0, "", text)
+
+        async def take(start: int, end: int, future) -> List[Tuple[str, int]]:
+            nonlocal mode, held, held_pages
+            form_pages, markdown, text = await future
+            if mode is None:
+                if form_pages is None:
+                    mode = "text"
+                elif form_pages:
+                    mode = "forms"
+                elif held_pages + end - start <= self.MAX_HELD_PAGES:
+                    # No table or form so far: the extraction is still open
+                    held.append((start, end, text))
+                    held_pages += end - start
+                    return []
+                else:
+                    mode = "ranges"
+            items = [(await release(*item), item[1]) for item in held]
+            held = []
+            items.append((await convert(start, end, form_pages, markdown, text), end))
+            return items
+
+        pending = []
+        try:
+            for start, end in ranges:
+                pending.append((start, end, loop.run_in_executor(executor, _convert_pages, source, start, end)))
+                if len(pending) >= self.max_workers:
+                    for item in await take(*pending.pop(0)):
+                        yield item
+            while pending:
+                for item in await take(*pending.pop(0)):
+                    yield item
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+        if mode is None:
+            mode = "text"
+            for item in held:
+                yield await release(*item), item[1]
+        if mode == "forms" and not emitted:
+            # Nothing on the pages: MarkItDown falls back to the pdfminer text
+            mode = "text"
+            for start, end in ranges:
+                yield merger.feed(await text_of(start, end, None)), end
+        yield merger.finish(strip=mode == "forms"), num_pages
+
+    def _page_ranges(self, num_pages: int) -> List[Tuple[int, int]]:
+        # At least one range per worker so a large PDF keeps the whole pool busy
+        size = max(1, min(self.pages_per_task, -(-num_pages // self.max_workers)))
+        return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+pdf_parser = PDFParser(
+    max_workers=settings.PDF_PARSE_WORKERS,
+    pages_per_task=settings.PDF_PAGES_PER_TASK,
+    split_min_pages=settings.PDF_SPLIT_MIN_PAGES
+)
 
 def parse_pdf(content: bytes) -> str:
     """
-    Parse PDF from bytes content.
-    Creates a temporary file, parses it, and returns the text.
+    Parse PDF from bytes content in the calling thread.
+    Use pdf_parser.parse_bytes() from async code to parse in the worker pool.
     """
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
-    
-    try:
-        # Parse the PDF
-        md = MarkItDown()
-        result = md.convert(tmp_path)
-        return result.text_content
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
-
+    return _convert(content)
@@ -0,0 +1,158 @@
+from app.core.config import settings
+from app.providers.base import VectorStore
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import threading
+import time
+import numpy as np
+
+
+class QueryCache:
+    """
+    In-memory caches in front of the search endpoint.
+
+    Query embeddings are kept in an LRU keyed by (provider/model, query
+    text); they don't depend on the index, so writes leave them alone.
+    Search results are kept in an LRU with a TTL keyed by the query,
+    top_k and filters. Each result entry remembers the store it came from
+    and the store's version at search time; any add, delete or index
+    setting change bumps the version, so stale entries are dropped on
+    their next lookup. The TTL bounds staleness when another process
+    writes to a shared store (e.g. pgvector).
+    """
+
+    def __init__(
+        self,
+        max_embeddings: int = 1024,
+        max_results: int = 1024,
+        result_ttl_seconds: float = 300.0
+    ):
+        """
+        Initialize query cache
+
+        Args:
+            max_embeddings: Query embeddings kept before LRU eviction
+            max_results: Result lists kept before LRU eviction
+            result_ttl_seconds: Lifetime of a cached result list
+        """
+        self.max_embeddings = max_embeddings
+        self.max_results = max_results
+        self.result_ttl_seconds = result_ttl_seconds
+        self._embeddings: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        # key -> (store, store version, expiry time, results)
+        self._results: "OrderedDict[Hashable, Tuple[VectorStore, int, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+        self.result_hits = 0
+        self.result_misses = 0
+        self.result_invalidations = 0
+
+    def get_embedding(self, namespace: str, query: str) -> Optional[np.ndarray]:
+        """Cached embedding of a query for a provider/model, or None"""
+        key = (namespace, query)
+        with self._lock:
+            vector = self._embeddings.get(key)
+            if vector is None:
+                self.embedding_misses += 1
+                return None
+            self._embeddings.move_to_end(key)
+            self.embedding_hits += 1
+            return vector
+
+    def put_embedding(self, namespace: str, query: str, vector: List[float]) -> np.ndarray:
+        """Cache a query embedding, returned as a float32 array"""
+        array = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._embeddings[(namespace, query)] = array
+            self._embeddings.move_to_end((namespace, query))
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+        return array
+
+    def get_results(self, store: VectorStore, key: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """
+        Cached results for a search key, if computed by this store at its current version
+
+        Args:
+            store: Store the search would run against
+            key: Hashable search key (query, top_k, filters)
+
+        Returns:
+            Result list, or None on a miss
+        """
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                self.result_misses += 1
+                return None
+            cached_store, version, expires, results = entry
+            if cached_store is not store or version != store.version or expires < time.monotonic():
+                del self._results[key]
+                self.result_misses += 1
+                self.result_invalidations += 1
+                return None
+            self._results.move_to_end(key)
+            self.result_hits += 1
+            return results
+
+    def put_results(
+        self,
+        store: VectorStore,
+        version: int,
+        key: Hashable,
+        results: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Cache search results
+
+        Args:
+            store: Store that produced the results
+            version: Store version read before the search started, so a
+                write that raced with the search invalidates the entry
+            key: Hashable search key
+            results: Result list
+        """
+        expires = time.monotonic() + self.result_ttl_seconds
+        with self._lock:
+            self._results[key] = (store, version, expires, results)
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached embeddings and results"""
+        with self._lock:
+            self._embeddings.clear()
+            self._results.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Size and hit rate counters"""
+        with self._lock:
+            embedding_lookups = self.embedding_hits + self.embedding_misses
+            result_lookups = self.result_hits + self.result_misses
+            return {
+                "embeddings": len(self._embeddings),
+                "max_embeddings": self.max_embeddings,
+                "embedding_hits": self.embedding_hits,
+                "embedding_misses": self.embedding_misses,
+                "embedding_hit_rate": (
+                    round(self.embedding_hits / embedding_lookups, 4) if embedding_lookups else 0.0
+                ),
+                "results": len(self._results),
+                "max_results": self.max_results,
+                "result_ttl_seconds": self.result_ttl_seconds,
+                "result_hits": self.result_hits,
+                "result_misses": self.result_misses,
+                "result_hit_rate": (
+                    round(self.result_hits / result_lookups, 4) if result_lookups else 0.0
+                ),
+                "result_invalidations": self.result_invalidations,
+            }
+
+
+query_cache = QueryCache(
+    max_embeddings=settings.QUERY_EMBEDDING_CACHE_SIZE,
+    max_results=settings.QUERY_RESULT_CACHE_SIZE,
+    result_ttl_seconds=settings.QUERY_RESULT_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,247 @@
+from app.core.config import settings
+from app.providers.embedding.batching import estimate_tokens
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import threading
+import time
+import numpy as np
+
+
+class CrossEncoderReranker:
+    """
+    Re-ranks search candidates with a local cross-encoder.
+
+    The (query, chunk) pairs of a request that are not in the score cache
+    are scored in one inference call on the reranker's thread: pairs are
+    sorted by length and run in buckets under a padded token budget, so
+    short chunks aren't padded to the length of the longest. Scores are
+    cached in an LRU keyed by (query hash, chunk id); chunk ids are derived
+    from chunk content, so a cached score holds as long as the id exists.
+
+    When scoring runs over the latency budget the candidates are returned
+    in their original order. Scoring that has started still finishes in the
+    background and fills the cache, so repeating the query is then served
+    from it; scoring that hasn't started by the time its request fell back
+    is dropped, so a backlog can't build up behind requests that no longer
+    wait for it. The model loads on first use, which usually takes the
+    first request over its budget.
+    """
+
+    def __init__(
+        self,
+        model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        backend: str = "torch",
+        device: str = "cpu",
+        max_batch_tokens: int = 16384,
+        max_length: int = 512,
+        cache_size: int = 100000
+    ):
+        """
+        Initialize cross-encoder reranker
+
+        Args:
+            model: sentence-transformers CrossEncoder name or local directory
+            backend: torch or onnx (ONNX Runtime)
+            device: Device for the torch backend (cpu, cuda)
+            max_batch_tokens: Padded tokens (pairs x longest pair) per bucket
+            max_length: Tokens of a pair beyond which it is truncated
+            cache_size: Pair scores kept before LRU eviction
+        """
+        self.model = model
+        self.backend = backend
+        self.device = device
+        self.max_batch_tokens = max_batch_tokens
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._model = None
+        # One thread: pairs of concurrent requests are scored one call at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._scores: "OrderedDict[Tuple[bytes, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.reranked = 0
+        self.fallbacks = 0
+        self.expired = 0
+        self.errors = 0
+        self.last_score_seconds: Optional[float] = None
+
+    def _get_model(self):
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            if self.backend not in ("torch", "onnx"):
+                raise ValueError(f"Unknown rerank backend: {self.backend}. Expected torch or onnx")
+            options = {"backend": self.backend, "max_length": self.max_length}
+            if self.backend == "torch":
+                options["device"] = self.device
+            self._model = CrossEncoder(self.model, **options)
+        return self._model
+
+    def plan_buckets(self, pairs: List[Tuple[str, str]]) -> List[List[int]]:
+        """
+        Group pair positions into length-sorted buckets within the padded token budget
+
+        Args:
+            pairs: (query, chunk text) pairs
+
+        Returns:
+            List of buckets, each a list of indices into pairs
+        """
+        lengths = [min(estimate_tokens(query) + estimate_tokens(text), self.max_length) for query, text in pairs]
+        buckets = []
+        bucket: List[int] = []
+        for i in sorted(range(len(pairs)), key=lambda i: lengths[i]):
+            # Sorted ascending, so the current pair is the longest in the bucket
+            if bucket and (len(bucket) + 1) * lengths[i] > self.max_batch_tokens:
+                buckets.append(bucket)
+                bucket = []
+            bucket.append(i)
+        if bucket:
+            buckets.append(bucket)
+        return buckets
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """Cross-encoder scores of (query, chunk text) pairs (blocking)"""
+        started = time.perf_counter()
+        model = self._get_model()
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for bucket in self.plan_buckets(pairs):
+            scores[bucket] = model.predict(
+                [pairs[i] for i in bucket],
+                batch_size=len(bucket),
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ).reshape(len(bucket), -1)[:, 0]
+        self.last_score_seconds = time.perf_counter() - started
+        return scores
+
+    def _score_by(self, pairs: List[Tuple[str, str]], deadline: float) -> Optional[np.ndarray]:
+        """score_pairs, unless the request gave up waiting (deadline passed) before it started"""
+        if time.monotonic() > deadline:
+            self.expired += 1
+            return None
+        return self.score_pairs(pairs)
+
+    def _cache_scores(self, keys: List[Tuple[bytes, str]], scores: np.ndarray) -> None:
+        with self._lock:
+            for key, score in zip(keys, scores.tolist()):
+                self._scores[key] = score
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    async def rerank(
+        self,
+        query: str,
+        results: List[Dict[str, Any]],
+        top_k: int,
+        budget_seconds: float
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Order search results by cross-encoder score
+
+        Args:
+            query: Query text
+            results: Candidates with "id" and "text", best first
+            top_k: Number of results to return
+            budget_seconds: Time allowed for scoring before falling back
+
+        Returns:
+            Tuple of (top_k results, each with "rerank_score" when
+            reranked; whether they were reranked)
+        """
+        if not results:
+            return results, True
+        query_hash = hashlib.sha256(query.encode("utf-8", "surrogatepass")).digest()[:16]
+        keys = [(query_hash, str(result.get("id"))) for result in results]
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        self.cache_hits += len(results) - len(missing)
+        self.cache_misses += len(missing)
+
+        if missing:
+            missing_keys = [keys[i] for i in missing]
+            pairs = [(query, results[i].get("text") or "") for i in missing]
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._score_by, pairs, time.monotonic() + budget_seconds
+            )
+
+            def cache_when_done(done: asyncio.Future) -> None:
+                if not done.cancelled() and done.exception() is None and done.result() is not None:
+                    self._cache_scores(missing_keys, done.result())
+
+            future.add_done_callback(cache_when_done)
+            try:
+                # Shielded: scoring keeps going (and fills the cache) past the budget
+                missing_scores = await asyncio.wait_for(asyncio.shield(future), budget_seconds)
+            except asyncio.TimeoutError:
+                self.fallbacks += 1
+                return results[:top_k], False
+            except Exception as e:
+                self.errors += 1
+                print(f"Warning: Re-ranking with {self.model} failed, keeping search order: {e}")
+                return results[:top_k], False
+            if missing_scores is None:
+                # Waited in the queue past the budget (the timeout raced the worker)
+                self.fallbacks += 1
+                return results[:top_k], False
+            for i, score in zip(missing, missing_scores.tolist()):
+                scores[i] = score
+
+        self.reranked += 1
+        order = sorted(range(len(results)), key=lambda i: scores[i], reverse=True)[:top_k]
+        return [{**results[i], "rerank_score": scores[i]} for i in order], True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache size and hit rate, and how often the budget was exceeded"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "model": self.model,
+            "loaded": self._model is not None,
+            "cached_scores": len(self._scores),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "expired": self.expired,
+            "errors": self.errors,
+            "last_score_seconds": round(self.last_score_seconds, 4) if self.last_score_seconds is not None else None,
+        }
+
+
+_rerankers: Dict[str, CrossEncoderReranker] = {}
+_rerankers_lock = threading.Lock()
+
+
+def get_reranker(model: str) -> CrossEncoderReranker:
+    """Process-wide reranker of a model (created with settings on first use)"""
+    with _rerankers_lock:
+        reranker = _rerankers.get(model)
+        if reranker is None:
+            reranker = CrossEncoderReranker(
+                model=model,
+                backend=settings.RERANK_BACKEND,
+                device=settings.RERANK_DEVICE,
+                max_batch_tokens=settings.RERANK_MAX_BATCH_TOKENS,
+                max_length=settings.RERANK_MAX_LENGTH,
+                cache_size=settings.RERANK_CACHE_SIZE
+            )
+            _rerankers[model] = reranker
+        return reranker
+
+
+def get_reranker_stats() -> List[Dict[str, Any]]:
+    """Stats of every reranker created in this process"""
+    with _rerankers_lock:
+        rerankers = list(_rerankers.values())
+    return [reranker.get_stats() for reranker in rerankers]
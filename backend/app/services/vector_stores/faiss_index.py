@@ -0,0 +1,217 @@
+from typing import Optional
+import math
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("Flat", "IVFFlat", "HNSWFlat", "IVFPQ")
+
+# Index types that need a k-means training pass before vectors can be added
+TRAINED_INDEX_TYPES = ("IVFFlat", "IVFPQ")
+
+# cosine is inner product over L2-normalized vectors
+METRICS = ("l2", "cosine", "ip")
+
+# Per-component vector storage; IVFPQ always stores PQ codes ("pq")
+STORAGE_TYPES = ("float32", "float16", "int8")
+
+_QUANTIZER_TYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def faiss_metric(metric: str) -> int:
+    """FAISS metric constant for one of METRICS"""
+    if metric not in METRICS:
+        raise ValueError(f"Unknown FAISS metric: {metric}. Expected one of {METRICS}")
+    return faiss.METRIC_L2 if metric == "l2" else faiss.METRIC_INNER_PRODUCT
+
+
+def storage_for(index_type: str, storage: str) -> str:
+    """Storage an index of the given type actually uses (IVFPQ ignores the setting)"""
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown FAISS storage: {storage}. Expected one of {STORAGE_TYPES}")
+    return "pq" if index_type == "IVFPQ" else storage
+
+
+def auto_nlist(num_vectors: int) -> int:
+    """Number of IVF lists for a corpus size (~4 * sqrt(n), at least 39 points per list)"""
+    nlist = int(4 * math.sqrt(max(num_vectors, 1)))
+    return max(1, min(nlist, num_vectors // 39, 65536))
+
+
+def auto_pq_m(dimension: int) -> int:
+    """Number of PQ sub-quantizers: largest divisor of the dimension giving >= 8 dims each"""
+    for m in range(max(1, dimension // 8), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def build_index(
+    index_type: str,
+    dimension: int,
+    num_vectors: int = 0,
+    hnsw_m: int = 32,
+    metric: str = "l2",
+    storage: str = "float32"
+) -> faiss.Index:
+    """
+    Create an empty index of the given type that accepts explicit int64 ids.
+
+    Flat and HNSW are wrapped in an IndexIDMap2; IVF indexes carry ids
+    natively and get a hashtable direct map so vectors can be removed and
+    reconstructed by id. float16 and int8 storage use FAISS scalar
+    quantizers (2x and 4x smaller than float32); int8 has to be trained
+    on a sample to learn the value range of each component.
+
+    Args:
+        index_type: One of INDEX_TYPES
+        dimension: Vector dimension
+        num_vectors: Corpus size, used to size IVF lists
+        hnsw_m: Graph degree for HNSW
+        metric: One of METRICS
+        storage: One of STORAGE_TYPES (ignored by IVFPQ)
+
+    Returns:
+        Untrained (for IVF types and int8 storage) FAISS index
+    """
+    metric_type = faiss_metric(metric)
+    storage = storage_for(index_type, storage)
+    qtype = _QUANTIZER_TYPES.get(storage)
+    if index_type == "Flat":
+        if qtype is None:
+            return faiss.IndexIDMap2(faiss.IndexFlat(dimension, metric_type))
+        return faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dimension, qtype, metric_type))
+    if index_type == "HNSWFlat":
+        if qtype is None:
+            return faiss.IndexIDMap2(faiss.IndexHNSWFlat(dimension, hnsw_m, metric_type))
+        return faiss.IndexIDMap2(faiss.IndexHNSWSQ(dimension, qtype, hnsw_m, metric_type))
+    quantizer = faiss.IndexFlat(dimension, metric_type)
+    if index_type == "IVFFlat":
+        if qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dimension, auto_nlist(num_vectors), metric_type)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dimension, auto_nlist(num_vectors), qtype, metric_type
+            )
+    elif index_type == "IVFPQ":
+        index = faiss.IndexIVFPQ(
+            quantizer, dimension, auto_nlist(num_vectors), auto_pq_m(dimension), 8, metric_type
+        )
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}. Expected one of {INDEX_TYPES}")
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Name (one of INDEX_TYPES) of an index built by build_index"""
+    if isinstance(index, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(index.index)
+        return "HNSWFlat" if isinstance(inner, faiss.IndexHNSW) else "Flat"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "IVFPQ"
+    if isinstance(index, faiss.IndexIVF):
+        return "IVFFlat"
+    return "Flat"
+
+
+def index_storage_of(index: faiss.Index) -> str:
+    """Vector storage (one of STORAGE_TYPES, or "pq") of an index built by build_index"""
+    if isinstance(index, faiss.IndexIDMap2):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        return "float16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "float32"
+
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """
+    Fraction of the exact nearest neighbours that an approximate search found
+
+    Args:
+        approximate: (nq, k) labels returned by the index
+        exact: (nq, k) labels of the exact neighbours (-1 where there are fewer than k)
+
+    Returns:
+        Recall averaged over all queries
+    """
+    found = 0
+    total = 0
+    for row_approximate, row_exact in zip(approximate, exact):
+        expected = set(row_exact[row_exact >= 0].tolist())
+        found += len(expected.intersection(row_approximate.tolist()))
+        total += len(expected)
+    return found / total if total else 1.0
+
+
+def supports_ids(index: faiss.Index) -> bool:
+    """Whether the index is labelled with explicit ids (as opposed to row positions)"""
+    return isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF))
+
+
+def remove_ids(index: faiss.Index, labels: np.ndarray) -> None:
+    """
+    Remove vectors by id
+
+    Raises:
+        RuntimeError: If the index type cannot remove vectors (HNSW)
+    """
+    if isinstance(index, faiss.IndexIVF):
+        # The hashtable direct map only accepts an explicit id array
+        index.remove_ids(faiss.IDSelectorArray(labels.astype(np.int64)))
+    else:
+        index.remove_ids(faiss.IDSelectorBatch(labels.astype(np.int64)))
+
+
+def search_parameters(
+    index: faiss.Index,
+    selector=None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+):
+    """
+    Search parameters of the right type for the index, or None when there is nothing to set
+
+    Args:
+        index: Index to be searched
+        selector: Optional faiss.IDSelector restricting the candidate ids
+        nprobe: IVF lists to visit
+        ef_search: HNSW candidate list size
+    """
+    index_type = index_type_of(index)
+    kwargs = {}
+    if selector is not None:
+        kwargs["sel"] = selector
+    if index_type in TRAINED_INDEX_TYPES:
+        if nprobe:
+            kwargs["nprobe"] = nprobe
+        return faiss.SearchParametersIVF(**kwargs) if kwargs else None
+    if index_type == "HNSWFlat":
+        if ef_search:
+            kwargs["efSearch"] = ef_search
+        return faiss.SearchParametersHNSW(**kwargs) if kwargs else None
+    return faiss.SearchParameters(**kwargs) if kwargs else None
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Approximate memory held by the index's vectors, graph links and id maps"""
+    ntotal = index.ntotal
+    if isinstance(index, faiss.IndexIDMap2):
+        inner = faiss.downcast_index(index.index)
+        # id_map plus the reverse hash map
+        id_bytes = ntotal * 8 * 3
+        if isinstance(inner, faiss.IndexHNSW):
+            storage = faiss.downcast_index(inner.storage)
+            links = ntotal * inner.hnsw.nb_neighbors(0) * 4
+            return ntotal * storage.code_size + links + id_bytes
+        return ntotal * inner.code_size + id_bytes
+    if isinstance(index, faiss.IndexIVF):
+        # codes + ids in the inverted lists, direct map hashtable, centroids
+        return ntotal * (index.code_size + 8 + 16) + index.nlist * index.d * 4
+    return ntotal * index.d * 4
@@ -1,34 +1,299 @@
 from app.providers.base import VectorStore
-from typing import List, Dict, Any
+from app.core.concurrency import ReadWriteLock
+from app.services.vector_stores.wal import WriteAheadLog, OP_ADD, OP_DELETE
+from app.services.vector_stores.metadata_store import ColumnarMetadataStore
+from app.services.vector_stores.filters import normalize_filters
+from app.services.vector_stores.lexical_index import LexicalIndex
+from app.services.vector_stores.faiss_index import (
+    INDEX_TYPES,
+    METRICS,
+    STORAGE_TYPES,
+    TRAINED_INDEX_TYPES,
+    auto_nlist,
+    build_index,
+    faiss_metric,
+    index_nbytes,
+    index_storage_of,
+    index_type_of,
+    recall_at_k,
+    remove_ids,
+    search_parameters,
+    storage_for,
+    supports_ids,
+)
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import asyncio
 import faiss
 import numpy as np
+import hashlib
+import json
 import pickle
 import os
+import shutil
+import threading
+import time
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux only, None elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def vector_id_to_int64(vector_id: str) -> int:
+    """
+    Map a chunk id to a stable int64 FAISS label.
+
+    Ids of the form "{document_id}_{chunk}" with numeric parts pack into
+    (document_id << 32) | chunk; anything else falls back to a 63-bit hash.
+    """
+    document_part, _, chunk_part = vector_id.rpartition("_")
+    if document_part.isdigit() and chunk_part.isdigit():
+        document_num, chunk_num = int(document_part), int(chunk_part)
+        if document_num < 2 ** 31 and chunk_num < 2 ** 32:
+            return (document_num << 32) | chunk_num
+    digest = hashlib.blake2b(vector_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+
 
 class FAISSVectorStore(VectorStore):
-    """FAISS vector store with persistence"""
-    
-    def __init__(self, dimension: int, index_path: str = "faiss_index"):
+    """
+    FAISS vector store with persistence.
+
+    On disk the store is a snapshot (index file + memory-mapped columnar
+    metadata directory, named by generation) plus an append-only
+    write-ahead log of the adds and deletes made since.
+    A manifest names the current snapshot and the last WAL segment it
+    covers. Compaction folds the log into a new snapshot in the background.
+
+    Vectors are labelled with stable int64 ids (see vector_id_to_int64) via
+    an ID map, so deletes remove them from the index. Index types that
+    cannot remove vectors (HNSW) get tombstones instead: positions in the
+    ID map, since a re-added id gets a second position under the same
+    label. Search excludes them with an ID selector on the wrapped index;
+    once too large a fraction of the index is tombstoned it is rebuilt
+    from the live vectors.
+
+    The index type (Flat, IVFFlat, HNSWFlat, IVFPQ) is configurable. IVF
+    types need training, so vectors are staged in a flat index until
+    train_min_vectors exist, then the IVF index is trained on a sample and
+    filled from the staged vectors. Changing the type rebuilds the index
+    from its stored vectors (IVFPQ vectors are lossy when migrated away).
+
+    The metric is l2 (score is a distance, lower is better), ip or cosine
+    (score is a similarity, higher is better; vectors and queries are
+    L2-normalized). Vectors are stored as float32, float16 or int8 (FAISS
+    scalar quantizers); int8 is staged like IVF until SQ_TRAIN_MIN_VECTORS
+    exist. When a rebuild moves vectors into an approximate or compressed
+    index, recall@k of the new index is measured against an exact search
+    over the vectors it was built from and reported in get_stats.
+
+    Optionally a BM25 index over the chunk text (see LexicalIndex) is kept
+    in step with the vectors: _apply updates it, so WAL replay restores
+    it, and each snapshot writes it as one memory-mapped segment next to
+    the index and metadata. search_text queries it.
+    """
+
+    # Vectors sampled to train IVF centroids and PQ codebooks
+    TRAIN_SAMPLE_SIZE = 100_000
+    # Vectors moved per reconstruct/add step when rebuilding
+    REBUILD_BATCH_SIZE = 65_536
+    # Vectors needed to learn the int8 scalar quantizer's value ranges
+    SQ_TRAIN_MIN_VECTORS = 1_000
+    # Stored vectors used as queries by the recall check, and its k
+    RECALL_QUERIES = 100
+    RECALL_K = 10
+    # Recall below this is reported as a warning
+    RECALL_WARN_THRESHOLD = 0.9
+    # Filtered searches allowing at most this many vectors are answered exactly
+    EXACT_FILTER_MAX_VECTORS = 8_192
+
+    def __init__(
+        self,
+        dimension: int,
+        index_path: str = "faiss_index",
+        compact_threshold_bytes: int = 64 * 1024 * 1024,
+        wal_fsync: bool = True,
+        tombstone_rebuild_ratio: float = 0.2,
+        index_type: str = "Flat",
+        nprobe: int = 16,
+        ef_search: int = 64,
+        hnsw_m: int = 32,
+        train_min_vectors: int = 10_000,
+        metric: str = "l2",
+        storage: str = "float32",
+        lexical_index: bool = True
+    ):
         """
         Initialize FAISS vector store
-        
+
         Args:
             dimension: Dimension of embedding vectors
-            index_path: Path to save/load index
+            index_path: Path prefix to save/load index files
+            compact_threshold_bytes: WAL size that triggers background compaction
+            wal_fsync: Whether to fsync the WAL after every write
+            tombstone_rebuild_ratio: Fraction of tombstoned vectors that triggers an index rebuild
+            index_type: Flat, IVFFlat, HNSWFlat or IVFPQ
+            nprobe: IVF lists visited per query
+            ef_search: HNSW candidate list size per query
+            hnsw_m: HNSW graph degree
+            train_min_vectors: Vectors needed before an IVF index is trained
+            metric: l2, cosine or ip
+            storage: float32, float16 or int8 (ignored by IVFPQ)
+            lexical_index: Whether to keep a BM25 index over chunk text for search_text
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}. Expected one of {INDEX_TYPES}")
+        faiss_metric(metric)
+        storage_for(index_type, storage)
         self.dimension = dimension
         self.index_path = index_path
-        self.metadata_path = f"{index_path}_metadata.pkl"
-        
-        # Load or create index
-        if os.path.exists(f"{index_path}.index"):
-            self.index = faiss.read_index(f"{index_path}.index")
-            with open(self.metadata_path, 'rb') as f:
-                self.metadata_store = pickle.load(f)
+        self.manifest_path = f"{index_path}.manifest.json"
+        self.compact_threshold_bytes = compact_threshold_bytes
+        self.tombstone_rebuild_ratio = tombstone_rebuild_ratio
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.hnsw_m = hnsw_m
+        self.train_min_vectors = train_min_vectors
+        self.metric = metric
+        self.storage = storage
+        self.last_recall_check: Optional[Dict[str, Any]] = None
+        self.supports_lexical_search = lexical_index
+
+        # Searches share the store, adds and deletes get it exclusively
+        self.lock = ReadWriteLock()
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread = None
+        self._wal_fsync = wal_fsync
+        self._bulk_loads = 0
+
+        rss_before = _current_rss()
+        started = time.perf_counter()
+
+        # Load the latest snapshot, then replay the log written after it
+        self.generation, covered_segment = self._load_snapshot()
+        if self.index.d != dimension:
+            raise ValueError(
+                f"FAISS index at {index_path} has dimension {self.index.d}, "
+                f"expected {dimension}"
+            )
+
+        migrated = not supports_ids(self.index)
+        if migrated:
+            self._migrate_to_id_map()
+        self._tombstone_sel = None
+        self.tombstones = set()
+        if isinstance(self.index, faiss.IndexIDMap2):
+            # Vectors still in the index whose metadata is gone were deleted without removal,
+            # and a re-added id's earlier positions were replaced by its last one
+            id_map = faiss.vector_to_array(self.index.id_map)
+            live = np.isin(id_map, self.metadata_store.keys_array())
+            _, last_reversed = np.unique(id_map[::-1], return_index=True)
+            latest = np.zeros(len(id_map), dtype=bool)
+            latest[len(id_map) - 1 - last_reversed] = True
+            self.tombstones = set(np.flatnonzero(~(live & latest)).tolist())
+
+        self.lexical: Optional[LexicalIndex] = None
+        lexical_built = False
+        if lexical_index:
+            lexical_dir = self._snapshot_paths(self.generation)[2]
+            if os.path.isdir(lexical_dir) and not migrated:
+                self.lexical = LexicalIndex(lexical_dir)
+            else:
+                # Snapshot written without a lexical index (or relabelled): index the stored text
+                self.lexical = self._build_lexical_index()
+                lexical_built = len(self.lexical) > 0
+
+        self.wal = WriteAheadLog(index_path, fsync=wal_fsync)
+        self.wal.segment = max(self.wal.segment, covered_segment + 1)
+        self.replayed_records = 0
+        for op, header, vectors in self.wal.replay(after_segment=covered_segment):
+            self._apply(op, header, vectors)
+            self.replayed_records += 1
+        rebuilt = self._ensure_index_type()
+        if migrated or rebuilt or lexical_built:
+            # Persist the relabelled/rebuilt index so the work runs only once
+            self.compact()
+
+        self.load_seconds = time.perf_counter() - started
+        rss_after = _current_rss()
+        self.load_rss_bytes = (
+            rss_after - rss_before
+            if rss_before is not None and rss_after is not None
+            else None
+        )
+
+    def _snapshot_paths(self, generation: int):
+        return (
+            f"{self.index_path}.{generation}.index",
+            f"{self.index_path}.{generation}.meta",
+            f"{self.index_path}.{generation}.lex"
+        )
+
+    def _load_snapshot(self):
+        """Load index and metadata of the current snapshot, returns (generation, covered WAL segment)"""
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            generation = manifest["generation"]
+            index_file, metadata_dir, _ = self._snapshot_paths(generation)
+            self.index = faiss.read_index(index_file)
+            # cosine and ip share the FAISS metric, so the manifest records which it is
+            self.index_metric = manifest.get("metric") or self._metric_of(self.index)
+            if os.path.isdir(metadata_dir):
+                self.metadata_store = ColumnarMetadataStore(metadata_dir)
+            else:
+                # Snapshot written before the columnar layout
+                with open(f"{self.index_path}.{generation}_metadata.pkl", 'rb') as f:
+                    self.metadata_store = ColumnarMetadataStore.from_dict(pickle.load(f))
+            return generation, manifest["wal_segment"]
+
+        if os.path.exists(f"{self.index_path}.index"):
+            # Pre-WAL layout: a single index file and pickled metadata
+            self.index = faiss.read_index(f"{self.index_path}.index")
+            self.index_metric = self._metric_of(self.index)
+            with open(f"{self.index_path}_metadata.pkl", 'rb') as f:
+                self.metadata_store = ColumnarMetadataStore.from_dict(pickle.load(f))
         else:
-            self.index = faiss.IndexFlatL2(dimension)
-            self.metadata_store = {}
-    
+            self.index = build_index("Flat", self.dimension)
+            self.index_metric = "l2"
+            self.metadata_store = ColumnarMetadataStore()
+        return 0, 0
+
+    @staticmethod
+    def _metric_of(index: faiss.Index) -> str:
+        return "l2" if index.metric_type == faiss.METRIC_L2 else "ip"
+
+    def _migrate_to_id_map(self):
+        """Relabel a positional index (metadata keyed by row number) with stable ids"""
+        positions = self.metadata_store.keys_array()
+        vectors = self.index.reconstruct_batch(positions) if len(positions) else None
+        entries = {}
+        for position in positions:
+            meta = self.metadata_store[position]
+            entries[vector_id_to_int64(meta["id"])] = meta
+        labels = np.fromiter(entries.keys(), dtype=np.int64, count=len(entries))
+
+        self.index = build_index("Flat", self.dimension, metric=self.index_metric)
+        if vectors is not None:
+            self.index.add_with_ids(vectors, labels)
+        self.metadata_store = ColumnarMetadataStore.from_dict(entries)
+        print(f"Migrated FAISS index at {self.index_path} to stable ids ({len(labels)} vectors)")
+
+    def _build_lexical_index(self) -> LexicalIndex:
+        """Index the text of every stored chunk"""
+        lexical = LexicalIndex()
+        keys = self.metadata_store.keys_array()
+        for start in range(0, len(keys), self.REBUILD_BATCH_SIZE):
+            batch = keys[start:start + self.REBUILD_BATCH_SIZE]
+            lexical.add(batch, [self.metadata_store[key].get("text", "") for key in batch])
+        return lexical
+
     async def add_vectors(
         self,
         vectors: List[List[float]],
@@ -36,61 +301,608 @@ class FAISSVectorStore(VectorStore):
         ids: List[str]
     ) -> None:
         """Add vectors with metadata to FAISS"""
+        await asyncio.to_thread(self._add_vectors, vectors, metadata, ids)
+
+    def _add_vectors(
+        self,
+        vectors: List[List[float]],
+        metadata: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> None:
+        """Blocking body of add_vectors"""
         # Convert to numpy array
         vectors_np = np.array(vectors).astype('float32')
-        
-        # Get starting index
-        start_idx = self.index.ntotal
-        
-        # Add to FAISS
-        self.index.add(vectors_np)
-        
-        # Store metadata
-        for i, (id_, meta) in enumerate(zip(ids, metadata)):
-            self.metadata_store[start_idx + i] = {
-                "id": id_,
-                **meta
-            }
-        
-        # Save to disk
-        self._save()
-    
+        header = {
+            "n": vectors_np.shape[0],
+            "d": vectors_np.shape[1],
+            "ids": list(ids),
+            "metadata": list(metadata)
+        }
+        self._write(OP_ADD, header, vectors_np)
+
+    def _write(self, op: int, header: Dict[str, Any], vectors: Optional[np.ndarray]) -> None:
+        """
+        Log an operation and apply it under the write lock. Blocking (WAL
+        fsync, and applying may rebuild or train the index), so the async
+        methods run it on a worker thread.
+        """
+        with self.lock.write():
+            self.wal.append(op, header, vectors)
+            self._apply(op, header, vectors)
+            self.version += 1
+        self._maybe_compact()
+
     async def search(
         self,
         query_vector: List[float],
-        top_k: int = 5
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """Search for similar vectors"""
-        # Convert to numpy
-        query_np = np.array([query_vector]).astype('float32')
-        
-        # Search
-        distances, indices = self.index.search(query_np, top_k)
-        
-        # Build results
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            if idx in self.metadata_store:
-                result = self.metadata_store[idx].copy()
-                result["score"] = float(dist)
+        results = await self.search_batch(
+            np.array([query_vector], dtype='float32'), top_k, filters
+        )
+        return results[0]
+
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search for many queries with a single FAISS call
+
+        Filters are resolved to the allowed ids through the metadata
+        postings. A small allowed set is searched exactly over its own
+        vectors; a larger one is passed to FAISS as an ID selector, with an
+        exact fallback for queries the index returns fewer than top_k hits
+        for (HNSW and IVF can run out of candidates under a selective filter).
+
+        Args:
+            query_vectors: 2-D float32 array, one query per row
+            top_k: Number of results per query
+            filters: Optional metadata filters, e.g. {"document_id": ["3", "7"]}
+        """
+        # FAISS releases the GIL while searching; keep the event loop free meanwhile
+        return await asyncio.to_thread(self._search_batch, query_vectors, top_k, filters)
+
+    def _search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[List[Dict[str, Any]]]:
+        """Blocking body of search_batch (also run on worker threads by the sharded store)"""
+        query_np = np.ascontiguousarray(query_vectors, dtype='float32')
+        if query_np.ndim != 2 or query_np.shape[1] != self.dimension:
+            raise ValueError(
+                f"Expected query array of shape (n, {self.dimension}), got {query_np.shape}"
+            )
+        filters = normalize_filters(filters)
+
+        with self.lock.read():
+            if self.index_metric == "cosine":
+                query_np = query_np.copy()
+                faiss.normalize_L2(query_np)
+
+            if filters is not None:
+                # Only live vectors have metadata, so this also skips tombstones
+                allowed = self.metadata_store.keys_matching(filters)
+                if len(allowed) <= self.EXACT_FILTER_MAX_VECTORS:
+                    distances, indices = self._search_subset(query_np, top_k, allowed)
+                else:
+                    distances, indices = self._search_index(query_np, top_k, allowed)
+                    short = (indices >= 0).sum(axis=1) < min(top_k, len(allowed))
+                    if short.any():
+                        distances[short], indices[short] = self._search_subset(
+                            query_np[short], top_k, allowed
+                        )
+            else:
+                distances, indices = self._search_index(query_np, top_k)
+
+            # Build results
+            batch_results = []
+            for row_distances, row_indices in zip(distances, indices):
+                results = []
+                for dist, idx in zip(row_distances, row_indices):
+                    if idx in self.metadata_store:
+                        result = self.metadata_store[idx].copy()
+                        result["score"] = float(dist)
+                        results.append(result)
+                batch_results.append(results)
+
+        return batch_results
+
+    def _search_index(self, queries: np.ndarray, top_k: int, allowed: Optional[np.ndarray] = None):
+        """
+        Approximate top_k over the live vectors, or only those with allowed labels
+
+        Tombstones are positions in the ID map, so while there are any the
+        wrapped index is searched with a selector on positions, which are
+        then mapped to labels.
+        """
+        ef_search = self.ef_search if allowed is None else max(self.ef_search, top_k)
+        if not self.tombstones:
+            params = search_parameters(
+                self.index,
+                selector=faiss.IDSelectorBatch(allowed) if allowed is not None else None,
+                nprobe=self.nprobe,
+                ef_search=ef_search
+            )
+            return self.index.search(queries, top_k, params=params)
+
+        id_map = self._id_map()
+        if allowed is None:
+            selector = self._tombstone_selector()
+        else:
+            positions = np.flatnonzero(np.isin(id_map, allowed))
+            tombstones = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+            selector = faiss.IDSelectorBatch(positions[~np.isin(positions, tombstones)])
+        params = search_parameters(self.index, selector=selector, nprobe=self.nprobe, ef_search=ef_search)
+        distances, positions = faiss.downcast_index(self.index.index).search(queries, top_k, params=params)
+        return distances, np.where(positions >= 0, id_map[np.maximum(positions, 0)], -1)
+
+    def _id_map(self) -> np.ndarray:
+        """Labels of the ID map by position (a view, valid until the next add)"""
+        size = self.index.id_map.size()
+        if size == 0:
+            return np.zeros(0, dtype=np.int64)
+        return faiss.rev_swig_ptr(self.index.id_map.data(), size)
+
+    def _search_subset(self, queries: np.ndarray, top_k: int, labels: np.ndarray):
+        """Exact top_k over the vectors of the given labels, read back from the index in batches"""
+        k = max(1, min(top_k, len(labels)))
+        heap = faiss.ResultHeap(len(queries), k, keep_max=self.index_metric != "l2")
+        metric = faiss_metric(self.index_metric)
+        for start in range(0, len(labels), self.EXACT_FILTER_MAX_VECTORS):
+            batch = labels[start:start + self.EXACT_FILTER_MAX_VECTORS]
+            distances, positions = faiss.knn(queries, self.index.reconstruct_batch(batch), k, metric=metric)
+            heap.add_result(distances, np.where(positions >= 0, batch[positions], -1))
+        heap.finalize()
+        distances = np.full((len(queries), top_k), np.nan, dtype=np.float32)
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        if len(labels):
+            distances[:, :k] = heap.D
+            indices[:, :k] = heap.I
+        return distances, indices
+
+    async def search_text(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25 search over chunk text; filters are resolved as in search_batch"""
+        return await asyncio.to_thread(self._search_text, query, top_k, filters)
+
+    def _search_text(
+        self,
+        query: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Blocking body of search_text"""
+        if self.lexical is None:
+            raise NotImplementedError(f"Lexical index is disabled for FAISS store at {self.index_path}")
+        filters = normalize_filters(filters)
+        with self.lock.read():
+            allowed = self.metadata_store.keys_matching(filters) if filters is not None else None
+            results = []
+            for label, score in self.lexical.search(query, top_k, allowed):
+                result = self.metadata_store[label].copy()
+                result["score"] = score
                 results.append(result)
-        
         return results
-    
-    async def delete_by_document(self, document_id: str) -> None:
-        """Delete all vectors for a document (requires rebuild for FAISS)"""
-        # FAISS doesn't support deletion, would need to rebuild index
-        # For now, just remove from metadata
-        indices_to_remove = [
-            idx for idx, meta in self.metadata_store.items()
-            if meta.get("document_id") == document_id
-        ]
-        for idx in indices_to_remove:
-            del self.metadata_store[idx]
-        self._save()
-    
-    def _save(self):
-        """Save index and metadata to disk"""
-        faiss.write_index(self.index, f"{self.index_path}.index")
-        with open(self.metadata_path, 'wb') as f:
-            pickle.dump(self.metadata_store, f)
+
+    async def delete_by_document(self, document_id: str, keep_ids: Optional[List[str]] = None) -> None:
+        """Delete all vectors for a document, except keep_ids (requires rebuild for FAISS)"""
+        header = {"document_id": document_id}
+        if keep_ids is not None:
+            header["keep_ids"] = list(keep_ids)
+        await asyncio.to_thread(self._write, OP_DELETE, header, None)
+
+    async def delete_vectors(self, document_id: str, ids: List[str]) -> None:
+        """Delete some vectors of a document"""
+        header = {"document_id": document_id, "ids": list(ids)}
+        await asyncio.to_thread(self._write, OP_DELETE, header, None)
+
+    async def get_vectors(self, document_id: str, ids: List[str]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Stored vectors and metadata of some vectors of a document"""
+        return await asyncio.to_thread(self._get_vectors, document_id, ids)
+
+    def _get_vectors(self, document_id: str, ids: List[str]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Blocking body of get_vectors"""
+        with self.lock.read():
+            labels = np.array([
+                label for label in map(vector_id_to_int64, ids)
+                if label in self.metadata_store
+                and self.metadata_store[label].get("document_id") == document_id
+            ], dtype=np.int64)
+            if len(labels) == 0:
+                return np.zeros((0, self.dimension), dtype="float32"), []
+            vectors = self.index.reconstruct_batch(labels)
+            metadata = [dict(self.metadata_store[label]) for label in labels]
+        return vectors, metadata
+
+    def _apply(self, op: int, header: Dict[str, Any], vectors: Optional[np.ndarray]) -> None:
+        """Apply one logged operation to the in-memory index and metadata"""
+        if op == OP_ADD:
+            labels = np.array(
+                [vector_id_to_int64(id_) for id_ in header["ids"]], dtype=np.int64
+            )
+
+            # Re-adding an id replaces the previous vector (tombstoned where it can't be removed)
+            existing = [label for label in labels if label in self.metadata_store]
+            if existing:
+                existing = np.array(existing, dtype=np.int64)
+                self._remove_labels(existing)
+                if self.lexical is not None:
+                    self.lexical.delete(existing)
+
+            if self.index_metric == "cosine":
+                # Normalize a copy; the logged vectors stay as given
+                vectors = vectors.copy()
+                faiss.normalize_L2(vectors)
+
+            # Add to FAISS
+            self.index.add_with_ids(vectors, labels)
+
+            # Store metadata
+            for label, id_, meta in zip(labels, header["ids"], header["metadata"]):
+                self.metadata_store[label] = {
+                    "id": id_,
+                    **meta
+                }
+            if self.lexical is not None:
+                self.lexical.add(labels, [meta.get("text", "") for meta in header["metadata"]])
+            self._ensure_index_type()
+        elif op == OP_DELETE:
+            if "ids" in header:
+                labels = np.array([
+                    label for label in map(vector_id_to_int64, header["ids"])
+                    if label in self.metadata_store
+                ], dtype=np.int64)
+            else:
+                labels = self.metadata_store.keys_for_document(header["document_id"])
+                if "keep_ids" in header:
+                    keep = np.array([vector_id_to_int64(id_) for id_ in header["keep_ids"]], dtype=np.int64)
+                    labels = labels[~np.isin(labels, keep)]
+            self._remove_labels(labels)
+            for label in labels:
+                del self.metadata_store[label]
+            if self.lexical is not None:
+                self.lexical.delete(labels)
+        else:
+            raise ValueError(f"Unknown WAL operation: {op}")
+
+        if self.tombstones and len(self.tombstones) > self.tombstone_rebuild_ratio * self.index.ntotal:
+            self._rebuild_index()
+
+    def _remove_labels(self, labels: np.ndarray) -> None:
+        """Remove vectors from the index, tombstoning their positions where removal is unsupported"""
+        if len(labels) == 0:
+            return
+        try:
+            remove_ids(self.index, labels)
+        except RuntimeError:
+            self.tombstones.update(np.flatnonzero(np.isin(self._id_map(), labels)).tolist())
+            self._tombstone_sel = None
+
+    def _tombstone_selector(self):
+        """Selector on ID map positions accepting all but tombstoned ones, cached until tombstones change"""
+        if self._tombstone_sel is None:
+            batch = faiss.IDSelectorBatch(
+                np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+            )
+            self._tombstone_sel = (batch, faiss.IDSelectorNot(batch))
+        return self._tombstone_sel[1]
+
+    def _ensure_index_type(self) -> bool:
+        """
+        Move the index to the configured type, storage and metric once that is possible.
+
+        Returns:
+            True if the index was rebuilt
+        """
+        current_type = index_type_of(self.index)
+        current_storage = index_storage_of(self.index)
+        target_type = self.index_type
+        target_storage = storage_for(target_type, self.storage)
+        num_vectors = len(self.metadata_store)
+        if target_type in TRAINED_INDEX_TYPES:
+            min_vectors = self.train_min_vectors
+        elif target_storage == "int8":
+            min_vectors = self.SQ_TRAIN_MIN_VECTORS
+        else:
+            min_vectors = 0
+        in_target_form = (current_type, current_storage) == (target_type, target_storage)
+        if not in_target_form and num_vectors < min_vectors:
+            # Too few vectors to train; keep them in a flat float32 index meanwhile
+            target_type, target_storage = "Flat", "float32"
+        elif (
+            in_target_form and target_type in TRAINED_INDEX_TYPES
+            and auto_nlist(num_vectors) >= 4 * self.index.nlist
+        ):
+            # The corpus outgrew the lists it was trained with
+            self._rebuild_index(target_type, target_storage, self.metric)
+            return True
+        if (current_type, current_storage, self.index_metric) == (target_type, target_storage, self.metric):
+            return False
+        self._rebuild_index(target_type, target_storage, self.metric, check_recall=True)
+        return True
+
+    def _rebuild_index(
+        self,
+        index_type: Optional[str] = None,
+        storage: Optional[str] = None,
+        metric: Optional[str] = None,
+        check_recall: bool = False
+    ) -> None:
+        """
+        Rebuild the index from live vectors, dropping tombstoned ones
+
+        Args:
+            index_type: New index type (default: the current one)
+            storage: New vector storage (default: the current one)
+            metric: New metric (default: the current one)
+            check_recall: Measure recall@k of the new index against an
+                exact search over the vectors it is built from
+        """
+        index_type = index_type or index_type_of(self.index)
+        storage = storage or index_storage_of(self.index)
+        if storage == "pq":
+            storage = self.storage
+        metric = metric or self.index_metric
+        # Vectors read back from an l2/ip index have to be normalized for cosine
+        normalize = metric == "cosine" and self.index_metric != "cosine"
+        labels = self.metadata_store.keys_array()
+        index = build_index(index_type, self.dimension, len(labels), self.hnsw_m, metric, storage)
+
+        def read_vectors(batch: np.ndarray) -> np.ndarray:
+            vectors = self.index.reconstruct_batch(batch)
+            if normalize:
+                faiss.normalize_L2(vectors)
+            return vectors
+
+        if not index.is_trained:
+            sample = labels
+            if len(labels) > self.TRAIN_SAMPLE_SIZE:
+                sample = np.random.default_rng(0).choice(labels, self.TRAIN_SAMPLE_SIZE, replace=False)
+            index.train(read_vectors(sample))
+
+        if check_recall and index_type == "Flat" and storage_for(index_type, storage) == "float32":
+            # Exact index: nothing to measure, and an older result no longer applies
+            self.last_recall_check = None
+            check_recall = False
+        check_recall = check_recall and len(labels) > 0
+        if check_recall:
+            query_labels = labels
+            if len(labels) > self.RECALL_QUERIES:
+                query_labels = np.random.default_rng(0).choice(labels, self.RECALL_QUERIES, replace=False)
+            queries = read_vectors(query_labels)
+            k = min(self.RECALL_K, len(labels))
+            # Exact top-k merged over the rebuild batches, so no extra copy of the vectors is kept
+            exact = faiss.ResultHeap(len(queries), k, keep_max=metric != "l2")
+            baseline_storage = index_storage_of(self.index)
+
+        for start in range(0, len(labels), self.REBUILD_BATCH_SIZE):
+            batch = labels[start:start + self.REBUILD_BATCH_SIZE]
+            vectors = read_vectors(batch)
+            index.add_with_ids(vectors, batch)
+            if check_recall:
+                distances, positions = faiss.knn(queries, vectors, k, metric=faiss_metric(metric))
+                exact.add_result(distances, np.where(positions >= 0, batch[positions], -1))
+
+        self.index = index
+        self.index_metric = metric
+        self.tombstones = set()
+        self._tombstone_sel = None
+
+        if check_recall:
+            exact.finalize()
+            params = search_parameters(index, nprobe=self.nprobe, ef_search=self.ef_search)
+            _, found = index.search(queries, k, params=params)
+            recall = recall_at_k(found, exact.I)
+            self.last_recall_check = {
+                "index_type": index_type,
+                "storage": storage_for(index_type, storage),
+                "metric": metric,
+                "baseline_storage": baseline_storage,
+                "num_vectors": len(labels),
+                "queries": len(queries),
+                "k": k,
+                "recall": round(recall, 4),
+            }
+            message = (
+                f"FAISS index at {self.index_path} rebuilt as {index_type}/"
+                f"{storage_for(index_type, storage)}/{metric}: recall@{k} {recall:.3f} "
+                f"against exact {baseline_storage} search"
+            )
+            if recall < self.RECALL_WARN_THRESHOLD:
+                message = f"Warning: {message}"
+            print(message)
+
+    def configure(
+        self,
+        index_type: Optional[str] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        metric: Optional[str] = None,
+        storage: Optional[str] = None
+    ) -> None:
+        """
+        Apply index settings, migrating the index if its type, metric or storage changes
+
+        Args:
+            index_type: Flat, IVFFlat, HNSWFlat or IVFPQ
+            nprobe: IVF lists visited per query
+            ef_search: HNSW candidate list size per query
+            metric: l2, cosine or ip
+            storage: float32, float16 or int8
+        """
+        if index_type is not None and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type: {index_type}. Expected one of {INDEX_TYPES}")
+        if metric is not None and metric not in METRICS:
+            raise ValueError(f"Unknown FAISS metric: {metric}. Expected one of {METRICS}")
+        if storage is not None and storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown FAISS storage: {storage}. Expected one of {STORAGE_TYPES}")
+        if (nprobe and nprobe != self.nprobe) or (ef_search and ef_search != self.ef_search):
+            self.version += 1
+        if nprobe:
+            self.nprobe = nprobe
+        if ef_search:
+            self.ef_search = ef_search
+        changed = (
+            (index_type is not None and index_type != self.index_type)
+            or (metric is not None and metric != self.metric)
+            or (storage is not None and storage != self.storage)
+        )
+        if not changed:
+            return
+
+        with self.lock.write():
+            self.index_type = index_type or self.index_type
+            self.metric = metric or self.metric
+            self.storage = storage or self.storage
+            rebuilt = self._ensure_index_type()
+            self.version += 1
+        if rebuilt:
+            self.compact()
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        """
+        Skip the per-record WAL fsync and background compactions while the
+        block runs; on exit sync the WAL once and fold it into one snapshot.
+        """
+        await asyncio.to_thread(self._begin_bulk_load)
+        try:
+            yield
+        finally:
+            if await asyncio.to_thread(self._end_bulk_load) and self.wal.size_bytes() > 0:
+                await asyncio.to_thread(self.compact)
+
+    def _begin_bulk_load(self) -> None:
+        with self.lock.write():
+            self._bulk_loads += 1
+            self.wal.fsync = False
+
+    def _end_bulk_load(self) -> bool:
+        """Leave a bulk load; True when it was the last one"""
+        with self.lock.write():
+            self._bulk_loads -= 1
+            finished = self._bulk_loads == 0
+            if finished:
+                self.wal.fsync = self._wal_fsync
+                self.wal.sync()
+        return finished
+
+    def _maybe_compact(self) -> None:
+        """Start a background compaction once the WAL has grown past the threshold"""
+        if self._bulk_loads or self.wal.size_bytes() < self.compact_threshold_bytes:
+            return
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+        self._compaction_thread.start()
+
+    def compact(self) -> None:
+        """
+        Fold the WAL into a new snapshot.
+
+        The index and metadata are serialized in memory under the read lock
+        (searches keep running, writers wait), the WAL rotates to a fresh
+        segment, and the slow file writes happen after the lock is released.
+        """
+        with self._compaction_lock:
+            with self.lock.read():
+                index_bytes = faiss.serialize_index(self.index)
+                metadata_snapshot = self.metadata_store.freeze()
+                lexical_snapshot = self.lexical.freeze() if self.lexical is not None else None
+                covered_segment = self.wal.rotate()
+                index_metric = self.index_metric
+                previous_generation = self.generation
+                generation = previous_generation + 1
+
+            index_file, metadata_dir, lexical_dir = self._snapshot_paths(generation)
+            rebased = False
+            try:
+                with open(index_file, 'wb') as f:
+                    f.write(index_bytes.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                metadata_snapshot.write(metadata_dir)
+                if lexical_snapshot is not None:
+                    lexical_snapshot.write(lexical_dir)
+
+                # Switching the manifest is the commit point of the snapshot
+                manifest_tmp = f"{self.manifest_path}.tmp"
+                with open(manifest_tmp, 'w') as f:
+                    json.dump(
+                        {"generation": generation, "wal_segment": covered_segment, "metric": index_metric}, f
+                    )
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(manifest_tmp, self.manifest_path)
+
+                # Serve metadata from the new mapped snapshot instead of memory
+                with self.lock.write():
+                    self.metadata_store = self.metadata_store.rebase(metadata_dir, metadata_snapshot)
+                    if lexical_snapshot is not None:
+                        self.lexical = self.lexical.rebase(lexical_dir, lexical_snapshot)
+                    self.generation = generation
+                rebased = True
+            finally:
+                if lexical_snapshot is not None and not rebased:
+                    # The frozen lexical index stays in use; let its memory segments merge again
+                    with self.lock.write():
+                        self.lexical.thaw()
+
+            self.wal.remove_through(covered_segment)
+            if previous_generation:
+                stale = (
+                    *self._snapshot_paths(previous_generation),
+                    f"{self.index_path}.{previous_generation}_metadata.pkl"
+                )
+            else:
+                stale = (f"{self.index_path}.index", f"{self.index_path}_metadata.pkl")
+            for path in stale:
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                elif os.path.exists(path):
+                    os.remove(path)
+
+    def close(self) -> None:
+        """Wait for a running compaction and close the WAL"""
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        with self.lock.write():
+            self.wal.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report size, load time and approximate memory use of the store"""
+        with self.lock.read():
+            return {
+                "store_type": "faiss",
+                "index_path": self.index_path,
+                "dimension": self.dimension,
+                "num_vectors": self.index.ntotal,
+                "num_metadata_entries": len(self.metadata_store),
+                "num_tombstones": len(self.tombstones),
+                "metadata_rows_in_memory": self.metadata_store.memory_rows(),
+                "load_seconds": round(self.load_seconds, 4),
+                "load_rss_bytes": self.load_rss_bytes,
+                "index_type": index_type_of(self.index),
+                "configured_index_type": self.index_type,
+                "metric": self.index_metric,
+                "configured_metric": self.metric,
+                "storage": index_storage_of(self.index),
+                "configured_storage": self.storage,
+                "last_recall_check": self.last_recall_check,
+                "index_bytes": index_nbytes(self.index),
+                "snapshot_generation": self.generation,
+                "wal_bytes": self.wal.size_bytes(),
+                "replayed_wal_records": self.replayed_records,
+                "lexical_index": self.lexical.get_stats() if self.lexical is not None else None,
+            }
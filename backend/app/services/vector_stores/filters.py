@@ -0,0 +1,44 @@
+from typing import Any, Dict, List, Optional
+
+# Metadata fields that can't be filtered on: unique per chunk or free text
+UNFILTERABLE_FIELDS = ("id", "text")
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, List[Any]]]:
+    """
+    Validate search filters and turn single values into one-element lists.
+
+    A filter maps a metadata field to a value or a list of values. Values
+    of one field are alternatives (OR); different fields must all match
+    (AND). An empty list matches nothing.
+
+    Args:
+        filters: e.g. {"document_id": ["3", "7"], "document_name": "report.pdf"}
+
+    Returns:
+        {field: [values]}, or None when there is nothing to filter on
+
+    Raises:
+        ValueError: If a field can't be filtered on or a value isn't a scalar
+    """
+    if not filters:
+        return None
+    normalized = {}
+    for field, value in filters.items():
+        if field in UNFILTERABLE_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}'")
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        for item in values:
+            if isinstance(item, (dict, list, tuple, set)):
+                raise ValueError(f"Filter values of '{field}' must be scalars")
+        normalized[field] = values
+    return normalized
+
+
+def coerce_filter_value(field: str, value: Any) -> Any:
+    """Convert a filter value to the type the field is stored as"""
+    if field in ("document_id", "document_name"):
+        return str(value)
+    if field == "chunk_index":
+        return int(value)
+    return value
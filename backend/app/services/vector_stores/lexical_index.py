@@ -0,0 +1,499 @@
+from app.services.vector_stores.metadata_store import _encode_strings
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Tuple
+import heapq
+import json
+import math
+import os
+import re
+import numpy as np
+
+# Words, with identifiers joined by - . / : kept whole (part numbers, clause ids like 4.2.1)
+_TOKEN_RE = re.compile(r"\w+(?:[-./:]\w+)*")
+_PART_SPLIT_RE = re.compile(r"[-./:_]+")
+
+_ARRAYS = (
+    "keys", "doc_len", "post_start", "docs", "tfs",
+    "blk_start", "blk_last_doc", "blk_max_tf", "blk_min_len",
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens for the lexical index.
+
+    Joined identifiers are indexed whole and also as their parts, so
+    "AB-1234" matches queries for "ab-1234", "ab" and "1234".
+    """
+    tokens = _TOKEN_RE.findall(text.lower())
+    for token in tokens[:]:
+        if not token.isalnum():
+            tokens.extend(part for part in _PART_SPLIT_RE.split(token) if part)
+    return tokens
+
+
+class _StringColumn(Sequence):
+    """Sorted strings stored as offsets + utf-8 blob, decoded on access (bisect-able)"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])]).decode("utf-8", "surrogatepass")
+
+    def to_list(self) -> List[str]:
+        data = bytes(self.blob)
+        offsets = self.offsets.tolist()
+        return [data[offsets[i]:offsets[i + 1]].decode("utf-8", "surrogatepass") for i in range(len(self))]
+
+
+class _Segment:
+    """
+    Immutable BM25 postings of a set of chunks, in memory or memory-mapped.
+
+    Terms are sorted; each term's postings are local doc numbers (uint32,
+    ascending) and term frequencies (uint8, capped at 255), 5 bytes per
+    posting. Postings are cut into blocks of BLOCK_SIZE with the block's
+    last doc, max tf and min doc length, which bound the BM25 score any
+    posting in the block can contribute. Deletes only clear the alive mask.
+    """
+
+    BLOCK_SIZE = 128
+
+    def __init__(self, terms: Sequence, arrays: Dict[str, np.ndarray], directory: Optional[str] = None):
+        self.terms = terms
+        self.directory = directory
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+        self.alive = np.ones(len(self.keys), dtype=bool)
+        self.num_alive = len(self.keys)
+        self.alive_len = int(self.doc_len.sum(dtype=np.int64))
+        self._key_order = None
+
+    @classmethod
+    def load(cls, directory: str) -> "_Segment":
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in _ARRAYS
+        }
+        offsets = np.load(os.path.join(directory, "terms_offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(directory, "terms.bin")
+        blob = (
+            np.memmap(blob_path, dtype=np.uint8, mode="r")
+            if os.path.getsize(blob_path) else np.zeros(0, dtype=np.uint8)
+        )
+        return cls(_StringColumn(offsets, blob), arrays, directory)
+
+    @classmethod
+    def build(cls, keys: np.ndarray, token_lists: List[List[str]]) -> "_Segment":
+        """Index tokenized chunks; keys are the chunks' vector ids"""
+        vocab: Dict[str, int] = {}
+        flat = [vocab.setdefault(term, len(vocab)) for tokens in token_lists for term in tokens]
+        terms = sorted(vocab)
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[[vocab[term] for term in terms]] = np.arange(len(terms))
+        doc_len = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+
+        # One posting per distinct (term, doc) pair, counted, already in term then doc order
+        num_docs = max(len(token_lists), 1)
+        pairs = rank[np.array(flat, dtype=np.int64)] * num_docs + np.repeat(np.arange(len(token_lists)), doc_len)
+        pairs, tfs = np.unique(pairs, return_counts=True)
+        return cls.from_postings(
+            terms,
+            pairs // num_docs,
+            pairs % num_docs,
+            tfs,
+            np.asarray(keys, dtype=np.int64),
+            doc_len.astype(np.uint32)
+        )
+
+    @classmethod
+    def from_postings(
+        cls,
+        terms: List[str],
+        term_ids: np.ndarray,
+        docs: np.ndarray,
+        tfs: np.ndarray,
+        keys: np.ndarray,
+        doc_len: np.ndarray
+    ) -> "_Segment":
+        """Build the term-sorted layout and block bounds; docs must ascend within each term"""
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        docs = docs[order].astype(np.uint32)
+        tfs = np.minimum(tfs[order], 255).astype(np.uint8)
+        num_postings = len(docs)
+
+        post_start = np.searchsorted(term_ids, np.arange(len(terms) + 1)).astype(np.int64)
+        counts = np.diff(post_start)
+        blocks_per_term = (counts + cls.BLOCK_SIZE - 1) // cls.BLOCK_SIZE
+        blk_start = np.concatenate([[0], np.cumsum(blocks_per_term)]).astype(np.int64)
+        if num_postings:
+            position = np.arange(num_postings) - np.repeat(post_start[:-1], counts)
+            block_of = np.repeat(blk_start[:-1], counts) + position // cls.BLOCK_SIZE
+            block_first = np.flatnonzero(np.diff(block_of, prepend=-1))
+            block_end = np.append(block_first[1:], num_postings)
+            blk_last_doc = docs[block_end - 1]
+            blk_max_tf = np.maximum.reduceat(tfs, block_first)
+            blk_min_len = np.minimum.reduceat(doc_len[docs], block_first).astype(np.uint32)
+        else:
+            blk_last_doc = np.zeros(0, dtype=np.uint32)
+            blk_max_tf = np.zeros(0, dtype=np.uint8)
+            blk_min_len = np.zeros(0, dtype=np.uint32)
+
+        return cls(terms, {
+            "keys": keys,
+            "doc_len": doc_len.astype(np.uint32),
+            "post_start": post_start,
+            "docs": docs,
+            "tfs": tfs,
+            "blk_start": blk_start,
+            "blk_last_doc": blk_last_doc,
+            "blk_max_tf": blk_max_tf,
+            "blk_min_len": blk_min_len,
+        })
+
+    @classmethod
+    def merge(cls, parts: List[Tuple["_Segment", np.ndarray]]) -> "_Segment":
+        """
+        One segment holding the docs selected by each (segment, mask), in order
+
+        Docs are renumbered by their position in the output, so every
+        segment's postings stay sorted within a term and a stable sort by
+        term id merges them.
+        """
+        term_lists = [
+            seg.terms.to_list() if isinstance(seg.terms, _StringColumn) else list(seg.terms)
+            for seg, _ in parts
+        ]
+        all_terms = np.unique(np.array(
+            [term for terms in term_lists for term in terms], dtype=object
+        )) if any(term_lists) else np.array([], dtype=object)
+
+        term_ids, docs, tfs, keys, doc_len = [], [], [], [], []
+        offset = 0
+        for (seg, mask), terms in zip(parts, term_lists):
+            mask = np.asarray(mask, dtype=bool)
+            new_doc = np.cumsum(mask, dtype=np.int64) - 1 + offset
+            term_map = np.searchsorted(all_terms, np.array(terms, dtype=object)).astype(np.int64)
+            posting_terms = np.repeat(np.arange(len(terms)), np.diff(seg.post_start))
+            seg_docs = np.asarray(seg.docs, dtype=np.int64)
+            keep = mask[seg_docs]
+            term_ids.append(term_map[posting_terms[keep]])
+            docs.append(new_doc[seg_docs[keep]])
+            tfs.append(np.asarray(seg.tfs)[keep])
+            keys.append(np.asarray(seg.keys)[mask])
+            doc_len.append(np.asarray(seg.doc_len)[mask])
+            offset += int(mask.sum())
+
+        def join(arrays, dtype):
+            return np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+
+        term_ids = join(term_ids, np.int64)
+        # Drop terms whose postings all belonged to deleted docs
+        used = np.unique(term_ids)
+        return cls.from_postings(
+            all_terms[used].tolist(),
+            np.searchsorted(used, term_ids),
+            join(docs, np.int64),
+            join(tfs, np.int64),
+            join(keys, np.int64),
+            join(doc_len, np.uint32)
+        )
+
+    def write(self, directory: str) -> None:
+        """Write the segment (alive docs are not filtered; merge first)"""
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(getattr(self, name)))
+        offsets, blob = _encode_strings(list(self.terms))
+        np.save(os.path.join(directory, "terms_offsets.npy"), offsets)
+        blob.tofile(os.path.join(directory, "terms.bin"))
+
+    def term_id(self, term: str) -> int:
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def doc_freq(self, term_id: int) -> int:
+        return int(self.post_start[term_id + 1] - self.post_start[term_id])
+
+    def local_docs(self, keys: np.ndarray) -> np.ndarray:
+        """Local doc numbers of the given keys that are in this segment"""
+        if self._key_order is None:
+            self._key_order = np.argsort(self.keys, kind="stable")
+        sorted_keys = self.keys[self._key_order]
+        positions = np.searchsorted(sorted_keys, keys)
+        found = positions < len(sorted_keys)
+        found[found] = sorted_keys[positions[found]] == keys[found]
+        return self._key_order[positions[found]]
+
+    def delete(self, keys: np.ndarray) -> None:
+        docs = self.local_docs(keys)
+        docs = docs[self.alive[docs]]
+        if len(docs):
+            self.alive[docs] = False
+            self.num_alive -= len(docs)
+            self.alive_len -= int(self.doc_len[docs].sum(dtype=np.int64))
+
+    def nbytes(self) -> int:
+        return sum(np.asarray(getattr(self, name)).nbytes for name in _ARRAYS)
+
+
+class LexicalSnapshot:
+    """Frozen segment list and alive masks of a LexicalIndex, written without locks"""
+
+    def __init__(self, parts: List[Tuple[_Segment, np.ndarray]]):
+        self.parts = parts
+
+    def write(self, directory: str) -> None:
+        """Merge the live docs of all segments into one segment directory"""
+        _Segment.merge(self.parts).write(directory)
+        with open(os.path.join(directory, "segment.json"), "w") as f:
+            json.dump({"block_size": _Segment.BLOCK_SIZE}, f)
+
+
+class LexicalIndex:
+    """
+    BM25 index over chunk text, keyed by vector id.
+
+    Each add() indexes its batch as a small immutable in-memory segment;
+    once more than MAX_MEMORY_SEGMENTS pile up, the MERGE_FACTOR smallest
+    are merged into one, so a doc is rewritten a logarithmic number of times.
+    A snapshot merges everything into a single memory-mapped segment on
+    disk. Deletes clear alive bits and are dropped at the next merge.
+
+    Top-k retrieval is block-max MaxScore, vectorized per segment: terms
+    are visited from the highest score bound down; once the bounds of the
+    remaining terms can't lift a new doc past the current k-th score,
+    only existing candidates are scored, and only in blocks whose bound
+    can still change the top k.
+    """
+
+    MAX_MEMORY_SEGMENTS = 16
+    MERGE_FACTOR = 8
+
+    def __init__(self, directory: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Open a lexical index
+
+        Args:
+            directory: Segment directory written by a snapshot, or None for an empty index
+            k1: BM25 term frequency saturation
+            b: BM25 document length normalization
+        """
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.segments: List[_Segment] = [_Segment.load(directory)] if directory else []
+        # Set while a snapshot is being written, so its segments stay identifiable
+        self._merges_paused = False
+
+    def add(self, keys: np.ndarray, texts: List[str]) -> None:
+        """
+        Index chunk texts
+
+        Args:
+            keys: Vector ids of the chunks (not already in the index)
+            texts: Chunk texts
+        """
+        if len(keys) == 0:
+            return
+        self.segments.append(_Segment.build(keys, [tokenize(text) for text in texts]))
+        memory = [seg for seg in self.segments if seg.directory is None]
+        if len(memory) > self.MAX_MEMORY_SEGMENTS and not self._merges_paused:
+            smallest = sorted(memory, key=lambda seg: seg.num_alive)[:self.MERGE_FACTOR]
+            merged = _Segment.merge([(seg, seg.alive) for seg in smallest])
+            merged_ids = {id(seg) for seg in smallest}
+            self.segments = [seg for seg in self.segments if id(seg) not in merged_ids] + [merged]
+
+    def delete(self, keys: np.ndarray) -> None:
+        """Remove chunks by vector id"""
+        keys = np.asarray(keys, dtype=np.int64)
+        if len(keys) == 0:
+            return
+        for seg in self.segments:
+            seg.delete(keys)
+
+    def __len__(self) -> int:
+        return sum(seg.num_alive for seg in self.segments)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        allowed_keys: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        BM25 top-k
+
+        Args:
+            query: Query text
+            top_k: Number of results
+            allowed_keys: Optional vector ids to restrict the search to
+
+        Returns:
+            List of (vector id, score), best first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        num_docs = len(self)
+        if not terms or num_docs == 0 or top_k < 1:
+            return []
+        avgdl = max(sum(seg.alive_len for seg in self.segments) / num_docs, 1e-9)
+
+        # Document frequencies still count deleted docs until a merge drops
+        # them, so idf takes the doc count from the same postings
+        indexed_docs = sum(len(seg.keys) for seg in self.segments)
+        term_ids = [[seg.term_id(term) for term in terms] for seg in self.segments]
+        idf = []
+        for t in range(len(terms)):
+            df = sum(seg.doc_freq(ids[t]) for seg, ids in zip(self.segments, term_ids) if ids[t] >= 0)
+            idf.append(math.log(1 + (indexed_docs - df + 0.5) / (df + 0.5)) if df else 0.0)
+
+        results: List[Tuple[float, int]] = []
+        theta = 0.0
+        for seg, ids in zip(self.segments, term_ids):
+            if seg.num_alive == 0:
+                continue
+            valid = seg.alive
+            if allowed_keys is not None:
+                valid = np.zeros(len(seg.keys), dtype=bool)
+                valid[seg.local_docs(allowed_keys)] = True
+                valid &= seg.alive
+            query_terms = [(tid, idf[t]) for t, tid in enumerate(ids) if tid >= 0 and idf[t] > 0]
+            for score, key in self._search_segment(seg, query_terms, top_k, theta, avgdl, valid):
+                if len(results) < top_k:
+                    heapq.heappush(results, (score, key))
+                elif score > results[0][0]:
+                    heapq.heapreplace(results, (score, key))
+            if len(results) == top_k:
+                theta = results[0][0]
+
+        return [(key, score) for score, key in sorted(results, reverse=True)]
+
+    def _term_weights(self, tfs: np.ndarray, lengths: np.ndarray, idf: float, avgdl: float) -> np.ndarray:
+        tfs = tfs.astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths.astype(np.float32) / avgdl)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def _search_segment(
+        self,
+        seg: _Segment,
+        query_terms: List[Tuple[int, float]],
+        top_k: int,
+        theta: float,
+        avgdl: float,
+        valid: np.ndarray
+    ) -> List[Tuple[float, int]]:
+        """Block-max MaxScore over one segment; theta is the best k-th score seen so far"""
+        if not query_terms:
+            return []
+        block_size = seg.BLOCK_SIZE
+        terms = []
+        for tid, idf in query_terms:
+            first, last = int(seg.blk_start[tid]), int(seg.blk_start[tid + 1])
+            bounds = self._term_weights(seg.blk_max_tf[first:last], seg.blk_min_len[first:last], idf, avgdl)
+            terms.append((float(bounds.max()), tid, idf, bounds))
+        terms.sort(key=lambda term: term[0], reverse=True)
+        # rest[i]: the most terms i.. can add to any doc
+        rest = np.cumsum([term[0] for term in terms][::-1])[::-1].tolist() + [0.0]
+
+        scores = np.zeros(len(seg.keys), dtype=np.float32)
+        candidate = np.zeros(len(seg.keys), dtype=bool)
+        num_candidates = 0
+        for i, (_, tid, idf, bounds) in enumerate(terms):
+            if num_candidates >= top_k:
+                current = scores[candidate]
+                theta = max(theta, float(np.partition(current, len(current) - top_k)[len(current) - top_k]))
+            start, end = int(seg.post_start[tid]), int(seg.post_start[tid + 1])
+
+            if num_candidates < top_k or rest[i] > theta:
+                # Essential term: a doc matching only terms from here on can still make the top k
+                docs = np.asarray(seg.docs[start:end], dtype=np.int64)
+                keep = valid[docs]
+                docs = docs[keep]
+                scores[docs] += self._term_weights(
+                    np.asarray(seg.tfs[start:end])[keep], seg.doc_len[docs], idf, avgdl
+                )
+                candidate[docs] = True
+                num_candidates = int(candidate.sum())
+                continue
+
+            # Only current candidates can still make it; drop the ones that can't
+            docs = np.flatnonzero(candidate)
+            docs = docs[scores[docs] + rest[i] > theta]
+            candidate[:] = False
+            if len(docs) == 0:
+                break
+            first = int(seg.blk_start[tid])
+            last_docs = np.asarray(seg.blk_last_doc[first:int(seg.blk_start[tid + 1])], dtype=np.int64)
+            block = np.searchsorted(last_docs, docs)
+            inside = block < len(last_docs)
+            bound = np.where(inside, bounds[np.minimum(block, len(last_docs) - 1)], 0.0)
+            docs_kept = scores[docs] + bound + rest[i + 1] > theta
+            docs, block, inside = docs[docs_kept], block[docs_kept], inside[docs_kept]
+            candidate[docs] = True
+            num_candidates = len(docs)
+
+            # Decode only the blocks some remaining candidate falls into
+            needed = np.unique(block[inside])
+            if len(needed) == 0:
+                continue
+            block_starts = start + needed * block_size
+            block_lengths = np.minimum(block_starts + block_size, end) - block_starts
+            positions = np.repeat(block_starts - np.cumsum(block_lengths) + block_lengths, block_lengths) + np.arange(block_lengths.sum())
+            block_docs = np.asarray(seg.docs[positions], dtype=np.int64)
+            lookup = np.searchsorted(block_docs, docs)
+            hit = lookup < len(block_docs)
+            hit[hit] = block_docs[lookup[hit]] == docs[hit]
+            matched = positions[lookup[hit]]
+            scores[docs[hit]] += self._term_weights(
+                np.asarray(seg.tfs[matched]), seg.doc_len[docs[hit]], idf, avgdl
+            )
+
+        docs = np.flatnonzero(candidate)
+        if len(docs) > top_k:
+            docs = docs[np.argpartition(-scores[docs], top_k - 1)[:top_k]]
+        return [(float(scores[doc]), int(seg.keys[doc])) for doc in docs]
+
+    def freeze(self) -> LexicalSnapshot:
+        """Capture the current segments; the caller must hold off writers while freezing"""
+        self._merges_paused = True
+        return LexicalSnapshot([(seg, seg.alive.copy()) for seg in self.segments])
+
+    def thaw(self) -> None:
+        """Resume merges after the snapshot taken by freeze() was abandoned"""
+        self._merges_paused = False
+
+    def rebase(self, directory: str, snapshot: LexicalSnapshot) -> "LexicalIndex":
+        """
+        Open the directory written from snapshot and carry over changes made since
+
+        Args:
+            directory: Directory that snapshot.write() produced
+            snapshot: Snapshot taken by freeze()
+
+        Returns:
+            New index equivalent to this one, backed by the new segment
+        """
+        index = LexicalIndex(directory, self.k1, self.b)
+        frozen = {id(seg) for seg, _ in snapshot.parts}
+        deleted = [seg.keys[alive & ~seg.alive] for seg, alive in snapshot.parts]
+        if deleted:
+            index.delete(np.concatenate(deleted))
+        index.segments.extend(seg for seg in self.segments if id(seg) not in frozen)
+        return index
+
+    def get_stats(self) -> Dict[str, int]:
+        """Document, segment and posting counts"""
+        return {
+            "documents": len(self),
+            "segments": len(self.segments),
+            "memory_segments": sum(seg.directory is None for seg in self.segments),
+            "postings": sum(len(seg.docs) for seg in self.segments),
+            "bytes": sum(seg.nbytes() for seg in self.segments),
+        }
@@ -0,0 +1,396 @@
+from app.services.vector_stores.filters import UNFILTERABLE_FIELDS, coerce_filter_value
+from collections.abc import Hashable, Mapping
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+import json
+import os
+import numpy as np
+
+# Fields stored in dedicated columns; anything else goes to the JSON "extra" column
+_COLUMN_FIELDS = ("id", "document_id", "document_name", "chunk_index", "text")
+
+_NO_ROWS = np.zeros(0, dtype=np.int64)
+
+
+def _encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode strings as (offsets, utf-8 blob) with len(values) + 1 offsets (lone surrogates kept)"""
+    encoded = [v.encode("utf-8", "surrogatepass") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    if encoded:
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def _group_rows(column: np.ndarray) -> Dict[int, np.ndarray]:
+    """Postings of an integer column: value -> sorted row numbers"""
+    order = np.argsort(column, kind="stable").astype(np.int64)
+    values = np.asarray(column)[order]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(values)) + 1])
+    return {
+        int(values[start]): rows
+        for start, rows in zip(starts, np.split(order, starts[1:]))
+    } if len(order) else {}
+
+
+def _gather_strings(
+    offsets: np.ndarray,
+    blob: np.ndarray,
+    rows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Select rows of a string column without decoding them"""
+    starts = offsets[rows].astype(np.int64)
+    lengths = (offsets[rows + 1] - offsets[rows]).astype(np.int64)
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.uint64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    total = int(new_offsets[-1])
+    if total == 0:
+        return new_offsets, np.zeros(0, dtype=np.uint8)
+    # Byte position in the source for every output byte
+    shift = np.repeat(starts - new_offsets[:-1].astype(np.int64), lengths)
+    return new_offsets, blob[np.arange(total, dtype=np.int64) + shift]
+
+
+class _Columns:
+    """Immutable column set of a written snapshot, memory-mapped from disk"""
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory is None:
+            self.keys = np.zeros(0, dtype=np.int64)
+            self.doc_ordinal = np.zeros(0, dtype=np.int32)
+            self.chunk_index = np.zeros(0, dtype=np.int32)
+            self.strings = {
+                name: (np.zeros(1, dtype=np.uint64), np.zeros(0, dtype=np.uint8))
+                for name in ("id", "text", "extra")
+            }
+            self.documents = []
+            self._postings = {}
+            return
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        def load_blob(name):
+            path = os.path.join(directory, f"{name}.bin")
+            if os.path.getsize(path) == 0:
+                return np.zeros(0, dtype=np.uint8)
+            return np.memmap(path, dtype=np.uint8, mode="r")
+
+        self.keys = load("keys")
+        self.doc_ordinal = load("doc_ordinal")
+        self.chunk_index = load("chunk_index")
+        self.strings = {
+            name: (load(f"{name}_offsets"), load_blob(name))
+            for name in ("id", "text", "extra")
+        }
+        with open(os.path.join(directory, "documents.json")) as f:
+            self.documents = [tuple(d) for d in json.load(f)]
+        # Built on first use per field; the columns never change afterwards
+        self._postings: Dict[str, Dict[Any, np.ndarray]] = {}
+
+    def string(self, name: str, row: int) -> str:
+        offsets, blob = self.strings[name]
+        return bytes(blob[int(offsets[row]):int(offsets[row + 1])]).decode("utf-8", "surrogatepass")
+
+    def postings(self, field: str) -> Dict[Any, np.ndarray]:
+        """
+        Inverted postings of a field: value -> sorted row numbers (dead rows included)
+
+        document_id, document_name and chunk_index are grouped from their
+        columns; other fields are read from the extra JSON once.
+        """
+        postings = self._postings.get(field)
+        if postings is not None:
+            return postings
+
+        if field in ("document_id", "document_name"):
+            position = 0 if field == "document_id" else 1
+            postings = {}
+            for ordinal, rows in _group_rows(self.doc_ordinal).items():
+                value = self.documents[ordinal][position]
+                postings[value] = rows if value not in postings else np.union1d(postings[value], rows)
+        elif field == "chunk_index":
+            postings = _group_rows(self.chunk_index)
+            postings.pop(-1, None)
+        else:
+            grouped: Dict[Any, List[int]] = {}
+            offsets, _ = self.strings["extra"]
+            for row in np.flatnonzero(np.diff(offsets.astype(np.int64)) > 0):
+                value = json.loads(self.string("extra", row)).get(field)
+                if value is not None and isinstance(value, Hashable):
+                    grouped.setdefault(value, []).append(int(row))
+            postings = {value: np.array(rows, dtype=np.int64) for value, rows in grouped.items()}
+
+        self._postings[field] = postings
+        return postings
+
+
+class MetadataSnapshot:
+    """Frozen view of a ColumnarMetadataStore that can be written without locks"""
+
+    def __init__(self, base: _Columns, alive: np.ndarray, tail: Dict[int, Dict[str, Any]]):
+        self.base = base
+        self.alive = alive
+        self.tail = tail
+
+    def write(self, directory: str) -> None:
+        """
+        Write the snapshot as a columnar directory
+
+        Args:
+            directory: Target directory (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = self.base
+        base_rows = np.nonzero(self.alive)[0]
+
+        # Document table: reuse base ordinals, append documents first seen in the tail
+        documents = list(base.documents)
+        ordinal_of = {doc: i for i, doc in enumerate(documents)}
+        tail_keys = np.fromiter(self.tail.keys(), dtype=np.int64, count=len(self.tail))
+        tail_ordinal = np.zeros(len(self.tail), dtype=np.int32)
+        tail_chunk = np.zeros(len(self.tail), dtype=np.int32)
+        tail_strings = {"id": [], "text": [], "extra": []}
+        for i, meta in enumerate(self.tail.values()):
+            doc = (str(meta.get("document_id", "")), str(meta.get("document_name", "")))
+            if doc not in ordinal_of:
+                ordinal_of[doc] = len(documents)
+                documents.append(doc)
+            tail_ordinal[i] = ordinal_of[doc]
+            tail_chunk[i] = meta.get("chunk_index", -1)
+            tail_strings["id"].append(str(meta.get("id", "")))
+            tail_strings["text"].append(meta.get("text", ""))
+            extra = {k: v for k, v in meta.items() if k not in _COLUMN_FIELDS}
+            tail_strings["extra"].append(json.dumps(extra) if extra else "")
+
+        keys = np.concatenate([base.keys[base_rows], tail_keys])
+        order = np.argsort(keys, kind="stable")
+        np.save(os.path.join(directory, "keys.npy"), keys[order])
+        np.save(
+            os.path.join(directory, "doc_ordinal.npy"),
+            np.concatenate([base.doc_ordinal[base_rows], tail_ordinal])[order]
+        )
+        np.save(
+            os.path.join(directory, "chunk_index.npy"),
+            np.concatenate([base.chunk_index[base_rows], tail_chunk])[order]
+        )
+
+        for name in ("id", "text", "extra"):
+            base_offsets, base_blob = _gather_strings(*base.strings[name], base_rows)
+            new_offsets, new_blob = _encode_strings(tail_strings[name])
+            offsets = np.concatenate([base_offsets[:-1], new_offsets + base_offsets[-1]])
+            blob = np.concatenate([base_blob, new_blob])
+            offsets, blob = _gather_strings(offsets, blob, order)
+            np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+            blob.tofile(os.path.join(directory, f"{name}.bin"))
+
+        with open(os.path.join(directory, "documents.json"), "w") as f:
+            json.dump(documents, f)
+
+
+class ColumnarMetadataStore(Mapping):
+    """
+    Chunk metadata keyed by vector id.
+
+    Snapshotted rows live in memory-mapped columns: a sorted key array,
+    fixed-width document ordinal and chunk index columns, and offsets +
+    blob pairs for ids, chunk texts and any extra fields. Only rows that
+    are looked up get decoded, so opening a store costs a few mmap calls.
+    Rows added since the last snapshot are kept in a plain dict.
+
+    keys_matching answers metadata filters from inverted postings (field
+    value -> rows): built lazily per field for the snapshot columns, and
+    maintained on every write for the in-memory rows.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Open a metadata store
+
+        Args:
+            directory: Snapshot directory to map, or None for an empty store
+        """
+        self.directory = directory
+        self._base = _Columns(directory)
+        self._alive = np.ones(len(self._base.keys), dtype=bool)
+        self._num_alive = len(self._base.keys)
+        self._tail: Dict[int, Dict[str, Any]] = {}
+        # field -> value -> keys of the in-memory rows
+        self._tail_postings: Dict[str, Dict[Any, Set[int]]] = {}
+
+    @classmethod
+    def from_dict(cls, entries: Dict[int, Dict[str, Any]]) -> "ColumnarMetadataStore":
+        """Build a store from a legacy pickled {key: metadata} dict"""
+        store = cls()
+        for key, meta in entries.items():
+            store[key] = meta
+        return store
+
+    def _base_row(self, key: int) -> int:
+        keys = self._base.keys
+        row = int(np.searchsorted(keys, key))
+        if row < len(keys) and keys[row] == key and self._alive[row]:
+            return row
+        return -1
+
+    def _decode(self, row: int) -> Dict[str, Any]:
+        base = self._base
+        document_id, document_name = base.documents[base.doc_ordinal[row]]
+        meta = {
+            "id": base.string("id", row),
+            "document_id": document_id,
+            "document_name": document_name,
+        }
+        chunk_index = int(base.chunk_index[row])
+        if chunk_index >= 0:
+            meta["chunk_index"] = chunk_index
+        meta["text"] = base.string("text", row)
+        extra = base.string("extra", row)
+        if extra:
+            meta.update(json.loads(extra))
+        return meta
+
+    def __getitem__(self, key: int) -> Dict[str, Any]:
+        key = int(key)
+        if key in self._tail:
+            return self._tail[key]
+        row = self._base_row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._decode(row)
+
+    def _tail_postings_items(self, meta: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        for field, value in meta.items():
+            if field in UNFILTERABLE_FIELDS or value is None or not isinstance(value, Hashable):
+                continue
+            try:
+                yield field, coerce_filter_value(field, value)
+            except (TypeError, ValueError):
+                continue
+
+    def __setitem__(self, key: int, meta: Dict[str, Any]) -> None:
+        key = int(key)
+        row = self._base_row(key)
+        if row >= 0:
+            self._alive[row] = False
+            self._num_alive -= 1
+        previous = self._tail.get(key)
+        if previous is not None:
+            self._unindex_tail(key, previous)
+        self._tail[key] = meta
+        for field, value in self._tail_postings_items(meta):
+            self._tail_postings.setdefault(field, {}).setdefault(value, set()).add(key)
+
+    def _unindex_tail(self, key: int, meta: Dict[str, Any]) -> None:
+        for field, value in self._tail_postings_items(meta):
+            keys = self._tail_postings[field][value]
+            keys.discard(key)
+            if not keys:
+                del self._tail_postings[field][value]
+
+    def __delitem__(self, key: int) -> None:
+        key = int(key)
+        meta = self._tail.pop(key, None)
+        if meta is not None:
+            self._unindex_tail(key, meta)
+            return
+        row = self._base_row(key)
+        if row < 0:
+            raise KeyError(key)
+        self._alive[row] = False
+        self._num_alive -= 1
+
+    def __contains__(self, key) -> bool:
+        key = int(key)
+        return key in self._tail or self._base_row(key) >= 0
+
+    def __len__(self) -> int:
+        return self._num_alive + len(self._tail)
+
+    def __iter__(self) -> Iterator[int]:
+        for key in self._base.keys[self._alive]:
+            yield int(key)
+        yield from list(self._tail)
+
+    def keys_for_document(self, document_id: str) -> np.ndarray:
+        """
+        Keys of all rows belonging to a document
+
+        Args:
+            document_id: Document identifier
+
+        Returns:
+            int64 array of keys
+        """
+        return self.keys_matching({"document_id": [document_id]})
+
+    def keys_matching(self, filters: Dict[str, List[Any]]) -> np.ndarray:
+        """
+        Keys of the live rows matching all filters
+
+        Args:
+            filters: Normalized filters, {field: [values]} (see normalize_filters);
+                values of a field are alternatives, fields are combined with AND
+
+        Returns:
+            int64 array of keys
+        """
+        if not filters:
+            return self.keys_array()
+
+        base_rows = None
+        tail_keys: Optional[Set[int]] = None
+        for field, values in filters.items():
+            coerced = [coerce_filter_value(field, value) for value in values]
+            postings = self._base.postings(field)
+            rows = np.unique(np.concatenate(
+                [postings.get(value, _NO_ROWS) for value in coerced] or [_NO_ROWS]
+            ))
+            base_rows = rows if base_rows is None else np.intersect1d(base_rows, rows, assume_unique=True)
+
+            tail_postings = self._tail_postings.get(field, {})
+            keys = set().union(*(tail_postings.get(value, ()) for value in coerced))
+            tail_keys = keys if tail_keys is None else tail_keys & keys
+
+        base_rows = base_rows[self._alive[base_rows]]
+        return np.concatenate([
+            self._base.keys[base_rows],
+            np.fromiter(tail_keys, dtype=np.int64, count=len(tail_keys))
+        ]).astype(np.int64)
+
+    def keys_array(self) -> np.ndarray:
+        """All live keys as an int64 array"""
+        tail_keys = np.fromiter(self._tail.keys(), dtype=np.int64, count=len(self._tail))
+        return np.concatenate([self._base.keys[self._alive], tail_keys]).astype(np.int64)
+
+    def freeze(self) -> MetadataSnapshot:
+        """Capture the current rows; the caller must hold off writers while freezing"""
+        return MetadataSnapshot(self._base, self._alive.copy(), dict(self._tail))
+
+    def rebase(self, directory: str, snapshot: MetadataSnapshot) -> "ColumnarMetadataStore":
+        """
+        Open the directory written from snapshot and carry over changes made since
+
+        Args:
+            directory: Directory that snapshot.write() produced
+            snapshot: Snapshot taken by freeze()
+
+        Returns:
+            New store equivalent to this one, backed by the new snapshot
+        """
+        store = ColumnarMetadataStore(directory)
+        deleted = self._base.keys[snapshot.alive & ~self._alive]
+        deleted = np.concatenate([
+            deleted,
+            np.array([k for k in snapshot.tail if k not in self._tail], dtype=np.int64)
+        ])
+        for key in deleted:
+            if key in store:
+                del store[key]
+        for key, meta in self._tail.items():
+            if snapshot.tail.get(key) is not meta:
+                store[key] = meta
+        return store
+
+    def memory_rows(self) -> int:
+        """Number of rows held in memory rather than in the mapped snapshot"""
+        return len(self._tail)
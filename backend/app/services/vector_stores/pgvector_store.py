@@ -1,27 +1,486 @@
 from app.providers.base import VectorStore
-from typing import List, Dict, Any
+from app.services.vector_stores.filters import coerce_filter_value, normalize_filters
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import asyncio
+import json
+import math
+import re
+import struct
+import time
+import numpy as np
+
+INDEX_TYPES = ("hnsw", "ivfflat", "none")
+
+# Columns stored in dedicated columns; anything else goes to the jsonb "metadata" column
+_COLUMN_FIELDS = ("id", "document_id", "document_name", "chunk_index", "text")
+
+_COPY_COLUMNS = ("id", "document_id", "document_name", "chunk_index", "text", "metadata", "embedding")
+
+
+def _encode_vector(vector) -> bytes:
+    """pgvector binary format: int16 dimension, int16 unused, big-endian float32 values"""
+    values = np.asarray(vector, dtype=">f4")
+    return struct.pack(">HH", len(values), 0) + values.tobytes()
+
+
+def _decode_vector(data: bytes) -> List[float]:
+    (dimension,) = struct.unpack_from(">H", data)
+    return np.frombuffer(data, dtype=">f4", count=dimension, offset=4).astype(np.float32).tolist()
+
+
+def auto_lists(num_rows: int) -> int:
+    """IVFFlat list count recommended by pgvector: rows / 1000 up to 1M rows, sqrt(rows) above"""
+    if num_rows <= 1_000_000:
+        return max(1, num_rows // 1000)
+    return int(math.sqrt(num_rows))
+
 
 class PGVectorStore(VectorStore):
-    """PostgreSQL pgvector store - STUB for future implementation"""
-    
-    def __init__(self, connection_string: str):
+    """
+    PostgreSQL vector store using the pgvector extension.
+
+    Chunks live in one table with the embedding in a vector(d) column,
+    btree indexes on document_id and document_name and a GIN index on the
+    jsonb metadata, so search filters are evaluated in SQL.
+    Connections come from an asyncpg pool created on first use. Vectors
+    are loaded with binary COPY into a temporary staging table and upserted
+    from there. Searches use an HNSW or IVFFlat index (L2 distance, like the
+    FAISS store) with ef_search / probes set per transaction.
+    """
+
+    def __init__(
+        self,
+        connection_string: str,
+        dimension: int,
+        table_name: str = "rag_chunks",
+        index_type: str = "hnsw",
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 64,
+        ef_search: int = 40,
+        lists: Optional[int] = None,
+        probes: int = 10,
+        ivf_min_rows: int = 10_000,
+        pool_min_size: int = 1,
+        pool_max_size: int = 10
+    ):
+        """
+        Initialize pgvector store
+
+        Args:
+            connection_string: PostgreSQL connection URI
+            dimension: Dimension of embedding vectors
+            table_name: Table holding chunks and embeddings
+            index_type: hnsw, ivfflat or none (exact scan)
+            hnsw_m: HNSW graph degree
+            hnsw_ef_construction: HNSW candidate list size while building
+            ef_search: HNSW candidate list size per query
+            lists: IVFFlat list count (derived from the row count when omitted)
+            probes: IVFFlat lists visited per query
+            ivf_min_rows: Rows needed before an IVFFlat index is built
+            pool_min_size: Connections kept open
+            pool_max_size: Maximum pooled connections
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown pgvector index type: {index_type}. Expected one of {INDEX_TYPES}")
+        if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", table_name):
+            raise ValueError(f"Invalid table name: {table_name}")
         self.connection_string = connection_string
-        raise NotImplementedError("pgvector store not yet implemented")
-    
+        self.dimension = dimension
+        self.table_name = table_name
+        self.index_name = f"{table_name}_embedding_idx"
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.ef_search = ef_search
+        self.lists = lists
+        self.probes = probes
+        self.ivf_min_rows = ivf_min_rows
+        self.pool_min_size = pool_min_size
+        self.pool_max_size = pool_max_size
+
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        # Set during bulk loads: vector index maintenance is left to the end
+        self._bulk_loads = 0
+        self._index_checked = False
+        self.connect_seconds = None
+
+    async def _get_pool(self):
+        if self._pool is not None:
+            return self._pool
+        async with self._pool_lock:
+            if self._pool is None:
+                import asyncpg
+                started = time.perf_counter()
+                # The extension must exist before the pool registers the vector codec
+                conn = await asyncpg.connect(self.connection_string)
+                try:
+                    await self._create_schema(conn)
+                finally:
+                    await conn.close()
+                self._pool = await asyncpg.create_pool(
+                    self.connection_string,
+                    min_size=self.pool_min_size,
+                    max_size=self.pool_max_size,
+                    init=self._init_connection
+                )
+                self.connect_seconds = time.perf_counter() - started
+            return self._pool
+
+    @staticmethod
+    async def _init_connection(conn) -> None:
+        await conn.set_type_codec(
+            "vector", schema="public", encoder=_encode_vector, decoder=_decode_vector, format="binary"
+        )
+
+    async def _create_schema(self, conn) -> None:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table_name} (
+                id text PRIMARY KEY,
+                document_id text NOT NULL,
+                document_name text,
+                chunk_index integer,
+                text text,
+                metadata jsonb,
+                embedding vector({self.dimension}) NOT NULL
+            )
+        """)
+        await conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_document_name_idx "
+            f"ON {self.table_name} (document_name)"
+        )
+        # Containment (@>) filters on the other metadata fields
+        await conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_metadata_idx "
+            f"ON {self.table_name} USING gin (metadata jsonb_path_ops)"
+        )
+        await conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table_name}_document_id_idx "
+            f"ON {self.table_name} (document_id)"
+        )
+        # vector(d) stores d as the column's type modifier
+        existing = await conn.fetchval(
+            "SELECT atttypmod FROM pg_attribute "
+            "WHERE attrelid = $1::regclass AND attname = 'embedding'",
+            self.table_name
+        )
+        if existing != self.dimension:
+            raise ValueError(
+                f"pgvector table {self.table_name} has dimension {existing}, "
+                f"expected {self.dimension}"
+            )
+
+    async def _current_index(self, conn) -> Optional[str]:
+        """Access method of the vector index (hnsw, ivfflat) or None"""
+        return await conn.fetchval(
+            "SELECT am.amname FROM pg_class c JOIN pg_am am ON am.oid = c.relam "
+            "WHERE c.relname = $1 AND c.relkind = 'i'",
+            self.index_name
+        )
+
+    async def _ensure_index(self, conn, rebuild: bool = False) -> None:
+        """
+        Create the configured vector index if it is missing (or of another
+        type). IVFFlat is only built once ivf_min_rows rows exist, since
+        its lists are clustered from the data present at build time.
+        """
+        current = await self._current_index(conn)
+        wanted = None if self.index_type == "none" else self.index_type
+        if current == wanted and not rebuild:
+            return
+        if current is not None:
+            await conn.execute(f"DROP INDEX IF EXISTS {self.index_name}")
+        if wanted is None:
+            return
+
+        if wanted == "hnsw":
+            await conn.execute(
+                f"CREATE INDEX {self.index_name} ON {self.table_name} "
+                f"USING hnsw (embedding vector_l2_ops) "
+                f"WITH (m = {int(self.hnsw_m)}, ef_construction = {int(self.hnsw_ef_construction)})"
+            )
+        else:
+            num_rows = await conn.fetchval(f"SELECT count(*) FROM {self.table_name}")
+            if num_rows < self.ivf_min_rows:
+                return
+            lists = int(self.lists or auto_lists(num_rows))
+            await conn.execute(
+                f"CREATE INDEX {self.index_name} ON {self.table_name} "
+                f"USING ivfflat (embedding vector_l2_ops) WITH (lists = {lists})"
+            )
+
     async def add_vectors(
         self,
         vectors: List[List[float]],
         metadata: List[Dict[str, Any]],
         ids: List[str]
     ) -> None:
-        raise NotImplementedError()
-    
+        """Add (or replace) vectors with metadata using COPY"""
+        records = []
+        for vector_id, vector, meta in zip(ids, vectors, metadata):
+            extra = {k: v for k, v in meta.items() if k not in _COLUMN_FIELDS}
+            chunk_index = meta.get("chunk_index")
+            records.append((
+                vector_id,
+                str(meta.get("document_id", "")),
+                meta.get("document_name"),
+                int(chunk_index) if chunk_index is not None else None,
+                meta.get("text"),
+                json.dumps(extra) if extra else None,
+                vector,
+            ))
+
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"CREATE TEMP TABLE IF NOT EXISTS {self.table_name}_staging "
+                    f"(LIKE {self.table_name} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                )
+                await conn.copy_records_to_table(
+                    f"{self.table_name}_staging", records=records, columns=_COPY_COLUMNS
+                )
+                columns = ", ".join(_COPY_COLUMNS)
+                updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in _COPY_COLUMNS if c != "id")
+                await conn.execute(
+                    f"INSERT INTO {self.table_name} ({columns}) "
+                    f"SELECT {columns} FROM {self.table_name}_staging "
+                    f"ON CONFLICT (id) DO UPDATE SET {updates}"
+                )
+            self.version += 1
+            if not self._bulk_loads and not self._index_checked:
+                await self._ensure_index(conn)
+                # IVFFlat waits for ivf_min_rows, so keep checking until it exists
+                self._index_checked = (
+                    self.index_type == "none" or await self._current_index(conn) is not None
+                )
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        """
+        Defer vector index builds until the load is done. When the table
+        starts out empty the index is dropped, so it is built once over all
+        rows, which is much faster than inserting into it row by row.
+        """
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            if self._bulk_loads == 0:
+                empty = await conn.fetchval(f"SELECT NOT EXISTS (SELECT 1 FROM {self.table_name})")
+                if empty:
+                    await conn.execute(f"DROP INDEX IF EXISTS {self.index_name}")
+            self._bulk_loads += 1
+        try:
+            yield
+        finally:
+            self._bulk_loads -= 1
+            if self._bulk_loads == 0:
+                async with pool.acquire() as conn:
+                    await self._ensure_index(conn)
+                    await conn.execute(f"ANALYZE {self.table_name}")
+                self._index_checked = False
+                self.version += 1
+
     async def search(
         self,
         query_vector: List[float],
-        top_k: int = 5
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Search for similar vectors
+
+        Args:
+            query_vector: Query embedding
+            top_k: Number of results
+            filters: Optional metadata filters, e.g. {"document_id": ["3", "7"]}
+        """
+        filters = normalize_filters(filters)
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            return await self._search(conn, query_vector, top_k, filters)
+
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for many queries concurrently over pooled connections"""
+        query_np = np.asarray(query_vectors, dtype=np.float32)
+        if query_np.ndim != 2 or query_np.shape[1] != self.dimension:
+            raise ValueError(
+                f"Expected query array of shape (n, {self.dimension}), got {query_np.shape}"
+            )
+        filters = normalize_filters(filters)
+        pool = await self._get_pool()
+
+        async def run(vector):
+            async with pool.acquire() as conn:
+                return await self._search(conn, vector, top_k, filters)
+
+        return list(await asyncio.gather(*(run(vector) for vector in query_np)))
+
+    @staticmethod
+    def _filter_clause(filters: Optional[Dict[str, List[Any]]], args: List[Any]) -> str:
+        """WHERE clause for normalized filters, appending its parameters to args"""
+        if filters is None:
+            return ""
+        conditions = []
+        for field, values in filters.items():
+            if field in ("document_id", "document_name", "chunk_index"):
+                args.append([coerce_filter_value(field, value) for value in values])
+                cast = "integer[]" if field == "chunk_index" else "text[]"
+                conditions.append(f"{field} = ANY(${len(args)}::{cast})")
+            else:
+                alternatives = []
+                for value in values:
+                    args.append(json.dumps({field: value}))
+                    alternatives.append(f"metadata @> ${len(args)}::jsonb")
+                conditions.append(f"({' OR '.join(alternatives) or 'false'})")
+        return "WHERE " + " AND ".join(conditions)
+
+    async def _search(
+        self,
+        conn,
+        query_vector,
+        top_k: int,
+        filters: Optional[Dict[str, List[Any]]]
     ) -> List[Dict[str, Any]]:
-        raise NotImplementedError()
-    
-    async def delete_by_document(self, document_id: str) -> None:
-        raise NotImplementedError()
+        args = [np.asarray(query_vector, dtype=np.float32), top_k]
+        where = self._filter_clause(filters, args)
+        query = (
+            f"SELECT id, document_id, document_name, chunk_index, text, metadata, "
+            f"embedding <-> $1 AS distance "
+            f"FROM {self.table_name} {where} "
+            f"ORDER BY embedding <-> $1 LIMIT $2"
+        )
+
+        async with conn.transaction():
+            # Query-time knobs, scoped to this transaction
+            await conn.execute(
+                "SELECT set_config('hnsw.ef_search', $1, true), set_config('ivfflat.probes', $2, true)",
+                str(max(self.ef_search, top_k)), str(self.probes)
+            )
+            rows = await conn.fetch(query, *args)
+            if where and len(rows) < top_k:
+                # The vector index filters after its candidate scan and can come
+                # back short; scan the matching rows exactly instead
+                await conn.execute("SET LOCAL enable_indexscan = off")
+                rows = await conn.fetch(query, *args)
+
+        results = []
+        for row in rows:
+            result = {
+                "id": row["id"],
+                "document_id": row["document_id"],
+                "document_name": row["document_name"],
+            }
+            if row["chunk_index"] is not None:
+                result["chunk_index"] = row["chunk_index"]
+            result["text"] = row["text"]
+            if row["metadata"]:
+                result.update(json.loads(row["metadata"]))
+            result["score"] = float(row["distance"])
+            results.append(result)
+        return results
+
+    async def delete_by_document(self, document_id: str, keep_ids: Optional[List[str]] = None) -> None:
+        """Delete all vectors for a document, except keep_ids"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            if keep_ids is None:
+                await conn.execute(
+                    f"DELETE FROM {self.table_name} WHERE document_id = $1", str(document_id)
+                )
+            else:
+                await conn.execute(
+                    f"DELETE FROM {self.table_name} WHERE document_id = $1 AND NOT (id = ANY($2::text[]))",
+                    str(document_id), list(keep_ids)
+                )
+        self.version += 1
+
+    async def delete_vectors(self, document_id: str, ids: List[str]) -> None:
+        """Delete some vectors of a document"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.execute(
+                f"DELETE FROM {self.table_name} WHERE document_id = $1 AND id = ANY($2::text[])",
+                str(document_id), list(ids)
+            )
+        self.version += 1
+
+    async def get_vectors(self, document_id: str, ids: List[str]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Stored vectors and metadata of some vectors of a document"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"SELECT id, document_id, document_name, chunk_index, text, metadata, embedding "
+                f"FROM {self.table_name} WHERE document_id = $1 AND id = ANY($2::text[])",
+                str(document_id), list(ids)
+            )
+        metadata = []
+        for row in rows:
+            meta = {key: row[key] for key in _COLUMN_FIELDS if row[key] is not None}
+            if row["metadata"]:
+                meta.update(json.loads(row["metadata"]))
+            metadata.append(meta)
+        vectors = np.array([row["embedding"] for row in rows], dtype=np.float32).reshape(len(rows), self.dimension)
+        return vectors, metadata
+
+    def configure(
+        self,
+        index_type: Optional[str] = None,
+        ef_search: Optional[int] = None,
+        lists: Optional[int] = None,
+        probes: Optional[int] = None
+    ) -> None:
+        """
+        Apply index settings. Query-time settings take effect immediately;
+        a new index type or list count is built on the next write.
+        """
+        if index_type is not None and index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown pgvector index type: {index_type}. Expected one of {INDEX_TYPES}")
+        if (ef_search is not None and ef_search != self.ef_search) or (
+            probes is not None and probes != self.probes
+        ):
+            self.version += 1
+        if ef_search is not None:
+            self.ef_search = ef_search
+        if probes is not None:
+            self.probes = probes
+        if (index_type is not None and index_type != self.index_type) or (
+            lists is not None and lists != self.lists
+        ):
+            self.index_type = index_type or self.index_type
+            self.lists = lists if lists is not None else self.lists
+            self._index_checked = False
+
+    async def rebuild_index(self) -> None:
+        """Rebuild the vector index (e.g. IVFFlat lists after the table has grown)"""
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await self._ensure_index(conn, rebuild=True)
+        self.version += 1
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report table, index and pool settings"""
+        return {
+            "store_type": type(self).__name__,
+            "table": self.table_name,
+            "dimension": self.dimension,
+            "index_type": self.index_type,
+            "ef_search": self.ef_search,
+            "lists": self.lists,
+            "probes": self.probes,
+            "pool_size": self._pool.get_size() if self._pool is not None else 0,
+            "pool_idle": self._pool.get_idle_size() if self._pool is not None else 0,
+            "connect_seconds": self.connect_seconds,
+        }
@@ -0,0 +1,64 @@
+from app.providers.base import VectorStore
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+import threading
+
+
+class VectorStoreRegistry:
+    """
+    Process-wide registry of long-lived vector stores.
+
+    Loading a FAISS index means reading the whole index file and its
+    metadata from disk, so stores are created once per
+    (store type, dimension, location) key and shared by every request.
+    """
+
+    def __init__(self):
+        self._stores: Dict[Tuple[Hashable, ...], VectorStore] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(
+        self,
+        key: Tuple[Hashable, ...],
+        factory: Callable[[], VectorStore]
+    ) -> VectorStore:
+        """
+        Return the store registered under key, creating it on first use
+
+        Args:
+            key: Registry key, e.g. ("faiss", 768, "faiss_index")
+            factory: Zero-argument callable that builds the store
+
+        Returns:
+            Shared VectorStore instance
+        """
+        store = self._stores.get(key)
+        if store is not None:
+            return store
+
+        with self._lock:
+            # Another request may have loaded it while we waited
+            store = self._stores.get(key)
+            if store is None:
+                store = factory()
+                self._stores[key] = store
+            return store
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Stats for every loaded store"""
+        with self._lock:
+            stores = list(self._stores.items())
+        return [
+            {"key": [str(part) for part in key], **store.get_stats()}
+            for key, store in stores
+        ]
+
+    def clear(self) -> None:
+        """Close and drop all loaded stores (they are reloaded on next access)"""
+        with self._lock:
+            stores = list(self._stores.values())
+            self._stores.clear()
+        for store in stores:
+            store.close()
+
+
+vector_store_registry = VectorStoreRegistry()
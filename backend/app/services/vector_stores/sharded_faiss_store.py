@@ -0,0 +1,268 @@
+from app.providers.base import VectorStore
+from app.services.vector_stores.faiss_store import FAISSVectorStore
+from app.services.vector_stores.filters import normalize_filters
+from app.services.vector_stores.wal import OP_ADD
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from itertools import islice
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Tuple
+import asyncio
+import glob
+import hashlib
+import heapq
+import json
+import os
+import numpy as np
+
+
+def shard_for_document(document_id: str, num_shards: int) -> int:
+    """Stable shard number of a document (hash of its id)"""
+    digest = hashlib.blake2b(str(document_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_shards
+
+
+class ShardedFAISSVectorStore(VectorStore):
+    """
+    FAISS vector store partitioned by document id into independent shards.
+
+    Each shard is a FAISSVectorStore with its own index, metadata, WAL and
+    snapshots under "{index_path}.shard{n}", so adding or deleting a
+    document only logs to and compacts the shard that owns it, and each
+    shard's index stays a fraction of the total size.
+
+    Searches fan out to the shards on a thread pool (FAISS releases the
+    GIL while searching) and the per-shard top_k lists, each already
+    sorted, are k-way merged. A document_id filter only visits the shards
+    owning those documents. Lexical (BM25) scores are computed with each
+    shard's own term statistics, which is close to global ones once
+    shards hold more than a few thousand chunks.
+
+    The shard count is recorded in "{index_path}.shards.json" and cannot
+    change afterwards. An existing unsharded store at index_path is
+    copied into the shards the first time the sharded store is opened.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        num_shards: int,
+        index_path: str = "faiss_index",
+        **shard_options
+    ):
+        """
+        Initialize sharded FAISS vector store
+
+        Args:
+            dimension: Dimension of embedding vectors
+            num_shards: Number of shards (fixed once the store is created)
+            index_path: Path prefix of the shard files
+            **shard_options: FAISSVectorStore options applied to every shard
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.dimension = dimension
+        self.index_path = index_path
+        self.num_shards = num_shards
+        self.shards_manifest_path = f"{index_path}.shards.json"
+
+        if os.path.exists(self.shards_manifest_path):
+            with open(self.shards_manifest_path) as f:
+                stored_shards = json.load(f)["num_shards"]
+            if stored_shards != num_shards:
+                raise ValueError(
+                    f"Sharded FAISS store at {index_path} has {stored_shards} shards, "
+                    f"configured {num_shards}; re-sharding an existing store is not supported"
+                )
+            import_unsharded = False
+        else:
+            import_unsharded = (
+                os.path.exists(f"{index_path}.manifest.json")
+                or os.path.exists(f"{index_path}.index")
+                or bool(glob.glob(f"{glob.escape(index_path)}.wal.*"))
+            )
+
+        self.shards = [
+            FAISSVectorStore(dimension, f"{index_path}.shard{n:02d}", **shard_options)
+            for n in range(num_shards)
+        ]
+        self.executor = ThreadPoolExecutor(max_workers=num_shards, thread_name_prefix="faiss-shard")
+        self.supports_lexical_search = all(shard.supports_lexical_search for shard in self.shards)
+
+        if import_unsharded:
+            self._import_unsharded(shard_options)
+        with open(self.shards_manifest_path, "w") as f:
+            json.dump({"num_shards": num_shards}, f)
+
+    def _import_unsharded(self, shard_options: Dict[str, Any]) -> None:
+        """Copy the vectors and metadata of an unsharded store at index_path into the shards"""
+        source = FAISSVectorStore(self.dimension, self.index_path, **shard_options)
+        try:
+            labels = source.metadata_store.keys_array()
+            for start in range(0, len(labels), FAISSVectorStore.REBUILD_BATCH_SIZE):
+                batch = labels[start:start + FAISSVectorStore.REBUILD_BATCH_SIZE]
+                vectors = source.index.reconstruct_batch(batch)
+                by_shard: Dict[int, List[int]] = {}
+                for row, label in enumerate(batch):
+                    by_shard.setdefault(self._shard_of(source.metadata_store[label]), []).append(row)
+                for n, rows in by_shard.items():
+                    metadata = [dict(source.metadata_store[batch[row]]) for row in rows]
+                    header = {
+                        "n": len(rows),
+                        "d": self.dimension,
+                        "ids": [meta.pop("id") for meta in metadata],
+                        "metadata": metadata
+                    }
+                    shard = self.shards[n]
+                    with shard.lock.write():
+                        shard.wal.append(OP_ADD, header, vectors[rows])
+                        shard._apply(OP_ADD, header, vectors[rows])
+            for shard in self.shards:
+                shard.compact()
+            print(
+                f"Copied {len(labels)} vectors from {self.index_path} into {self.num_shards} shards "
+                f"(the unsharded files are left in place)"
+            )
+        finally:
+            source.close()
+
+    def _shard_of(self, meta: Dict[str, Any]) -> int:
+        return shard_for_document(meta.get("document_id", meta.get("id")), self.num_shards)
+
+    @property
+    def version(self) -> int:
+        return sum(shard.version for shard in self.shards)
+
+    async def _fan_out(self, shards: List[FAISSVectorStore], call: Callable[[FAISSVectorStore], Any]) -> List[Any]:
+        """Run call(shard) for each shard on the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(
+            loop.run_in_executor(self.executor, call, shard) for shard in shards
+        ))
+
+    def _shards_for(self, filters: Optional[Dict[str, List[Any]]]) -> List[FAISSVectorStore]:
+        """Shards that can hold matches of (normalized) filters"""
+        if filters is None or "document_id" not in filters:
+            return self.shards
+        owners = {shard_for_document(document_id, self.num_shards) for document_id in filters["document_id"]}
+        return [shard for n, shard in enumerate(self.shards) if n in owners]
+
+    def _merge(self, result_lists: List[List[Dict[str, Any]]], top_k: int, higher_is_better: bool) -> List[Dict[str, Any]]:
+        """k-way merge of per-shard result lists sorted best first"""
+        merged = heapq.merge(*result_lists, key=lambda result: result["score"], reverse=higher_is_better)
+        return list(islice(merged, top_k))
+
+    async def add_vectors(
+        self,
+        vectors: List[List[float]],
+        metadata: List[Dict[str, Any]],
+        ids: List[str]
+    ) -> None:
+        """Add vectors with metadata, each to the shard of its document"""
+        by_shard: Dict[int, List[int]] = {}
+        for row, meta in enumerate(metadata):
+            by_shard.setdefault(self._shard_of({"id": ids[row], **meta}), []).append(row)
+        for n, rows in by_shard.items():
+            await self.shards[n].add_vectors(
+                [vectors[row] for row in rows],
+                [metadata[row] for row in rows],
+                [ids[row] for row in rows]
+            )
+
+    async def search(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar vectors across the shards"""
+        results = await self.search_batch(
+            np.array([query_vector], dtype='float32'), top_k, filters
+        )
+        return results[0]
+
+    async def search_batch(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search every shard concurrently and merge the per-shard top_k
+
+        Args:
+            query_vectors: 2-D float32 array, one query per row
+            top_k: Number of results per query
+            filters: Optional metadata filters, e.g. {"document_id": ["3", "7"]}
+        """
+        filters = normalize_filters(filters)
+        shards = self._shards_for(filters)
+        per_shard = await self._fan_out(
+            shards, lambda shard: shard._search_batch(query_vectors, top_k, filters)
+        )
+        higher_is_better = self.shards[0].index_metric != "l2"
+        return [
+            self._merge([results[row] for results in per_shard], top_k, higher_is_better)
+            for row in range(len(query_vectors))
+        ]
+
+    async def search_text(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """BM25 search over chunk text across the shards"""
+        filters = normalize_filters(filters)
+        per_shard = await self._fan_out(
+            self._shards_for(filters), lambda shard: shard._search_text(query, top_k, filters)
+        )
+        return self._merge(per_shard, top_k, higher_is_better=True)
+
+    async def delete_by_document(self, document_id: str, keep_ids: Optional[List[str]] = None) -> None:
+        """Delete the vectors of a document (except keep_ids) from the shard that holds it"""
+        await self.shards[shard_for_document(document_id, self.num_shards)].delete_by_document(
+            document_id, keep_ids
+        )
+
+    async def delete_vectors(self, document_id: str, ids: List[str]) -> None:
+        """Delete some vectors of a document from the shard that holds it"""
+        await self.shards[shard_for_document(document_id, self.num_shards)].delete_vectors(document_id, ids)
+
+    async def get_vectors(self, document_id: str, ids: List[str]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        """Read some vectors of a document from the shard that holds it"""
+        return await self.shards[shard_for_document(document_id, self.num_shards)].get_vectors(document_id, ids)
+
+    def configure(self, **index_options) -> None:
+        """Apply index settings to every shard (see FAISSVectorStore.configure)"""
+        for shard in self.shards:
+            shard.configure(**index_options)
+
+    @asynccontextmanager
+    async def bulk_load(self) -> AsyncIterator[None]:
+        """Bulk-load every shard (see FAISSVectorStore.bulk_load)"""
+        async with AsyncExitStack() as stack:
+            for shard in self.shards:
+                await stack.enter_async_context(shard.bulk_load())
+            yield
+
+    def close(self) -> None:
+        """Close every shard and stop the search threads"""
+        for shard in self.shards:
+            shard.close()
+        self.executor.shutdown(wait=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Totals over the shards, plus each shard's own stats"""
+        shard_stats = [shard.get_stats() for shard in self.shards]
+        return {
+            "store_type": "faiss_sharded",
+            "index_path": self.index_path,
+            "dimension": self.dimension,
+            "num_shards": self.num_shards,
+            "num_vectors": sum(stats["num_vectors"] for stats in shard_stats),
+            "num_metadata_entries": sum(stats["num_metadata_entries"] for stats in shard_stats),
+            "index_bytes": sum(stats["index_bytes"] for stats in shard_stats),
+            "wal_bytes": sum(stats["wal_bytes"] for stats in shard_stats),
+            "load_seconds": round(sum(stats["load_seconds"] for stats in shard_stats), 4),
+            "shards": shard_stats,
+        }
@@ -0,0 +1,155 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import glob
+import json
+import os
+import struct
+import zlib
+import numpy as np
+
+# Record layout: payload length, crc32 of payload, op code, then the payload.
+# The payload is a length-prefixed JSON header followed by raw float32 vectors.
+_RECORD_HEADER = struct.Struct("<IIB")
+_JSON_LENGTH = struct.Struct("<I")
+
+OP_ADD = 1
+OP_DELETE = 2
+
+
+class WriteAheadLog:
+    """
+    Append-only log of vector store mutations.
+
+    The log is split into numbered segment files ("<prefix>.wal.00000001", ...).
+    A snapshot records the last segment it covers, so compaction only has to
+    rotate to a fresh segment and delete the covered ones afterwards.
+    """
+
+    def __init__(self, path_prefix: str, fsync: bool = True):
+        """
+        Initialize write-ahead log
+
+        Args:
+            path_prefix: Path prefix shared with the index files
+            fsync: Whether to fsync after every appended record
+        """
+        self.path_prefix = path_prefix
+        self.fsync = fsync
+        segments = self.list_segments()
+        self.segment = segments[-1] if segments else 1
+        self._file = None
+
+    def _segment_path(self, segment: int) -> str:
+        return f"{self.path_prefix}.wal.{segment:08d}"
+
+    def list_segments(self) -> List[int]:
+        """Segment numbers present on disk, oldest first"""
+        segments = []
+        for path in glob.glob(f"{glob.escape(self.path_prefix)}.wal.*"):
+            suffix = path.rsplit(".", 1)[-1]
+            if suffix.isdigit():
+                segments.append(int(suffix))
+        return sorted(segments)
+
+    def append(
+        self,
+        op: int,
+        header: Dict[str, Any],
+        vectors: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Append one record to the current segment
+
+        Args:
+            op: Operation code (OP_ADD, OP_DELETE)
+            header: JSON-serializable operation details
+            vectors: Optional float32 matrix carried by the record
+        """
+        header_bytes = json.dumps(header).encode("utf-8")
+        payload = _JSON_LENGTH.pack(len(header_bytes)) + header_bytes
+        if vectors is not None:
+            payload += np.ascontiguousarray(vectors, dtype="float32").tobytes()
+
+        if self._file is None:
+            self._file = open(self._segment_path(self.segment), "ab")
+        self._file.write(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload), op))
+        self._file.write(payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def rotate(self) -> int:
+        """
+        Start a new segment
+
+        Returns:
+            Number of the last segment that is now closed
+        """
+        self.close()
+        closed = self.segment
+        self.segment += 1
+        return closed
+
+    def replay(
+        self,
+        after_segment: int = 0
+    ) -> Iterator[Tuple[int, Dict[str, Any], Optional[np.ndarray]]]:
+        """
+        Yield (op, header, vectors) for every record in segments after after_segment.
+
+        A torn record at the end of the newest segment (crash mid-append) is
+        truncated away; anything after it was never acknowledged.
+        """
+        segments = [s for s in self.list_segments() if s > after_segment]
+        for segment in segments:
+            path = self._segment_path(segment)
+            with open(path, "rb") as f:
+                data = f.read()
+
+            offset = 0
+            while offset < len(data):
+                if offset + _RECORD_HEADER.size > len(data):
+                    break
+                length, crc, op = _RECORD_HEADER.unpack_from(data, offset)
+                start = offset + _RECORD_HEADER.size
+                payload = data[start:start + length]
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    break
+
+                (json_length,) = _JSON_LENGTH.unpack_from(payload, 0)
+                json_end = _JSON_LENGTH.size + json_length
+                header = json.loads(payload[_JSON_LENGTH.size:json_end].decode("utf-8"))
+                vectors = None
+                if json_end < len(payload):
+                    vectors = np.frombuffer(payload[json_end:], dtype="float32")
+                    vectors = vectors.reshape(header["n"], header["d"])
+                yield op, header, vectors
+                offset = start + length
+
+            if offset < len(data):
+                print(f"Warning: Truncating torn WAL record in {path} at byte {offset}")
+                with open(path, "r+b") as f:
+                    f.truncate(offset)
+
+    def remove_through(self, segment: int) -> None:
+        """Delete all segments up to and including segment"""
+        for s in self.list_segments():
+            if s <= segment:
+                os.remove(self._segment_path(s))
+
+    def size_bytes(self) -> int:
+        """Total size of all segments on disk"""
+        return sum(
+            os.path.getsize(self._segment_path(s)) for s in self.list_segments()
+        )
+
+    def sync(self) -> None:
+        """fsync the current segment (when records were appended without fsync)"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        """Close the current segment file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
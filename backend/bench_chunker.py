@@ -0,0 +1,87 @@
+"""
+Chunking throughput on generated markdown.
+
+Usage: python bench_chunker.py [size_mb] [tokenizer]
+
+Reports MB/s of TextChunker and, when langchain-text-splitters is
+installed, of the RecursiveCharacterTextSplitter it replaced, sized in
+characters (CHUNK_SIZE_TOKENS * 4) and in tokens of the same tokenizer.
+"""
+import random
+import sys
+import time
+
+from app.services.chunker import CHARS_PER_TOKEN, TextChunker
+
+WORDS = (
+    "the retrieval index stores chunk vectors and metadata for each document while "
+    "queries are embedded once and compared against every shard clause 4.2.1 part "
+    "AB-1234 requires torque of 35 Nm before inspection"
+).split()
+
+
+def generate_markdown(size_bytes: int, seed: int = 0) -> str:
+    """Headings, paragraphs, bullet lists and code blocks up to about size_bytes"""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    while size < size_bytes:
+        kind = rng.random()
+        if kind < 0.1:
+            block = "#" * rng.randint(1, 3) + " " + " ".join(rng.choices(WORDS, k=rng.randint(2, 6))).title()
+        elif kind < 0.25:
+            block = "\n".join(
+                "- " + " ".join(rng.choices(WORDS, k=rng.randint(4, 14))) for _ in range(rng.randint(2, 8))
+            )
+        elif kind < 0.3:
+            block = "```\n" + "\n".join(
+                "x_%d = compute(%d)" % (i, rng.randint(0, 999)) for i in range(rng.randint(3, 20))
+            ) + "\n```"
+        else:
+            block = " ".join(
+                " ".join(rng.choices(WORDS, k=rng.randint(6, 24))).capitalize() + "."
+                for _ in range(rng.randint(2, 12))
+            )
+        parts.append(block)
+        size += len(block) + 2
+    return "\n\n".join(parts)
+
+
+def bench(name: str, split, text: str, repeat: int = 3) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        chunks = split(text)
+        best = min(best, time.perf_counter() - started)
+    megabytes = len(text.encode("utf-8")) / 1e6
+    print(f"{name:<40} {megabytes / best:8.2f} MB/s  {len(chunks):7d} chunks  {best:.3f}s")
+
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    tokenizer = sys.argv[2] if len(sys.argv) > 2 else None
+    text = generate_markdown(int(size_mb * 1e6))
+    print(f"{len(text.encode('utf-8')) / 1e6:.1f} MB of markdown")
+
+    chunker = TextChunker(tokenizer=tokenizer)
+    bench(f"TextChunker ({chunker.chunk_size} tokens)", chunker.split, text)
+
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        sys.exit(0)
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunker.chunk_size * CHARS_PER_TOKEN,
+        chunk_overlap=chunker.chunk_overlap * CHARS_PER_TOKEN,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    bench("RecursiveCharacterTextSplitter (chars)", splitter.split_text, text)
+    # The same splitter sized in tokens, as TextChunker is
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunker.chunk_size,
+        chunk_overlap=chunker.chunk_overlap,
+        length_function=lambda piece: chunker.count_tokens([piece])[0],
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    bench("RecursiveCharacterTextSplitter (tokens)", splitter.split_text, text, repeat=1)
@@ -0,0 +1,59 @@
+"""
+Cross-encoder re-ranking latency on generated candidates.
+
+Usage: python bench_reranker.py [model] [candidates]
+
+Scores candidates of mixed lengths (a few long chunks among short ones,
+as search results usually are) with CrossEncoderReranker's length
+buckets, then as one padded batch, then again from the score cache.
+"""
+import asyncio
+import random
+import sys
+import time
+
+from bench_chunker import WORDS
+from app.services.reranker import CrossEncoderReranker
+
+
+def generate_candidates(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    candidates = []
+    for i in range(count):
+        words = rng.randint(150, 400) if rng.random() < 0.2 else rng.randint(10, 60)
+        candidates.append({"id": f"bench_{i}", "text": " ".join(rng.choices(WORDS, k=words))})
+    return candidates
+
+
+def best_of(run, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main(model: str, count: int) -> None:
+    reranker = CrossEncoderReranker(model=model)
+    query = "torque required before inspection of part AB-1234"
+    candidates = generate_candidates(count)
+    pairs = [(query, candidate["text"]) for candidate in candidates]
+    reranker.score_pairs(pairs[:2])  # load the model
+
+    buckets = reranker.plan_buckets(pairs)
+    bucketed = best_of(lambda: reranker.score_pairs(pairs))
+    single = best_of(lambda: reranker._get_model().predict(pairs, batch_size=len(pairs), show_progress_bar=False))
+    print(f"{count} pairs, {len(buckets)} length buckets: {bucketed * 1000:8.1f} ms")
+    print(f"{count} pairs, one padded batch:     {single * 1000:8.1f} ms")
+
+    await reranker.rerank(query, candidates, 5, budget_seconds=60)
+    started = time.perf_counter()
+    _, reranked = await reranker.rerank(query, candidates, 5, budget_seconds=60)
+    print(f"cached scores:                  {(time.perf_counter() - started) * 1000:8.1f} ms (reranked={reranked})")
+
+
+if __name__ == "__main__":
+    model = sys.argv[1] if len(sys.argv) > 1 else "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    asyncio.run(main(model, count))
@@ -0,0 +1,98 @@
+"""
+Mock OpenAI-compatible chat completions server for testing the chat endpoint.
+
+Usage: python mock_openai_server.py [--port 8001] [--ttft-ms 300] [--tokens-per-second 50] [--tokens 120]
+
+Then configure the backend with llm_provider "OpenAI-compatible",
+llm_base_url "http://localhost:8001/v1" and any llm_model. Answers are
+filler words, one per streamed chunk, after the given first-token delay
+and at the given rate, so the TTFT and tokens/sec reported by
+GET /api/v1/stats/chat can be checked against the settings.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = "the answer is based on the context passages provided and cites them where relevant".split()
+
+app = FastAPI(title="Mock OpenAI API")
+options = argparse.Namespace(ttft_ms=300.0, tokens_per_second=50.0, tokens=120)
+
+
+def answer_words(max_tokens: int):
+    count = min(options.tokens, max_tokens or options.tokens)
+    return [("" if i == 0 else " ") + WORDS[i % len(WORDS)] for i in range(count)]
+
+
+def completion_chunk(completion_id: str, model: str, delta: dict, finish_reason=None, usage=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    if usage:
+        chunk["usage"] = usage
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+@app.get("/v1/models")
+def list_models():
+    return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "mock")
+    words = answer_words(body.get("max_tokens") or body.get("max_completion_tokens"))
+    prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 1 for m in body.get("messages", []))
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words), "total_tokens": prompt_tokens + len(words)}
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    if not body.get("stream"):
+        await asyncio.sleep(options.ttft_ms / 1000 + len(words) / options.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(words)}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    async def events():
+        await asyncio.sleep(options.ttft_ms / 1000)
+        yield completion_chunk(completion_id, model, {"role": "assistant", "content": ""})
+        started = time.perf_counter()
+        for i, word in enumerate(words):
+            # Paced against the start, so sleep overshoot doesn't lower the rate
+            delay = started + i / options.tokens_per_second - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield completion_chunk(completion_id, model, {"content": word})
+        yield completion_chunk(completion_id, model, {}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield completion_chunk(completion_id, model, {}, usage=usage)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Rate of the following tokens")
+    parser.add_argument("--tokens", type=int, default=120, help="Tokens per answer (capped by max_tokens)")
+    args = parser.parse_args()
+    options.ttft_ms, options.tokens_per_second, options.tokens = args.ttft_ms, args.tokens_per_second, args.tokens
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,36 @@
+import json
+import sys
+import time
+import requests
+
+url = "http://localhost:8000/api/v1/chat"
+question = sys.argv[1] if len(sys.argv) > 1 else "What are these documents about?"
+
+try:
+    started = time.perf_counter()
+    first_token = None
+    with requests.post(url, json={"query": question, "top_k": 5}, stream=True) as response:
+        print(f"Status Code: {response.status_code}")
+        if response.status_code != 200:
+            print(f"Response: {response.text}")
+            sys.exit(1)
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "sources":
+                    print(f"Sources: {[(r.get('document_name'), r.get('chunk_index')) for r in data['results']]}")
+                elif event == "token":
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    print(data["text"], end="", flush=True)
+                elif event == "done":
+                    print(f"\nServer metrics: {data}")
+                elif event == "error":
+                    print(f"\nError: {data['detail']}")
+    if first_token is not None:
+        print(f"Client time to first token: {first_token - started:.3f}s")
+except Exception as e:
+    print(f"Error: {e}")
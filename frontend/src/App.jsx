@@ -2,6 +2,7 @@ import { useState } from 'react';
 import { MessageCircle, FolderOpen, Settings, Send } from 'lucide-react';
 import ConfigPanel from './components/ConfigPanel';
 import DocumentsTab from './components/DocumentsTab';
+import { uploadPDF, streamChat } from './services/api';
 import './App.css';
 
 function App() {
@@ -32,27 +33,32 @@ function App() {
     }
   };
 
-  const handleSendQuery = () => {
+  const handleSendQuery = async () => {
     if (!query.trim()) return;
 
-    // Add user message
-    const userMessage = { role: 'user', content: query };
-    setMessages([...messages, userMessage]);
-
-    // Simulate AI response
-    setTimeout(() => {
-      const aiMessage = {
-        role: 'assistant',
-        content: 'This is a simulated response. In production, this would retrieve relevant chunks from your documents and generate a response using the configured LLM.',
-        sources: [
-          { name: 'document1.pdf', chunk: 3 },
-          { name: 'document2.docx', chunk: 7 }
-        ]
-      };
-      setMessages(prev => [...prev, aiMessage]);
-    }, 1000);
-
+    // Add user message and an assistant message that fills in as tokens arrive
+    const question = query;
+    setMessages(prev => [...prev, { role: 'user', content: question }, { role: 'assistant', content: '' }]);
     setQuery('');
+
+    const updateAnswer = (update) => {
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, ...update(last) }];
+      });
+    };
+
+    try {
+      await streamChat(question, {
+        onSources: (search) => updateAnswer(() => ({
+          sources: search.results.map(r => ({ name: r.document_name, chunk: r.chunk_index }))
+        })),
+        onToken: ({ text }) => updateAnswer(last => ({ content: last.content + text })),
+        onError: ({ detail }) => updateAnswer(last => ({ content: `${last.content}\n\nError: ${detail}` }))
+      });
+    } catch (err) {
+      updateAnswer(() => ({ content: `Error: ${err.message}` }));
+    }
   };
 
   return (
@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { uploadPDF, getDocuments, deleteDocument } from '../services/api';
+import { uploadPDF, waitForIngestJob, getDocuments, deleteDocument } from '../services/api';
 import './DocumentsTab.css';
 
 function DocumentsTab({ vectorDb, metadataDb }) {
@@ -37,8 +37,15 @@ function DocumentsTab({ vectorDb, metadataDb }) {
         setUploadStatus('Uploading and processing...');
         try {
             const result = await uploadPDF(file);
-            setUploadStatus(`✓ ${result.message} (${result.num_chunks} chunks)`);
             setFile(null);
+            await loadDocuments();
+            const job = await waitForIngestJob(result.job_id, (progress) => {
+                setUploadStatus(`Processing: ${progress.status}...`);
+            });
+            if (job.status === 'failed') {
+                throw new Error(job.error_message || 'Failed to process document');
+            }
+            setUploadStatus(`✓ Document processed successfully (${job.num_chunks} chunks)`);
             // Reload documents list
             await loadDocuments();
         } catch (err) {
@@ -67,6 +74,11 @@ function DocumentsTab({ vectorDb, metadataDb }) {
         const badges = {
             completed: { class: 'status-completed', text: 'Completed' },
             processing: { class: 'status-processing', text: 'Processing' },
+            queued: { class: 'status-processing', text: 'Queued' },
+            parsing: { class: 'status-processing', text: 'Parsing' },
+            chunking: { class: 'status-processing', text: 'Chunking' },
+            embedding: { class: 'status-processing', text: 'Embedding' },
+            indexing: { class: 'status-processing', text: 'Indexing' },
             failed: { class: 'status-failed', text: 'Failed' }
         };
         return badges[status] || badges.processing;
@@ -19,6 +19,59 @@ export const uploadPDF = async (file) => {
   }
 };
 
+export const getIngestJob = async (jobId) => {
+  try {
+    const response = await axios.get(`${API_URL}/ingest/jobs/${jobId}`);
+    return response.data;
+  } catch (error) {
+    console.error('Error getting ingest job:', error);
+    throw error;
+  }
+};
+
+export const waitForIngestJob = async (jobId, onProgress, intervalMs = 1000) => {
+  // Poll until the job reaches a final state
+  while (true) {
+    const job = await getIngestJob(jobId);
+    if (onProgress) onProgress(job);
+    if (job.status === 'completed' || job.status === 'failed') {
+      return job;
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
+export const streamChat = async (query, { onSources, onToken, onDone, onError } = {}) => {
+  // Server-sent events over a POST body, so read the stream with fetch
+  const response = await fetch(`${API_URL}/chat`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query }),
+  });
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({}));
+    throw new Error(error.detail || `Chat failed with status ${response.status}`);
+  }
+
+  const handlers = { sources: onSources, token: onToken, done: onDone, error: onError };
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let end;
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+      const event = message.match(/^event: (.*)$/m)?.[1];
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (event && data && handlers[event]) handlers[event](JSON.parse(data));
+    }
+  }
+};
+
 export const saveConfiguration = async (config) => {
   try {
     // Convert frontend config object to backend format